@@ -4,15 +4,17 @@
 Synoptic analysis or diagnostic maps for numeric weather model.
 """
 import numpy as np
-from nmc_met_io.retrieve_micaps_server import get_model_grid
+from nmc_met_map.lib.grid_cache import get_model_grids,fetch_model_grids
 import nmc_met_io.retrieve_micaps_server as MICAPS_IO
 import nmc_met_io.retrieve_cimiss_server as CMISS_IO
 from nmc_met_map.graphics import QPF_graphics
 import nmc_met_map.lib.utility as utl
+import nmc_met_map.lib.precip as precip
 from metpy.units import units
 import metpy.calc as mpcalc
 import xarray as xr
 import copy
+from collections import OrderedDict
 
 def gh_rain(initTime=None, fhour=24, day_back=0,model='ECMWF',
     gh_lev=500,atime=6,data_source='MICAPS',
@@ -21,6 +23,11 @@ def gh_rain(initTime=None, fhour=24, day_back=0,model='ECMWF',
     Global=False):
 
 # prepare data
+    if(area != None):
+        cntr_pnt,zoom_ratio=utl.get_map_area(area_name=area)
+
+    map_extent=utl.get_map_extent(cntr_pnt,zoom_ratio,map_ratio)
+
     if(data_source =='MICAPS'):
         try:
             data_dir = [utl.Cassandra_dir(data_type='high',data_source=model,var_name='HGT',lvl=str(gh_lev)),
@@ -40,13 +47,13 @@ def gh_rain(initTime=None, fhour=24, day_back=0,model='ECMWF',
                 filename_gh=utl.filename_day_back_model(day_back=day_back,fhour=int(fhour-atime/2))
 
         # retrieve data from micaps server
-        gh = MICAPS_IO.get_model_grid(data_dir[0], filename=filename_gh)
-        if gh is None:
-            return
-        
-        rain = MICAPS_IO.get_model_grid(data_dir[1], filename=filename)
-        if rain is None:
+        data = fetch_model_grids([
+            (data_dir[0], filename_gh),
+            (data_dir[1], filename)],
+            bbox=utl.get_padded_extent(map_extent))
+        if data is None:
             return
+        gh, rain = data
 
     if(data_source =='CIMISS'):
         # get filename
@@ -90,26 +97,10 @@ def gh_rain(initTime=None, fhour=24, day_back=0,model='ECMWF',
     if(area != '全国'):
         south_China_sea=False
 
-    if(area != None):
-        cntr_pnt,zoom_ratio=utl.get_map_area(area_name=area)
-
-    map_extent=[0,0,0,0]
-    map_extent[0]=cntr_pnt[0]-zoom_ratio*1*map_ratio
-    map_extent[1]=cntr_pnt[0]+zoom_ratio*1*map_ratio
-    map_extent[2]=cntr_pnt[1]-zoom_ratio*1
-    map_extent[3]=cntr_pnt[1]+zoom_ratio*1
-
-    delt_x=(map_extent[1]-map_extent[0])*0.2
-    delt_y=(map_extent[3]-map_extent[2])*0.1
-
-    mask1 = (gh['lon'] > map_extent[0]-delt_x) & (gh['lon'] < map_extent[1]+delt_x) & (gh['lat'] > map_extent[2]-delt_y) & (gh['lat'] < map_extent[3]+delt_y)
-
-    mask2 = (rain['lon'] > map_extent[0]-delt_x) & (rain['lon'] < map_extent[1]+delt_x) & (rain['lat'] > map_extent[2]-delt_y) & (rain['lat'] < map_extent[3]+delt_y)
-
-    gh=gh.where(mask1,drop=True)
+    gh=utl.cut_to_map_extent(gh,map_extent)
     gh.attrs['model']=model
     gh.attrs['lev']=gh_lev
-    rain=rain.where(mask2,drop=True)
+    rain=utl.cut_to_map_extent(rain,map_extent)
     rain.attrs['atime']=atime
 
 # draw
@@ -119,17 +110,61 @@ def gh_rain(initTime=None, fhour=24, day_back=0,model='ECMWF',
         city=city,south_China_sea=south_China_sea,
         output_dir=output_dir,Global=Global)
 
+# the classified precipitation types of the runs, {(directories, filenames, bbox): Dataset}
+_precip_types = OrderedDict()
+PRECIP_TYPE_CACHE_SIZE = 8
+
+
+def _get_precip_types(data_dir, filenames, bbox):
+    """
+    Rain, snow and sleet of all the filenames, fetched and classified once.
+    The hours missing on the service are skipped, the result is looked up
+    by forecast_period.
+    :param data_dir: the directories of the RAIN and SNOW.
+    :param filenames: the filenames of the forecast hours.
+    :param bbox: [lon0, lon1, lat0, lat1] of the grids.
+    :return: xarray Dataset of precip.classify_precip_type, None if all missing.
+    """
+    key = (tuple(data_dir), tuple(filenames), tuple(bbox))
+    if key in _precip_types:
+        _precip_types.move_to_end(key)
+        return _precip_types[key]
+
+    data = fetch_model_grids([
+        (data_dir[0], filenames),
+        (data_dir[1], filenames)], allExists=False, bbox=bbox)
+    if data is None:
+        return None
+    # the hours of both the rain and the snow
+    rain, snow = xr.align(data[0], data[1], join='inner')
+    if rain.sizes['time'] == 0:
+        return None
+    _precip_types[key] = precip.classify_precip_type(rain, snow)
+    while len(_precip_types) > PRECIP_TYPE_CACHE_SIZE:
+        _precip_types.popitem(last=False)
+    return _precip_types[key]
+
+
 def mslp_rain_snow(initTime=None, fhour=24, day_back=0,model='ECMWF',
-    atime=6,data_source='MICAPS',
+    atime=6,data_source='MICAPS',sweep_fhours=None,
     map_ratio=19/9,zoom_ratio=20,cntr_pnt=[102,34],
     south_China_sea=True,area = '全国',city=False,output_dir=None,
     Global=False):
     '''
     issues:
     1. CIMISS 上上没有上没有GRAPES-GFS的降雪，所以当data_source='CIMISS',model='GRAPES_GFS'无法出图
+
+    sweep_fhours: the forecast hours of a sweep over the run (MICAPS), the
+    precipitation types of all of them are classified at the first call
+    and the later calls of the same run only read the cached result.
     '''
 
 # prepare data
+    if(area != None):
+        cntr_pnt,zoom_ratio=utl.get_map_area(area_name=area)
+
+    map_extent=utl.get_map_extent(cntr_pnt,zoom_ratio,map_ratio)
+
     if(data_source =='MICAPS'):
         try:
             data_dir = [utl.Cassandra_dir(data_type='surface',data_source=model,var_name='PRMSL'),
@@ -148,16 +183,30 @@ def mslp_rain_snow(initTime=None, fhour=24, day_back=0,model='ECMWF',
             if(atime > 3):
                 filename_mslp=utl.filename_day_back_model(day_back=day_back,fhour=int(fhour-atime/2))
 
+        if(sweep_fhours is None or fhour not in sweep_fhours):
+            sweep_fhours=[fhour]
+        if(initTime != None):
+            filenames=[utl.model_filename(initTime, ifhour) for ifhour in sweep_fhours]
+        else:
+            filenames=[utl.filename_day_back_model(day_back=day_back,fhour=ifhour)
+                       for ifhour in sweep_fhours]
+
         # retrieve data from micaps server
-        mslp = get_model_grid(data_dir[0], filename=filename)
-        if mslp is None:
+        bbox=utl.get_padded_extent(map_extent)
+        data = fetch_model_grids([(data_dir[0], filename)], bbox=bbox)
+        precip_types=_get_precip_types(data_dir[1:], filenames, bbox)
+        if(precip_types is not None and len(filenames) > 1 and
+           fhour not in np.atleast_1d(precip_types['forecast_period'].values)):
+            # this hour was missing when the sweep was classified
+            precip_types=_get_precip_types(data_dir[1:], [filename], bbox)
+        if data is None or precip_types is None:
             return
-        rain = get_model_grid(data_dir[1], filename=filename)
-        if rain is None:
-            return        
-        snow = get_model_grid(data_dir[2], filename=filename)
-        if snow is None:
-            return        
+        mslp = data[0]
+        itime=np.flatnonzero(
+            np.atleast_1d(precip_types['forecast_period'].values) == fhour)
+        if len(itime) == 0:
+            return
+        precip_types=precip_types.isel(time=itime[0:1])
 
     if(data_source =='CIMISS'):
         # get filename
@@ -185,77 +234,30 @@ def mslp_rain_snow(initTime=None, fhour=24, day_back=0,model='ECMWF',
                 return
             mslp['data']=mslp['data']/100.
 
-            TPE1=CMISS_IO.cimiss_model_by_time('20'+filename[0:8],valid_time=fhour,
-                        data_code=utl.CMISS_data_code(data_source=model,var_name='TPE'),
-                        levattrs={'long_name':'Height above Ground', 'units':'m', '_CoordinateAxisType':'-'},
-                        fcst_level=0, fcst_ele="TPE", units='kg*m^-2')
-            if TPE1 is None:
-                return    
-
-            TPE2=CMISS_IO.cimiss_model_by_time('20'+filename[0:8],valid_time=fhour-atime,
-                        data_code=utl.CMISS_data_code(data_source=model,var_name='TPE'),
-                        levattrs={'long_name':'Height above Ground', 'units':'m', '_CoordinateAxisType':'-'},
-                        fcst_level=0, fcst_ele="TPE", units='kg*m^-2')
-            if TPE2 is None:
-                return 
-
-            TTSP1=CMISS_IO.cimiss_model_by_time('20'+filename[0:8],valid_time=fhour,
-                        data_code=utl.CMISS_data_code(data_source=model,var_name='TTSP'),
-                        levattrs={'long_name':'Height above Ground', 'units':'m', '_CoordinateAxisType':'-'},
-                        fcst_level=0, fcst_ele="TTSP", units='kg*m^-2')
-            if TTSP1 is None:
-                return    
+            rain=precip.cimiss_interval_precip('20'+filename[0:8], [fhour], atime,
+                        model=model, var_name='TPE')
+            if rain is None:
+                return
 
-            TTSP2=CMISS_IO.cimiss_model_by_time('20'+filename[0:8],valid_time=fhour-atime,
-                        data_code=utl.CMISS_data_code(data_source=model,var_name='TTSP'),
-                        levattrs={'long_name':'Height above Ground', 'units':'m', '_CoordinateAxisType':'-'},
-                        fcst_level=0, fcst_ele="TTSP", units='kg*m^-2')
-            if TTSP2 is None:
-                return 
+            snow=precip.cimiss_interval_precip('20'+filename[0:8], [fhour], atime,
+                        model=model, var_name='TTSP')
+            if snow is None:
+                return
         except KeyError:
             raise ValueError('Can not find all data needed')
-        rain=TPE1.copy(deep=True)
-        rain['data'].values=(TPE1['data'].values-TPE2['data'].values)*1000
-
-        snow=TTSP1.copy(deep=True)
-        snow['data'].values=(TTSP1['data'].values-TTSP2['data'].values)*1000
+        precip_types=precip.classify_precip_type(rain, snow)
 
 # set map extent
     if(area != '全国'):
         south_China_sea=False
 
-    if(area != None):
-        cntr_pnt,zoom_ratio=utl.get_map_area(area_name=area)
-
-    map_extent=[0,0,0,0]
-    map_extent[0]=cntr_pnt[0]-zoom_ratio*1*map_ratio
-    map_extent[1]=cntr_pnt[0]+zoom_ratio*1*map_ratio
-    map_extent[2]=cntr_pnt[1]-zoom_ratio*1
-    map_extent[3]=cntr_pnt[1]+zoom_ratio*1
-
-    delt_x=(map_extent[1]-map_extent[0])*0.2
-    delt_y=(map_extent[3]-map_extent[2])*0.1
-
-    mask1 = (mslp['lon'] > map_extent[0]-delt_x) & (mslp['lon'] < map_extent[1]+delt_x) & (mslp['lat'] > map_extent[2]-delt_y) & (mslp['lat'] < map_extent[3]+delt_y)
-
-    mask2 = (rain['lon'] > map_extent[0]-delt_x) & (rain['lon'] < map_extent[1]+delt_x) & (rain['lat'] > map_extent[2]-delt_y) & (rain['lat'] < map_extent[3]+delt_y)
-
-    mslp=mslp.where(mask1,drop=True)
+    mslp=utl.cut_to_map_extent(mslp,map_extent)
     mslp.attrs['model']=model
-    rain=rain.where(mask2,drop=True)
-    snow=snow.where(mask2,drop=True)
-    snow.attrs['atime']=atime
-
-    rain_snow=xr.merge([rain.rename({'data': 'rain'}),snow.rename({'data': 'snow'})])
-
-    mask1 = ((rain_snow['rain']-rain_snow['snow'])>0.1)&(rain_snow['snow']>0.1)
-    sleet=rain_snow['rain'].where(mask1)
-
-    mask2 = ((rain_snow['rain']-rain_snow['snow'])<0.1)&(rain_snow['snow']>0.1)
-    snw=rain_snow['snow'].where(mask2)
+    precip_types=utl.cut_to_map_extent(precip_types,map_extent)
 
-    mask3 = (rain_snow['rain']>0.1)&(rain_snow['snow']<0.1)
-    rn=rain_snow['rain'].where(mask3)
+    sleet=precip_types['sleet']
+    snw=precip_types['snow']
+    rn=precip_types['rain']
     rn.attrs['atime']=atime
 # draw
     QPF_graphics.draw_mslp_rain_snow(
@@ -281,27 +283,17 @@ def Rain_evo(initTime=None, t_gap=6,t_range=[6,36], fcs_lvl=4,day_back=0,model='
             initTime = MICAPS_IO.get_latest_initTime(data_dir[0])
         filenames = [initTime+'.'+str(fhour).zfill(3) for fhour in fhours]
         # retrieve data from micaps server
-        rain = MICAPS_IO.get_model_grids(data_dir[0], filenames=filenames)
+        rain = get_model_grids(data_dir[0], filenames=filenames)
 
     if(data_source =='CIMISS'):
         if(initTime != None):
             filename = utl.model_filename(initTime, 0,UTC=True)
         else:
             filename=utl.filename_day_back_model(day_back=0,fhour=0,UTC=True)
-        try:
-            TPE1=CMISS_IO.cimiss_model_by_times('20'+filename[0:8],valid_times=fhours,
-                        data_code=utl.CMISS_data_code(data_source=model,var_name='TPE'),
-                        levattrs={'long_name':'Height above Ground', 'units':'m', '_CoordinateAxisType':'-'},
-                        fcst_level=0, fcst_ele="TPE", units='kg*m^-2')
-
-            TPE2=CMISS_IO.cimiss_model_by_times('20'+filename[0:8],valid_times=fhours-t_gap,
-                        data_code=utl.CMISS_data_code(data_source=model,var_name='TPE'),
-                        levattrs={'long_name':'Height above Ground', 'units':'m', '_CoordinateAxisType':'-'},
-                        fcst_level=0, fcst_ele="TPE", units='kg*m^-2')
-        except KeyError:
-            raise ValueError('Can not find all data needed')
-        rain=TPE1.copy(deep=True)
-        rain['data'].values=(TPE1['data'].values-TPE2['data'].values)*1000
+        rain=precip.cimiss_interval_precip('20'+filename[0:8], fhours, t_gap,
+                        model=model)
+        if rain is None:
+            return
 
 
 # set map extent
@@ -311,15 +303,8 @@ def Rain_evo(initTime=None, t_gap=6,t_range=[6,36], fcs_lvl=4,day_back=0,model='
     if(area != None):
         cntr_pnt,zoom_ratio=utl.get_map_area(area_name=area)
 
-    map_extent=[0,0,0,0]
-    map_extent[0]=cntr_pnt[0]-zoom_ratio*1*map_ratio
-    map_extent[1]=cntr_pnt[0]+zoom_ratio*1*map_ratio
-    map_extent[2]=cntr_pnt[1]-zoom_ratio*1
-    map_extent[3]=cntr_pnt[1]+zoom_ratio*1
-    delt_x=(map_extent[1]-map_extent[0])*0.2
-    delt_y=(map_extent[3]-map_extent[2])*0.1
-    mask1 = (rain['lon'] > map_extent[0]-delt_x) & (rain['lon'] < map_extent[1]+delt_x) & (rain['lat'] > map_extent[2]-delt_y) & (rain['lat'] < map_extent[3]+delt_y)
-    rain=rain.where(mask1,drop=True)
+    map_extent=utl.get_map_extent(cntr_pnt,zoom_ratio,map_ratio)
+    rain=utl.cut_to_map_extent(rain,map_extent)
     rain.attrs['model']=model
     rain.attrs['t_gap']=t_gap
 # draw
@@ -330,10 +315,10 @@ def Rain_evo(initTime=None, t_gap=6,t_range=[6,36], fcs_lvl=4,day_back=0,model='
         output_dir=output_dir,Global=Global)
 
 def cumulated_precip_evo(initTime=None, t_gap=6,t_range=[6,36],day_back=0,model='ECMWF',
-    data_source='MICAPS',
+    data_source='MICAPS',window=None,
     map_ratio=19/9,zoom_ratio=20,cntr_pnt=[102,34],
     south_China_sea=True,area = '全国',city=False,output_dir=None,
-    Global=False):
+    Global=False,anim_format='gif'):
     fhours = np.arange(t_range[0], t_range[1]+1, t_gap)
 # prepare data
     if(data_source =='MICAPS'):
@@ -345,9 +330,8 @@ def cumulated_precip_evo(initTime=None, t_gap=6,t_range=[6,36],day_back=0,model=
             initTime = MICAPS_IO.get_latest_initTime(data_dir[0])
         filenames = [initTime+'.'+str(fhour).zfill(3) for fhour in fhours]
         # retrieve data from micaps server
-        rain = MICAPS_IO.get_model_grids(data_dir[0], filenames=filenames)
-        for itime in range(1,len(rain['forecast_period'].values)):
-            rain['data'].values[itime,:,:]=np.sum(rain['data'].values[0:itime+1,:,:],axis=0)
+        rain = get_model_grids(data_dir[0], filenames=filenames)
+        rain = precip.accumulate(rain, window=window)
 
 
     if(data_source =='CIMISS'):
@@ -355,15 +339,12 @@ def cumulated_precip_evo(initTime=None, t_gap=6,t_range=[6,36],day_back=0,model=
             filename = utl.model_filename(initTime, 0,UTC=True)
         else:
             filename=utl.filename_day_back_model(day_back=0,fhour=0,UTC=True)
-        try:
-            TPE1=CMISS_IO.cimiss_model_by_times('20'+filename[0:8],valid_times=fhours,
-                        data_code=utl.CMISS_data_code(data_source=model,var_name='TPE'),
-                        levattrs={'long_name':'Height above Ground', 'units':'m', '_CoordinateAxisType':'-'},
-                        fcst_level=0, fcst_ele="TPE", units='kg*m^-2')
-        except KeyError:
-            raise ValueError('Can not find all data needed')
-        rain=TPE1.copy(deep=True)
-        rain['data'].values=(TPE1['data'].values)*1000
+        rain=precip.cimiss_accumulated_precip('20'+filename[0:8], fhours,
+                        model=model)
+        if rain is None:
+            return
+        if(window != None):
+            rain = precip.accumulate(rain, window=window, accumulated=True)
 
 
 # set map extent
@@ -373,20 +354,14 @@ def cumulated_precip_evo(initTime=None, t_gap=6,t_range=[6,36],day_back=0,model=
     if(area != None):
         cntr_pnt,zoom_ratio=utl.get_map_area(area_name=area)
 
-    map_extent=[0,0,0,0]
-    map_extent[0]=cntr_pnt[0]-zoom_ratio*1*map_ratio
-    map_extent[1]=cntr_pnt[0]+zoom_ratio*1*map_ratio
-    map_extent[2]=cntr_pnt[1]-zoom_ratio*1
-    map_extent[3]=cntr_pnt[1]+zoom_ratio*1
-    delt_x=(map_extent[1]-map_extent[0])*0.2
-    delt_y=(map_extent[3]-map_extent[2])*0.1
-    mask1 = (rain['lon'] > map_extent[0]-delt_x) & (rain['lon'] < map_extent[1]+delt_x) & (rain['lat'] > map_extent[2]-delt_y) & (rain['lat'] < map_extent[3]+delt_y)
-    rain=rain.where(mask1,drop=True)
+    map_extent=utl.get_map_extent(cntr_pnt,zoom_ratio,map_ratio)
+    rain=utl.cut_to_map_extent(rain,map_extent)
     rain.attrs['model']=model
-    rain.attrs['t_gap']=t_gap
+    rain.attrs['t_gap']=t_gap if window is None else window
 # draw
     QPF_graphics.draw_cumulated_precip_evo(
         rain=rain,
         map_extent=map_extent, regrid_shape=20,
         city=city,south_China_sea=south_China_sea,
-        output_dir=output_dir,Global=Global)                
\ No newline at end of file
+        output_dir=output_dir,Global=Global,
+        anim_format=anim_format)                
\ No newline at end of file
@@ -2,12 +2,15 @@
 import numpy as np
 import xarray as xr
 import metpy.calc as mpcalc
-from metpy.interpolate import cross_section
-from nmc_met_io.retrieve_micaps_server import get_model_3D_grid,get_model_grid,get_model_3D_grids,get_latest_initTime,get_model_points,get_model_grids
-import nmc_met_io.retrieve_micaps_server as MICAPS_IO
+import matplotlib.pyplot as plt
+from concurrent.futures import ProcessPoolExecutor
+from nmc_met_io.retrieve_micaps_server import get_latest_initTime,get_model_points
+from nmc_met_map.lib.grid_cache import fetch_model_grids
 import nmc_met_io.retrieve_cimiss_server as CMISS_IO
 from nmc_met_map.graphics import crossection_graphics
 import nmc_met_map.lib.utility as utl
+import nmc_met_map.lib.kinematics as kin
+import nmc_met_map.lib.cross_section as xsec
 from metpy.units import units
 import pandas as pd
 import math
@@ -42,34 +45,15 @@ def Crosssection_Wind_Theta_e_absv(
             filename=utl.filename_day_back_model(day_back=day_back,fhour=fhour)
             
         # retrieve data from micaps server
-        rh=MICAPS_IO.get_model_3D_grid(directory=data_dir[0][0:-1],filename=filename,levels=levels, allExists=False)
-        if rh is None:
-            return
-        rh = rh.metpy.parse_cf().squeeze()
-
-        u=MICAPS_IO.get_model_3D_grid(directory=data_dir[1][0:-1],filename=filename,levels=levels, allExists=False)
-        if u is None:
-            return
-        u = u.metpy.parse_cf().squeeze()
-
-        v=MICAPS_IO.get_model_3D_grid(directory=data_dir[2][0:-1],filename=filename,levels=levels, allExists=False)
-        if v is None:
-            return
-        v = v.metpy.parse_cf().squeeze()
-
-        v2=MICAPS_IO.get_model_3D_grid(directory=data_dir[2][0:-1],filename=filename,levels=levels, allExists=False)
-        if v2 is None:
-            return
-        v2 = v2.metpy.parse_cf().squeeze()
-
-        t=MICAPS_IO.get_model_3D_grid(directory=data_dir[3][0:-1],filename=filename,levels=levels, allExists=False)
-        if t is None:
-            return
-        t = t.metpy.parse_cf().squeeze()
-
-        gh=MICAPS_IO.get_model_grid(data_dir[4], filename=filename)
-        if t is None:
+        data = fetch_model_grids([
+            (data_dir[0][0:-1], filename, levels),
+            (data_dir[1][0:-1], filename, levels),
+            (data_dir[2][0:-1], filename, levels),
+            (data_dir[3][0:-1], filename, levels),
+            (data_dir[4], filename)])
+        if data is None:
             return
+        rh, u, v, t, gh = data
     if(data_source == 'CIMISS'):
         # get filename
         if(initTime != None):
@@ -95,11 +79,6 @@ def Crosssection_Wind_Theta_e_absv(
             if v is None:
                 return
 
-            v2=CMISS_IO.cimiss_model_3D_grid(init_time_str='20'+filename[0:8],valid_time=fhour,
-                        data_code=utl.CMISS_data_code(data_source=model,var_name='WIV'),
-                        fcst_levels=levels, fcst_ele="WIV", units='m/s')
-            if v2 is None:
-                return            
 
             t=CMISS_IO.cimiss_model_3D_grid(init_time_str='20'+filename[0:8],valid_time=fhour,
                         data_code=utl.CMISS_data_code(data_source=model,var_name='TEM'),
@@ -120,42 +99,30 @@ def Crosssection_Wind_Theta_e_absv(
     rh = rh.metpy.parse_cf().squeeze()
     u = u.metpy.parse_cf().squeeze()
     v = v.metpy.parse_cf().squeeze()
-    v2 = v2.metpy.parse_cf().squeeze()
     t = t.metpy.parse_cf().squeeze()
+
+    # only the grid cells along the section are needed
+    rh = xsec.cut_to_section(rh, st_point, ed_point)
+    u = xsec.cut_to_section(u, st_point, ed_point)
+    v = xsec.cut_to_section(v, st_point, ed_point)
+    t = xsec.cut_to_section(t, st_point, ed_point)
     resolution=u['lon'][1]-u['lon'][0]
     x,y=np.meshgrid(u['lon'], u['lat'])
 
-    dx,dy=mpcalc.lat_lon_grid_deltas(u['lon'],u['lat'])
-    for ilvl in levels:
-        u2d=u.sel(level=ilvl)
-        v2d=v.sel(level=ilvl)
-
-        absv2d=mpcalc.absolute_vorticity(u2d['data'].values*units.meter/units.second,
-                v2d['data'].values*units.meter/units.second,dx,dy,y*units.degree)
-        
-        if(ilvl == levels[0]):
-            absv3d = v2.copy()
-            absv3d['data'].loc[dict(level=ilvl)]=np.array(absv2d)
-        else:
-            absv3d['data'].loc[dict(level=ilvl)]=np.array(absv2d)
-    absv3d['data'].attrs['units']=absv2d.units
+    absv3d = v.copy()
+    absv3d['data']=(('level','lat','lon'),kin.absolute_vorticity(
+        u['data'].transpose('level','lat','lon').values,
+        v['data'].transpose('level','lat','lon').values,
+        u['lon'].values,u['lat'].values))
+    absv3d['data'].attrs['units']='1/s'
 
     #rh=rh.rename(dict(lat='latitude',lon='longitude'))
-    cross = cross_section(rh, st_point, ed_point)
-    cross_rh=cross.set_coords(('lat', 'lon'))
-    cross = cross_section(u, st_point, ed_point)
-    cross_u=cross.set_coords(('lat', 'lon'))
-    cross = cross_section(v, st_point, ed_point)
-    cross_v=cross.set_coords(('lat', 'lon'))
+    cross_rh, cross_u, cross_v, cross_t, cross_absv3d = xsec.cross_sections(
+        [rh, u, v, t, absv3d], st_point, ed_point)
 
     cross_u['data'].attrs['units']=units.meter/units.second
     cross_v['data'].attrs['units']=units.meter/units.second
     cross_u['t_wind'], cross_v['n_wind'] = mpcalc.cross_section_components(cross_u['data'],cross_v['data'])
-    
-    cross = cross_section(t, st_point, ed_point)
-    cross_t=cross.set_coords(('lat', 'lon'))
-    cross = cross_section(absv3d, st_point, ed_point)
-    cross_absv3d=cross.set_coords(('lat', 'lon'))
 
     cross_Td = mpcalc.dewpoint_rh(cross_t['data'].values*units.celsius,
                 cross_rh['data'].values* units.percent)
@@ -207,28 +174,15 @@ def Crosssection_Wind_Theta_e_RH(
             filename=utl.filename_day_back_model(day_back=day_back,fhour=fhour)
             
         # retrieve data from micaps server
-        rh=MICAPS_IO.get_model_3D_grid(directory=data_dir[0][0:-1],filename=filename,levels=levels, allExists=False)
-        if rh is None:
+        data = fetch_model_grids([
+            (data_dir[0][0:-1], filename, levels),
+            (data_dir[1][0:-1], filename, levels),
+            (data_dir[2][0:-1], filename, levels),
+            (data_dir[3][0:-1], filename, levels),
+            (data_dir[4], filename)])
+        if data is None:
             return
-        rh = rh.metpy.parse_cf().squeeze()
-
-        u=MICAPS_IO.get_model_3D_grid(directory=data_dir[1][0:-1],filename=filename,levels=levels, allExists=False)
-        if u is None:
-            return
-        u = u.metpy.parse_cf().squeeze()
-
-        v=MICAPS_IO.get_model_3D_grid(directory=data_dir[2][0:-1],filename=filename,levels=levels, allExists=False)
-        if v is None:
-            return
-        v = v.metpy.parse_cf().squeeze()
-
-        v2=MICAPS_IO.get_model_3D_grid(directory=data_dir[2][0:-1],filename=filename,levels=levels, allExists=False)
-        v2 = v2.metpy.parse_cf().squeeze()
-
-        t=MICAPS_IO.get_model_3D_grid(directory=data_dir[3][0:-1],filename=filename,levels=levels, allExists=False)
-        t = t.metpy.parse_cf().squeeze()
-
-        gh=MICAPS_IO.get_model_grid(data_dir[4], filename=filename)
+        rh, u, v, t, gh = data
 
     if(data_source=='CIMISS'):
         # get filename
@@ -249,10 +203,6 @@ def Crosssection_Wind_Theta_e_RH(
                         data_code=utl.CMISS_data_code(data_source=model,var_name='WIV'),
                         fcst_levels=levels, fcst_ele="WIV", units='m/s')
 
-            v2=CMISS_IO.cimiss_model_3D_grid(init_time_str='20'+filename[0:8],valid_time=fhour,
-                        data_code=utl.CMISS_data_code(data_source=model,var_name='WIV'),
-                        fcst_levels=levels, fcst_ele="WIV", units='m/s')
-
             t=CMISS_IO.cimiss_model_3D_grid(init_time_str='20'+filename[0:8],valid_time=fhour,
                         data_code=utl.CMISS_data_code(data_source=model,var_name='TEM'),
                         fcst_levels=levels, fcst_ele="TEM", units='K')
@@ -266,47 +216,38 @@ def Crosssection_Wind_Theta_e_RH(
         except KeyError:
             raise ValueError('Can not find all data needed') 
 
+    _draw_Wind_Theta_e_RH(
+        rh, u, v, t, gh, st_point=st_point, ed_point=ed_point, levels=levels,
+        map_extent=map_extent, lw_ratio=lw_ratio, h_pos=h_pos,
+        output_dir=output_dir)
+
+def _draw_Wind_Theta_e_RH(rh, u, v, t, gh, st_point=None, ed_point=None,
+                          levels=None, map_extent=None, lw_ratio=None,
+                          h_pos=None, output_dir=None):
+    """
+    Compute the cross section of one forecast hour and draw it.
+    """
     rh = rh.metpy.parse_cf().squeeze()
     u = u.metpy.parse_cf().squeeze()
     v = v.metpy.parse_cf().squeeze()
-    v2 = v2.metpy.parse_cf().squeeze()
     t = t.metpy.parse_cf().squeeze()
 
+    # only the grid cells along the section are needed
+    rh = xsec.cut_to_section(rh, st_point, ed_point)
+    u = xsec.cut_to_section(u, st_point, ed_point)
+    v = xsec.cut_to_section(v, st_point, ed_point)
+    t = xsec.cut_to_section(t, st_point, ed_point)
+
     resolution=u['lon'][1]-u['lon'][0]
     x,y=np.meshgrid(u['lon'], u['lat'])
 
-    dx,dy=mpcalc.lat_lon_grid_deltas(u['lon'],u['lat'])
-    for ilvl in levels:
-        u2d=u.sel(level=ilvl)
-        #u2d['data'].attrs['units']=units.meter/units.second
-        v2d=v.sel(level=ilvl)
-        #v2d['data'].attrs['units']=units.meter/units.second
-
-        absv2d=mpcalc.absolute_vorticity(np.squeeze(u2d['data'].values)*units.meter/units.second,
-                np.squeeze(v2d['data'].values)*units.meter/units.second,dx,dy,y*units.degree)
-        
-        if(ilvl == levels[0]):
-            absv3d = v2
-            absv3d['data'].loc[dict(level=ilvl)]=np.array(absv2d)
-        else:
-            absv3d['data'].loc[dict(level=ilvl)]=np.array(absv2d)
-    absv3d['data'].attrs['units']=absv2d.units
-
     #rh=rh.rename(dict(lat='latitude',lon='longitude'))
-    cross = cross_section(rh, st_point, ed_point)
-    cross_rh=cross.set_coords(('lat', 'lon'))
-    cross = cross_section(u, st_point, ed_point)
-    cross_u=cross.set_coords(('lat', 'lon'))
-    cross = cross_section(v, st_point, ed_point)
-    cross_v=cross.set_coords(('lat', 'lon'))
+    cross_rh, cross_u, cross_v, cross_t = xsec.cross_sections(
+        [rh, u, v, t], st_point, ed_point)
 
     cross_u['data'].attrs['units']=units.meter/units.second
     cross_v['data'].attrs['units']=units.meter/units.second
     cross_u['t_wind'], cross_v['n_wind'] = mpcalc.cross_section_components(cross_u['data'],cross_v['data'])
-    
-    cross = cross_section(t, st_point, ed_point)
-    cross_t=cross.set_coords(('lat', 'lon'))
-    cross = cross_section(absv3d, st_point, ed_point)
 
     cross_Td = mpcalc.dewpoint_rh(cross_t['data'].values*units.celsius,
                 cross_rh['data'].values* units.percent)
@@ -329,6 +270,99 @@ def Crosssection_Wind_Theta_e_RH(
                     output_dir=output_dir)
 
 
+def _draw_section_job(kwargs):
+    # one image in a worker process, the figure is closed for the next job
+    _draw_Wind_Theta_e_RH(**kwargs)
+    plt.close('all')
+    return kwargs['output_dir']
+
+
+def Crosssection_Wind_Theta_e_RH_batch(
+    initTime=None, fhours=[0, 12, 24, 36, 48, 60, 72],
+    sections=[([20, 120.0], [50, 130.0])],
+    levels=[1000, 950, 925, 900, 850, 800, 700,600,500,400,300,200],
+    day_back=0,model='ECMWF',
+    output_dir=None,
+    lw_ratio = [16,9],
+    map_extent=[70,140,15,55],
+    h_pos=[0.125, 0.665, 0.25, 0.2],
+    max_workers=None):
+    """
+    Crosssection_Wind_Theta_e_RH of several sections and forecast hours.
+    每个变量只用get_model_3D_grids读取一次(所有时效, 裁剪到全部剖面线
+    覆盖的范围), 各剖面和时效的计算绘图在进程池中完成.
+    :param fhours: the list of forecast hours.
+    :param sections: the list of (st_point, ed_point), points are [lat, lon].
+    :param output_dir: the images of each section are saved in its own
+                       sub directory, named by the section points.
+    :param max_workers: the number of processes, default the number of CPUs.
+    :return: the list of the output directories of the sections.
+    :Examples:
+    >>> Crosssection_Wind_Theta_e_RH_batch(
+            fhours=[0, 24, 48], output_dir='/tmp/cross/',
+            sections=[([20, 120.], [50, 130.]), ([30, 100.], [30, 125.])])
+    """
+    if output_dir is None:
+        raise ValueError('output_dir is needed to save the images')
+
+    try:
+        data_dir = [utl.Cassandra_dir(data_type='high',data_source=model,var_name='RH',lvl=''),
+                    utl.Cassandra_dir(data_type='high',data_source=model,var_name='UGRD',lvl=''),
+                    utl.Cassandra_dir(data_type='high',data_source=model,var_name='VGRD',lvl=''),
+                    utl.Cassandra_dir(data_type='high',data_source=model,var_name='TMP',lvl=''),
+                    utl.Cassandra_dir(data_type='high',data_source=model,var_name='HGT',lvl='500')]
+    except KeyError:
+        raise ValueError('Can not find all directories needed')
+
+    # get filenames
+    if(initTime != None):
+        filenames = [utl.model_filename(initTime, fhour) for fhour in fhours]
+    else:
+        filenames = [utl.filename_day_back_model(day_back=day_back,fhour=fhour)
+                     for fhour in fhours]
+
+    # retrieve all forecast hours once, only the box of the sections
+    data = fetch_model_grids([
+        (data_dir[0][0:-1], filenames, levels),
+        (data_dir[1][0:-1], filenames, levels),
+        (data_dir[2][0:-1], filenames, levels),
+        (data_dir[3][0:-1], filenames, levels)],
+        allExists=True, bbox=xsec.sections_bbox(sections))
+    gh = fetch_model_grids(
+        [(data_dir[4], filenames)], allExists=True,
+        bbox=utl.get_padded_extent(map_extent))
+    if data is None or gh is None:
+        return
+    rh, u, v, t = data
+    gh = gh[0]
+
+    jobs = []
+    section_dirs = []
+    for st_point, ed_point in sections:
+        section_dir = os.path.join(
+            output_dir, '%g_%g-%g_%g' % (st_point[0], st_point[1],
+                                         ed_point[0], ed_point[1]))+os.sep
+        os.makedirs(section_dir, exist_ok=True)
+        section_dirs.append(section_dir)
+        section = [xsec.cut_to_section(x, st_point, ed_point)
+                   for x in (rh, u, v, t)]
+        for itime in range(len(filenames)):
+            # keep the time dimension of length 1, as the single file reads
+            jobs.append(dict(
+                rh=section[0].isel(time=[itime]),
+                u=section[1].isel(time=[itime]),
+                v=section[2].isel(time=[itime]),
+                t=section[3].isel(time=[itime]),
+                gh=gh.isel(time=[itime]),
+                st_point=st_point, ed_point=ed_point, levels=levels,
+                map_extent=map_extent, lw_ratio=lw_ratio, h_pos=h_pos,
+                output_dir=section_dir))
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        list(executor.map(_draw_section_job, jobs))
+    return section_dirs
+
+
 def Crosssection_Wind_Theta_e_Qv(
     initTime=None, fhour=24,
     levels=[1000, 950, 925, 900, 850, 800, 700,600,500,400,300,200],
@@ -357,12 +391,15 @@ def Crosssection_Wind_Theta_e_Qv(
             filename=utl.filename_day_back_model(day_back=day_back,fhour=fhour)
             
         # retrieve data from micaps server
-        rh=get_model_3D_grid(directory=data_dir[0][0:-1],filename=filename,levels=levels, allExists=False)
-        u=get_model_3D_grid(directory=data_dir[1][0:-1],filename=filename,levels=levels, allExists=False)
-        v=get_model_3D_grid(directory=data_dir[2][0:-1],filename=filename,levels=levels, allExists=False)
-        v2=get_model_3D_grid(directory=data_dir[2][0:-1],filename=filename,levels=levels, allExists=False)
-        t=get_model_3D_grid(directory=data_dir[3][0:-1],filename=filename,levels=levels, allExists=False)
-        gh=get_model_grid(data_dir[4], filename=filename)
+        data = fetch_model_grids([
+            (data_dir[0][0:-1], filename, levels),
+            (data_dir[1][0:-1], filename, levels),
+            (data_dir[2][0:-1], filename, levels),
+            (data_dir[3][0:-1], filename, levels),
+            (data_dir[4], filename)])
+        if data is None:
+            return
+        rh, u, v, t, gh = data
 
     if(data_source is 'CIMISS'):
         # get filename
@@ -389,11 +426,6 @@ def Crosssection_Wind_Theta_e_Qv(
             if v is None:
                 return
 
-            v2=CMISS_IO.cimiss_model_3D_grid(init_time_str='20'+filename[0:8],valid_time=fhour,
-                        data_code=utl.CMISS_data_code(data_source=model,var_name='WIV'),
-                        fcst_levels=levels, fcst_ele="WIV", units='m/s')
-            if v2 is None:
-                return            
 
             t=CMISS_IO.cimiss_model_3D_grid(init_time_str='20'+filename[0:8],valid_time=fhour,
                         data_code=utl.CMISS_data_code(data_source=model,var_name='TEM'),
@@ -415,44 +447,24 @@ def Crosssection_Wind_Theta_e_Qv(
     rh = rh.metpy.parse_cf().squeeze()
     u = u.metpy.parse_cf().squeeze()
     v = v.metpy.parse_cf().squeeze()
-    v2 = v2.metpy.parse_cf().squeeze()
     t = t.metpy.parse_cf().squeeze()
 
+    # only the grid cells along the section are needed
+    rh = xsec.cut_to_section(rh, st_point, ed_point)
+    u = xsec.cut_to_section(u, st_point, ed_point)
+    v = xsec.cut_to_section(v, st_point, ed_point)
+    t = xsec.cut_to_section(t, st_point, ed_point)
+
     resolution=u['lon'][1]-u['lon'][0]
     x,y=np.meshgrid(u['lon'], u['lat'])
 
-    dx,dy=mpcalc.lat_lon_grid_deltas(u['lon'],u['lat'])
-    for ilvl in levels:
-        u2d=u.sel(level=ilvl)
-        #u2d['data'].attrs['units']=units.meter/units.second
-        v2d=v.sel(level=ilvl)
-        #v2d['data'].attrs['units']=units.meter/units.second
-
-        absv2d=mpcalc.absolute_vorticity(u2d['data'].values*units.meter/units.second,
-                v2d['data'].values*units.meter/units.second,dx,dy,y*units.degree)
-        
-        if(ilvl == levels[0]):
-            absv3d = v2
-            absv3d['data'].loc[dict(level=ilvl)]=np.array(absv2d)
-        else:
-            absv3d['data'].loc[dict(level=ilvl)]=np.array(absv2d)
-    absv3d['data'].attrs['units']=absv2d.units
-
     #rh=rh.rename(dict(lat='latitude',lon='longitude'))
-    cross = cross_section(rh, st_point, ed_point)
-    cross_rh=cross.set_coords(('lat', 'lon'))
-    cross = cross_section(u, st_point, ed_point)
-    cross_u=cross.set_coords(('lat', 'lon'))
-    cross = cross_section(v, st_point, ed_point)
-    cross_v=cross.set_coords(('lat', 'lon'))
+    cross_rh, cross_u, cross_v, cross_t = xsec.cross_sections(
+        [rh, u, v, t], st_point, ed_point)
 
     cross_u['data'].attrs['units']=units.meter/units.second
     cross_v['data'].attrs['units']=units.meter/units.second
     cross_u['t_wind'], cross_v['n_wind'] = mpcalc.cross_section_components(cross_u['data'],cross_v['data'])
-    
-    cross = cross_section(t, st_point, ed_point)
-    cross_t=cross.set_coords(('lat', 'lon'))
-    cross = cross_section(absv3d, st_point, ed_point)
 
     cross_Td = mpcalc.dewpoint_rh(cross_t['data'].values*units.celsius,
                 cross_rh['data'].values* units.percent)
@@ -503,10 +515,14 @@ def Time_Crossection_rh_uv_t(initTime=None,model='ECMWF',data_source='MICAPS',
         if(initTime == None):
             initTime = get_latest_initTime(data_dir[0][0:-1]+"850")
         filenames = [initTime+'.'+str(fhour).zfill(3) for fhour in fhours]
-        TMP_4D=get_model_3D_grids(directory=data_dir[0][0:-1],filenames=filenames,levels=levels, allExists=False)
-        u_4D=get_model_3D_grids(directory=data_dir[1][0:-1],filenames=filenames,levels=levels, allExists=False)
-        v_4D=get_model_3D_grids(directory=data_dir[2][0:-1],filenames=filenames,levels=levels, allExists=False)
-        rh_4D=get_model_3D_grids(directory=data_dir[3][0:-1],filenames=filenames,levels=levels, allExists=False)
+        data = fetch_model_grids([
+            (data_dir[0][0:-1], filenames, levels),
+            (data_dir[1][0:-1], filenames, levels),
+            (data_dir[2][0:-1], filenames, levels),
+            (data_dir[3][0:-1], filenames, levels)])
+        if data is None:
+            return
+        TMP_4D, u_4D, v_4D, rh_4D = data
 
 
     if(data_source is 'CIMISS'):
@@ -566,19 +582,17 @@ def Time_Crossection_rh_uv_theta_e(initTime=None,model='ECMWF',points={'lon':[11
     if(initTime==None):
         initTime = get_latest_initTime(data_dir[0][0:-1]+"850")
     filenames = [initTime+'.'+str(fhour).zfill(3) for fhour in fhours]
-    TMP_4D=get_model_3D_grids(directory=data_dir[0][0:-1],filenames=filenames,levels=levels, allExists=False)
+    data = fetch_model_grids([
+        (data_dir[0][0:-1], filenames, levels),
+        (data_dir[1][0:-1], filenames, levels),
+        (data_dir[2][0:-1], filenames, levels),
+        (data_dir[3][0:-1], filenames, levels)])
+    if data is None:
+        return
+    TMP_4D, u_4D, v_4D, rh_4D = data
     TMP_2D=TMP_4D.interp(lon=('points', points['lon']), lat=('points', points['lat']))
-
-    filenames = [initTime+'.'+str(fhour).zfill(3) for fhour in fhours]
-    u_4D=get_model_3D_grids(directory=data_dir[1][0:-1],filenames=filenames,levels=levels, allExists=False)
     u_2D=u_4D.interp(lon=('points', points['lon']), lat=('points', points['lat']))
-
-    filenames = [initTime+'.'+str(fhour).zfill(3) for fhour in fhours]
-    v_4D=get_model_3D_grids(directory=data_dir[2][0:-1],filenames=filenames,levels=levels, allExists=False)
     v_2D=v_4D.interp(lon=('points', points['lon']), lat=('points', points['lat']))
-
-    filenames = [initTime+'.'+str(fhour).zfill(3) for fhour in fhours]
-    rh_4D=get_model_3D_grids(directory=data_dir[3][0:-1],filenames=filenames,levels=levels, allExists=False)
     rh_2D=rh_4D.interp(lon=('points', points['lon']), lat=('points', points['lat']))
     rh_2D.attrs['model']=model
     rh_2D.attrs['points']=points
@@ -627,12 +641,16 @@ def Crosssection_Wind_Temp_RH(
         else:
             filename=utl.filename_day_back_model(day_back=day_back,fhour=fhour)
             
-        rh=get_model_3D_grid(directory=data_dir[0][0:-1],filename=filename,levels=levels, allExists=False)
-        u=get_model_3D_grid(directory=data_dir[1][0:-1],filename=filename,levels=levels, allExists=False)
-        v=get_model_3D_grid(directory=data_dir[2][0:-1],filename=filename,levels=levels, allExists=False)
-        t=get_model_3D_grid(directory=data_dir[3][0:-1],filename=filename,levels=levels, allExists=False)
-        gh=get_model_grid(data_dir[4], filename=filename)
-        psfc=get_model_grid(data_dir[5], filename=filename)
+        data = fetch_model_grids([
+            (data_dir[0][0:-1], filename, levels),
+            (data_dir[1][0:-1], filename, levels),
+            (data_dir[2][0:-1], filename, levels),
+            (data_dir[3][0:-1], filename, levels),
+            (data_dir[4], filename),
+            (data_dir[5], filename)])
+        if data is None:
+            return
+        rh, u, v, t, gh, psfc = data
 
     if(data_source is 'CIMISS'):
         try:
@@ -685,6 +703,12 @@ def Crosssection_Wind_Temp_RH(
     u = u.metpy.parse_cf().squeeze()
     v = v.metpy.parse_cf().squeeze()
     t = t.metpy.parse_cf().squeeze()
+
+    # only the grid cells along the section are needed
+    rh = xsec.cut_to_section(rh, st_point, ed_point)
+    u = xsec.cut_to_section(u, st_point, ed_point)
+    v = xsec.cut_to_section(v, st_point, ed_point)
+    t = xsec.cut_to_section(t, st_point, ed_point)
     psfc=psfc.metpy.parse_cf().squeeze()
 
     if(psfc['lon'].values[0] != t['lon'].values[0]):
@@ -706,21 +730,12 @@ def Crosssection_Wind_Temp_RH(
 
     dx,dy=mpcalc.lat_lon_grid_deltas(u['lon'],u['lat'])
 
-    cross = cross_section(rh, st_point, ed_point)
-    cross_rh=cross.set_coords(('lat', 'lon'))
-    cross = cross_section(u, st_point, ed_point)
-    cross_u=cross.set_coords(('lat', 'lon'))
-    cross = cross_section(v, st_point, ed_point)
-    cross_v=cross.set_coords(('lat', 'lon'))
-    
-    cross_psfc = cross_section(psfc_bdcst, st_point, ed_point)
+    cross_rh, cross_u, cross_v, cross_Temp, cross_psfc = xsec.cross_sections(
+        [rh, u, v, t, psfc_bdcst], st_point, ed_point)
 
     cross_u['data'].attrs['units']=units.meter/units.second
     cross_v['data'].attrs['units']=units.meter/units.second
     cross_u['t_wind'], cross_v['n_wind'] = mpcalc.cross_section_components(cross_u['data'],cross_v['data'])
-    
-    cross = cross_section(t, st_point, ed_point)
-    cross_Temp=cross.set_coords(('lat', 'lon'))
 
     cross_Td = mpcalc.dewpoint_rh(cross_Temp['data'].values*units.celsius,
                 cross_rh['data'].values* units.percent)
@@ -755,11 +770,15 @@ def Time_Crossection_rh_uv_Temp(initTime=None,model='ECMWF',points={'lon':[116.3
         if(initTime==None):
             initTime = get_latest_initTime(data_dir[0][0:-1]+"850")
         filenames = [initTime+'.'+str(fhour).zfill(3) for fhour in fhours]
-        TMP_4D=get_model_3D_grids(directory=data_dir[0][0:-1],filenames=filenames,levels=levels, allExists=False)
-        u_4D=get_model_3D_grids(directory=data_dir[1][0:-1],filenames=filenames,levels=levels, allExists=False)
-        v_4D=get_model_3D_grids(directory=data_dir[2][0:-1],filenames=filenames,levels=levels, allExists=False)
-        rh_4D=get_model_3D_grids(directory=data_dir[3][0:-1],filenames=filenames,levels=levels, allExists=False)
-        Psfc_3D=get_model_grids(directory=data_dir[4][0:-1],filenames=filenames,allExists=False)
+        data = fetch_model_grids([
+            (data_dir[0][0:-1], filenames, levels),
+            (data_dir[1][0:-1], filenames, levels),
+            (data_dir[2][0:-1], filenames, levels),
+            (data_dir[3][0:-1], filenames, levels),
+            (data_dir[4][0:-1], filenames)])
+        if data is None:
+            return
+        TMP_4D, u_4D, v_4D, rh_4D, Psfc_3D = data
 
     if(data_source is 'CIMISS'):
         if(initTime != None):
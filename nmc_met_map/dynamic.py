@@ -4,8 +4,7 @@
 Synoptic analysis or diagnostic maps for numeric weather model.
 """
 import numpy as np
-from nmc_met_io.retrieve_micaps_server import get_model_grid
-import nmc_met_io.retrieve_micaps_server as MICAPS_IO
+from nmc_met_map.lib.grid_cache import get_model_grid,fetch_model_grids
 import nmc_met_io.retrieve_cimiss_server as CMISS_IO
 from nmc_met_map.graphics import dynamic_graphics
 import nmc_met_map.lib.utility as utl
@@ -22,6 +21,11 @@ def gh_uv_VVEL(initTime=None, fhour=6, day_back=0,model='ECMWF',
     if(area != '全国'):
         south_China_sea=False
 
+    if(area != None):
+        cntr_pnt,zoom_ratio=utl.get_map_area(area_name=area)
+
+    map_extent=utl.get_map_extent(cntr_pnt,zoom_ratio,map_ratio)
+
     # micaps data directory
     if(data_source=='MICAPS'):
         try:
@@ -39,18 +43,16 @@ def gh_uv_VVEL(initTime=None, fhour=6, day_back=0,model='ECMWF',
             filename=utl.filename_day_back_model(day_back=day_back,fhour=fhour)
 
         # retrieve data from micaps server
-        gh = MICAPS_IO.get_model_grid(data_dir[0], filename=filename)
-        if gh is None:
+        data = fetch_model_grids([
+            (data_dir[0], filename),
+            (data_dir[1], filename),
+            (data_dir[2], filename)],
+            bbox=utl.get_padded_extent(map_extent))
+        if data is None:
             return
-        
-        u = MICAPS_IO.get_model_grid(data_dir[1], filename=filename)
-        if u is None:
-            return
-            
-        v = MICAPS_IO.get_model_grid(data_dir[2], filename=filename)
-        if v is None:
-            return
-        w = MICAPS_IO.get_model_grid(data_dir[3], filename=filename)
+        gh, u, v = data
+
+        w = get_model_grid(data_dir[3], filename=filename)
         
         init_time = gh.coords['forecast_reference_time'].values
 
@@ -97,34 +99,14 @@ def gh_uv_VVEL(initTime=None, fhour=6, day_back=0,model='ECMWF',
             raise ValueError('Can not find all data needed')
     # prepare data
 
-    if(area != None):
-        cntr_pnt,zoom_ratio=utl.get_map_area(area_name=area)
-
-    map_extent=[0,0,0,0]
-    map_extent[0]=cntr_pnt[0]-zoom_ratio*1*map_ratio
-    map_extent[1]=cntr_pnt[0]+zoom_ratio*1*map_ratio
-    map_extent[2]=cntr_pnt[1]-zoom_ratio*1
-    map_extent[3]=cntr_pnt[1]+zoom_ratio*1
-
-    delt_x=(map_extent[1]-map_extent[0])*0.2
-    delt_y=(map_extent[3]-map_extent[2])*0.1
-
-#+ to solve the problem of labels on all the contours
-
-    mask1 = (gh['lon'] > map_extent[0]-delt_x) & (gh['lon'] < map_extent[1]+delt_x) & (gh['lat'] > map_extent[2]-delt_y) & (gh['lat'] < map_extent[3]+delt_y)
-
-    mask2 = (u['lon'] > map_extent[0]-delt_x) & (u['lon'] < map_extent[1]+delt_x) & (u['lat'] > map_extent[2]-delt_y) & (u['lat'] < map_extent[3]+delt_y)
-
-    mask3 = (w['lon'] > map_extent[0]-delt_x) & (w['lon'] < map_extent[1]+delt_x) & (w['lat'] > map_extent[2]-delt_y) & (w['lat'] < map_extent[3]+delt_y)
 
-    gh=gh.where(mask1,drop=True)
+    gh=utl.cut_to_map_extent(gh,map_extent)
     gh.attrs['model']=model
-    u=u.where(mask2,drop=True)
-    v=v.where(mask2,drop=True)
-    VVEL=w.where(mask3,drop=True)
+    u=utl.cut_to_map_extent(u,map_extent)
+    v=utl.cut_to_map_extent(v,map_extent)
+    VVEL=utl.cut_to_map_extent(w,map_extent)
     VVEL.attrs['units']='0.01Pa.s-1'
     uv=xr.merge([u.rename({'data': 'u'}),v.rename({'data': 'v'})])
-#- to solve the problem of labels on all the contours
 
     dynamic_graphics.draw_gh_uv_VVEL(
         VVEL=VVEL, gh=gh, uv=uv,
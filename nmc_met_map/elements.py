@@ -4,7 +4,7 @@
 Synoptic analysis or diagnostic maps for numeric weather model.
 """
 import numpy as np
-import nmc_met_io.retrieve_micaps_server as MICAPS_IO
+from nmc_met_map.lib.grid_cache import get_model_grid,fetch_model_grids
 import nmc_met_io.retrieve_cimiss_server as CMISS_IO
 from nmc_met_map.graphics import elements_graphics
 import nmc_met_map.lib.utility as utl
@@ -17,6 +17,11 @@ def T2m_all_type(initTime=None, fhour=24, day_back=0,model='中央气象台中
     south_China_sea=True,area = '全国',city=False,output_dir=None,
     Global=False):
 
+    if(area != None):
+        cntr_pnt,zoom_ratio=utl.get_map_area(area_name=area)
+
+    map_extent=utl.get_map_extent(cntr_pnt,zoom_ratio,map_ratio)
+
 # prepare data
     if(data_source =='MICAPS'):    
         try:
@@ -29,7 +34,8 @@ def T2m_all_type(initTime=None, fhour=24, day_back=0,model='中央气象台中
         else:
             filename=utl.filename_day_back_model(day_back=day_back,fhour=fhour)
 
-        T_2m = MICAPS_IO.get_model_grid(data_dir[0], filename=filename)
+        T_2m = get_model_grid(data_dir[0], filename=filename,
+                              bbox=utl.get_padded_extent(map_extent))
         if T_2m is None:
             return
 
@@ -55,28 +61,13 @@ def T2m_all_type(initTime=None, fhour=24, day_back=0,model='中央气象台中
     if(area != '全国'):
         south_China_sea=False
 
-    if(area != None):
-        cntr_pnt,zoom_ratio=utl.get_map_area(area_name=area)
-
-    map_extent=[0,0,0,0]
-    map_extent[0]=cntr_pnt[0]-zoom_ratio*1*map_ratio
-    map_extent[1]=cntr_pnt[0]+zoom_ratio*1*map_ratio
-    map_extent[2]=cntr_pnt[1]-zoom_ratio*1
-    map_extent[3]=cntr_pnt[1]+zoom_ratio*1
-
-    delt_x=(map_extent[1]-map_extent[0])*0.2
-    delt_y=(map_extent[3]-map_extent[2])*0.1
-
-#+ to solve the problem of labels on all the contours
-    mask1 = (T_2m['lon'] > map_extent[0]-delt_x) & (T_2m['lon'] < map_extent[1]+delt_x) & (T_2m['lat'] > map_extent[2]-delt_y) & (T_2m['lat'] < map_extent[3]+delt_y)
-    T_2m=T_2m.where(mask1,drop=True)
+    T_2m=utl.cut_to_map_extent(T_2m,map_extent)
 
     titles={
         'Tmn_2m':'过去24小时2米最低温度',
         'Tmx_2m':'过去24小时2米最高温度',
         'T2m':'2米温度'
         }
-#- to solve the problem of labels on all the contours
     T_2m.attrs['model']=model
     T_2m.attrs['title']=titles[Var_plot]
 
@@ -91,6 +82,11 @@ def T2m_mslp_uv10m(initTime=None, fhour=6, day_back=0,model='ECMWF',
     south_China_sea=True,area = '全国',city=False,output_dir=None,
     Global=False):
 
+    if(area != None):
+        cntr_pnt,zoom_ratio=utl.get_map_area(area_name=area)
+
+    map_extent=utl.get_map_extent(cntr_pnt,zoom_ratio,map_ratio)
+
 # prepare data
     if(data_source =='MICAPS'):
         try:
@@ -108,20 +104,15 @@ def T2m_mslp_uv10m(initTime=None, fhour=6, day_back=0,model='ECMWF',
             filename=utl.filename_day_back_model(day_back=day_back,fhour=fhour)
 
         # retrieve data from micaps server
-        mslp = MICAPS_IO.get_model_grid(data_dir[0], filename=filename)
-        if mslp is None:
-            return
-        
-        u10m = MICAPS_IO.get_model_grid(data_dir[1], filename=filename)
-        if u10m is None:
+        data = fetch_model_grids([
+            (data_dir[0], filename),
+            (data_dir[1], filename),
+            (data_dir[2], filename),
+            (data_dir[3], filename)],
+            bbox=utl.get_padded_extent(map_extent))
+        if data is None:
             return
-            
-        v10m = MICAPS_IO.get_model_grid(data_dir[2], filename=filename)
-        if v10m is None:
-            return
-        t2m = MICAPS_IO.get_model_grid(data_dir[3], filename=filename)
-        if t2m is None:
-            return   
+        mslp, u10m, v10m, t2m = data
 
     if(data_source =='CIMISS'):
         # get filename
@@ -166,31 +157,15 @@ def T2m_mslp_uv10m(initTime=None, fhour=6, day_back=0,model='ECMWF',
         except KeyError:
             raise ValueError('Can not find all data needed') 
 
-    if(area != None):
-        cntr_pnt,zoom_ratio=utl.get_map_area(area_name=area)
     if(area != '全国'):
         south_China_sea=False
 
-    map_extent=[0,0,0,0]
-    map_extent[0]=cntr_pnt[0]-zoom_ratio*1*map_ratio
-    map_extent[1]=cntr_pnt[0]+zoom_ratio*1*map_ratio
-    map_extent[2]=cntr_pnt[1]-zoom_ratio*1
-    map_extent[3]=cntr_pnt[1]+zoom_ratio*1
-
-    delt_x=(map_extent[1]-map_extent[0])*0.2
-    delt_y=(map_extent[3]-map_extent[2])*0.1
-
-#+ to solve the problem of labels on all the contours
-    mask1 = (t2m['lon'] > map_extent[0]-delt_x) & (t2m['lon'] < map_extent[1]+delt_x) & (t2m['lat'] > map_extent[2]-delt_y) & (t2m['lat'] < map_extent[3]+delt_y)
-    mask2 = (u10m['lon'] > map_extent[0]-delt_x) & (u10m['lon'] < map_extent[1]+delt_x) & (u10m['lat'] > map_extent[2]-delt_y) & (u10m['lat'] < map_extent[3]+delt_y)
-    mask3 = (mslp['lon'] > map_extent[0]-delt_x) & (mslp['lon'] < map_extent[1]+delt_x) & (mslp['lat'] > map_extent[2]-delt_y) & (mslp['lat'] < map_extent[3]+delt_y)
-
-    t2m=t2m.where(mask1,drop=True)
+    t2m=utl.cut_to_map_extent(t2m,map_extent)
     t2m.attrs['model']=model
-    u10m=u10m.where(mask2,drop=True)
-    v10m=v10m.where(mask2,drop=True)
+    u10m=utl.cut_to_map_extent(u10m,map_extent)
+    v10m=utl.cut_to_map_extent(v10m,map_extent)
     uv10m=xr.merge([u10m.rename({'data': 'u10m'}),v10m.rename({'data': 'v10m'})])
-    mslp=mslp.where(mask3,drop=True)
+    mslp=utl.cut_to_map_extent(mslp,map_extent)
     mslp.attrs['model']=model
 
 # draw
@@ -205,6 +180,11 @@ def mslp_gust10m(initTime=None, fhour=6, day_back=0,model='ECMWF',
     south_China_sea=True,area = '全国',city=False,output_dir=None,
     Global=False):
 
+    if(area != None):
+        cntr_pnt,zoom_ratio=utl.get_map_area(area_name=area)
+
+    map_extent=utl.get_map_extent(cntr_pnt,zoom_ratio,map_ratio)
+
     # micaps data directory
     if(data_source =='MICAPS'):   
         try:
@@ -220,13 +200,13 @@ def mslp_gust10m(initTime=None, fhour=6, day_back=0,model='ECMWF',
             filename=utl.filename_day_back_model(day_back=day_back,fhour=fhour)
 
         # retrieve data from micaps server
-        mslp = MICAPS_IO.get_model_grid(data_dir[0], filename=filename)
-        if mslp is None:
-            return
-        
-        gust = MICAPS_IO.get_model_grid(data_dir[1], filename=filename)
-        if gust is None:
+        data = fetch_model_grids([
+            (data_dir[0], filename),
+            (data_dir[1], filename)],
+            bbox=utl.get_padded_extent(map_extent))
+        if data is None:
             return
+        mslp, gust = data
 
     if(data_source =='CIMISS'):
 
@@ -256,28 +236,12 @@ def mslp_gust10m(initTime=None, fhour=6, day_back=0,model='ECMWF',
         except KeyError:
             raise ValueError('Can not find all data needed') 
     # prepare data
-
-    if(area != None):
-        cntr_pnt,zoom_ratio=utl.get_map_area(area_name=area)
-
     if(area != '全国'):
         south_China_sea=False
 
-    map_extent=[0,0,0,0]
-    map_extent[0]=cntr_pnt[0]-zoom_ratio*1*map_ratio
-    map_extent[1]=cntr_pnt[0]+zoom_ratio*1*map_ratio
-    map_extent[2]=cntr_pnt[1]-zoom_ratio*1
-    map_extent[3]=cntr_pnt[1]+zoom_ratio*1
-
-    delt_x=(map_extent[1]-map_extent[0])*0.2
-    delt_y=(map_extent[3]-map_extent[2])*0.1
-
-#+ to solve the problem of labels on all the contours
-    mask1 = (gust['lon'] > map_extent[0]-delt_x) & (gust['lon'] < map_extent[1]+delt_x) & (gust['lat'] > map_extent[2]-delt_y) & (gust['lat'] < map_extent[3]+delt_y)
-    mask2 = (mslp['lon'] > map_extent[0]-delt_x) & (mslp['lon'] < map_extent[1]+delt_x) & (mslp['lat'] > map_extent[2]-delt_y) & (mslp['lat'] < map_extent[3]+delt_y)
    
-    gust=gust.where(mask1,drop=True)
-    mslp=mslp.where(mask2,drop=True)
+    gust=utl.cut_to_map_extent(gust,map_extent)
+    mslp=utl.cut_to_map_extent(mslp,map_extent)
     mslp.attrs['model']=model
 
     elements_graphics.draw_mslp_gust10m(
@@ -291,6 +255,11 @@ def low_level_wind(initTime=None, fhour=6, day_back=0,model='ECMWF',wind_level='
     south_China_sea=True,area = '全国',city=False,output_dir=None,
     Global=False):
 
+    if(area != None):
+        cntr_pnt,zoom_ratio=utl.get_map_area(area_name=area)
+
+    map_extent=utl.get_map_extent(cntr_pnt,zoom_ratio,map_ratio)
+
     # micaps data directory
     if(data_source =='MICAPS'):
         try:
@@ -306,20 +275,17 @@ def low_level_wind(initTime=None, fhour=6, day_back=0,model='ECMWF',wind_level='
             filename=utl.filename_day_back_model(day_back=day_back,fhour=fhour)
 
         # retrieve data from micaps server
-        u10m = MICAPS_IO.get_model_grid(data_dir[0], filename=filename)
-        if u10m is None:
-            return
-        
-        v10m = MICAPS_IO.get_model_grid(data_dir[1], filename=filename)
-        if v10m is None:
+        data = fetch_model_grids([
+            (data_dir[0], filename),
+            (data_dir[1], filename)],
+            bbox=utl.get_padded_extent(map_extent))
+        if data is None:
             return
-            
+        u10m, v10m = data
+
         init_time = v10m.coords['forecast_reference_time'].values
 
         # prepare data
-
-        if(area != None):
-            cntr_pnt,zoom_ratio=utl.get_map_area(area_name=area)
         if(area != '全国'):
             south_China_sea=False
     if(data_source =='CIMISS'):
@@ -344,20 +310,8 @@ def low_level_wind(initTime=None, fhour=6, day_back=0,model='ECMWF',wind_level='
         except KeyError:
             raise ValueError('Can not find all data needed') 
 
-    map_extent=[0,0,0,0]
-    map_extent[0]=cntr_pnt[0]-zoom_ratio*1*map_ratio
-    map_extent[1]=cntr_pnt[0]+zoom_ratio*1*map_ratio
-    map_extent[2]=cntr_pnt[1]-zoom_ratio*1
-    map_extent[3]=cntr_pnt[1]+zoom_ratio*1
-
-    delt_x=(map_extent[1]-map_extent[0])*0.2
-    delt_y=(map_extent[3]-map_extent[2])*0.1
-
-#+ to solve the problem of labels on all the contours
-    mask1 = (v10m['lon'] > map_extent[0]-delt_x) & (v10m['lon'] < map_extent[1]+delt_x) & (v10m['lat'] > map_extent[2]-delt_y) & (v10m['lat'] < map_extent[3]+delt_y)
-
-    u10m=u10m.where(mask1,drop=True)
-    v10m=v10m.where(mask1,drop=True)
+    u10m=utl.cut_to_map_extent(u10m,map_extent)
+    v10m=utl.cut_to_map_extent(v10m,map_extent)
     uv=xr.merge([u10m.rename({'data': 'u'}),v10m.rename({'data': 'v'})])
     uv.attrs['model']=model
     uv.attrs['level']=wind_level
@@ -4,7 +4,6 @@ import numpy as np
 import matplotlib as mpl
 import matplotlib.pyplot as plt
 import cartopy.crs as ccrs
-import cartopy.feature as cfeature
 from cartopy.mpl.gridliner import LONGITUDE_FORMATTER, LATITUDE_FORMATTER
 from nmc_met_graphics.plot.china_map import add_china_map_2cartopy
 from nmc_met_graphics.cmap.cm import guide_cmaps
@@ -70,16 +69,9 @@ def draw_gh_rain(gh=None, rain=None,
     str(int(rain.attrs['atime']))+'小时降水', 
         loc='left', fontsize=30)
         
-    ax.add_feature(cfeature.OCEAN)
-    utl.add_china_map_2cartopy_public(
-        ax, name='coastline', edgecolor='gray', lw=0.8, zorder=3,alpha=0.5)
-    if add_china:
-        utl.add_china_map_2cartopy_public(
-            ax, name='province', edgecolor='gray', lw=0.5, zorder=3)
-        utl.add_china_map_2cartopy_public(
-            ax, name='nation', edgecolor='black', lw=0.8, zorder=3)
-        utl.add_china_map_2cartopy_public(
-            ax, name='river', edgecolor='#74b9ff', lw=0.8, zorder=3,alpha=0.5)
+    utl.add_cached_basemap(ax, layers=utl.BASEMAP_UNDER_LAYERS, zorder=0, dpi=200)
+    utl.add_cached_basemap(
+        ax, layers=utl.china_map_layers(add_china), zorder=3, dpi=200)
 
 
     # grid lines
@@ -88,7 +80,6 @@ def draw_gh_rain(gh=None, rain=None,
     gl.xlocator = mpl.ticker.FixedLocator(np.arange(0, 360, 15))
     gl.ylocator = mpl.ticker.FixedLocator(np.arange(-90, 90, 15))
 
-    utl.add_cartopy_background(ax,name='RD')
 
     l, b, w, h = ax.get_position().bounds
 
@@ -206,16 +197,9 @@ def draw_mslp_rain_snow(
             linewidths=2, transform=datacrs, zorder=3)
         plt.clabel(plots['mslp'], inline=1, fontsize=20, fmt='%.0f',colors='black')
 #additional information
-    ax.add_feature(cfeature.OCEAN)
-    utl.add_china_map_2cartopy_public(
-        ax, name='coastline', edgecolor='gray', lw=0.8, zorder=1,alpha=0.5)
-    if add_china:
-        utl.add_china_map_2cartopy_public(
-            ax, name='province', edgecolor='gray', lw=0.5, zorder=1)
-        utl.add_china_map_2cartopy_public(
-            ax, name='nation', edgecolor='black', lw=0.8, zorder=1)
-        utl.add_china_map_2cartopy_public(
-            ax, name='river', edgecolor='#74b9ff', lw=0.8, zorder=1,alpha=0.5)
+    utl.add_cached_basemap(ax, layers=utl.BASEMAP_UNDER_LAYERS, zorder=0, dpi=200)
+    utl.add_cached_basemap(
+        ax, layers=utl.china_map_layers(add_china), zorder=1, dpi=200)
 
     # grid lines
     gl = ax.gridlines(
@@ -223,7 +207,6 @@ def draw_mslp_rain_snow(
     gl.xlocator = mpl.ticker.FixedLocator(np.arange(0, 360, 15))
     gl.ylocator = mpl.ticker.FixedLocator(np.arange(-90, 90, 15))
 
-    utl.add_cartopy_background(ax,name='RD')
 
     l, b, w, h = ax.get_position().bounds
 
@@ -338,16 +321,9 @@ def draw_Rain_evo(
                 label_handles.append(mpatches.Patch(color=per_color.reshape(4),alpha=0.2+itime*((1-0.2)/len(rain['time'].values)), label=labels))
         leg = plt.legend(handles=label_handles, loc=3,framealpha=1)
 #additional information
-    ax.add_feature(cfeature.OCEAN)
-    utl.add_china_map_2cartopy_public(
-        ax, name='coastline', edgecolor='gray', lw=0.8, zorder=1,alpha=0.5)
-    if add_china:
-        utl.add_china_map_2cartopy_public(
-            ax, name='province', edgecolor='gray', lw=0.5, zorder=1)
-        utl.add_china_map_2cartopy_public(
-            ax, name='nation', edgecolor='black', lw=0.8, zorder=1)
-        utl.add_china_map_2cartopy_public(
-            ax, name='river', edgecolor='#74b9ff', lw=0.8, zorder=1,alpha=0.5)
+    utl.add_cached_basemap(ax, layers=utl.BASEMAP_UNDER_LAYERS, zorder=0, dpi=200)
+    utl.add_cached_basemap(
+        ax, layers=utl.china_map_layers(add_china), zorder=1, dpi=200)
 
     # grid lines
     gl = ax.gridlines(
@@ -355,7 +331,6 @@ def draw_Rain_evo(
     gl.xlocator = mpl.ticker.FixedLocator(np.arange(0, 360, 15))
     gl.ylocator = mpl.ticker.FixedLocator(np.arange(-90, 90, 15))
 
-    utl.add_cartopy_background(ax,name='RD')
 
     l, b, w, h = ax.get_position().bounds
 
@@ -407,7 +382,7 @@ def draw_cumulated_precip_evo(
         map_extent=(50, 150, 0, 65),
         regrid_shape=20,
         add_china=True,city=True,south_China_sea=True,
-        output_dir=None,Global=False):
+        output_dir=None,Global=False,anim_format='gif'):
 # set font
     plt.rcParams['font.sans-serif'] = ['SimHei'] # 步骤一（替换sans-serif字体）
     plt.rcParams['axes.unicode_minus'] = False  # 步骤二（解决坐标轴负数的负号显示问题）
@@ -443,16 +418,9 @@ def draw_cumulated_precip_evo(
     '逐'+str(rain.attrs['t_gap'])+'小时降水演变',
         loc='left', fontsize=30)
 
-    ax.add_feature(cfeature.OCEAN)
-    utl.add_china_map_2cartopy_public(
-        ax, name='coastline', edgecolor='gray', lw=0.8, zorder=3,alpha=0.5)
-    if add_china:
-        utl.add_china_map_2cartopy_public(
-            ax, name='province', edgecolor='gray', lw=0.5, zorder=3)
-        utl.add_china_map_2cartopy_public(
-            ax, name='nation', edgecolor='black', lw=0.8, zorder=3)
-        utl.add_china_map_2cartopy_public(
-            ax, name='river', edgecolor='#74b9ff', lw=0.8, zorder=3,alpha=0.5)
+    utl.add_cached_basemap(ax, layers=utl.BASEMAP_UNDER_LAYERS, zorder=0, dpi=100)
+    utl.add_cached_basemap(
+        ax, layers=utl.china_map_layers(add_china), zorder=3, dpi=100)
 
     # grid lines
     gl = ax.gridlines(
@@ -460,7 +428,6 @@ def draw_cumulated_precip_evo(
     gl.xlocator = mpl.ticker.FixedLocator(np.arange(0, 360, 15))
     gl.ylocator = mpl.ticker.FixedLocator(np.arange(-90, 90, 15))
 
-    utl.add_cartopy_background(ax,name='RD')
 
     l, b, w, h = ax.get_position().bounds
 
@@ -501,23 +468,27 @@ def draw_cumulated_precip_evo(
     if city:
         utl.add_city_on_map(ax,map_extent=map_extent2,transform=datacrs,zorder=2,size=13,small_city=small_city)
 
+    nframes=len(rain.coords['forecast_period'].values)
+    mesh_shape=plots['rain'].get_array().shape
     def update(frame_number):
         fcst_time=initTime+timedelta(hours=rain.coords['forecast_period'].values[frame_number])
         valid_fhour.set_text('预报时间: '+fcst_time.strftime("%Y年%m月%d日%H时"))
         txt_fhour.set_text('预报时效: '+str(int(rain.coords['forecast_period'].values[frame_number]))+'小时')
-        return ax.pcolormesh(
-            x,y,np.squeeze(z[frame_number,:,:]), norm=norm,
-            cmap=cmap, zorder=1,transform=datacrs,alpha=0.5)
+        # one QuadMesh for all the frames, only its values change
+        zt=np.squeeze(z[frame_number,:,:])
+        if(zt.size != np.prod(mesh_shape)):
+            zt=zt[:-1,:-1]
+        plots['rain'].set_array(np.ma.masked_invalid(zt).reshape(mesh_shape))
+        return plots['rain'],
 
-    animation = FuncAnimation(fig, update, frames=4,interval=1000)
     # show figure
     if(output_dir != None):
-        animation.save(output_dir+'高度场_降水_预报_'+
-        '起报时间_'+initTime.strftime("%Y年%m月%d日%H时")+
-        '预报时效_'+str(int(rain.coords['forecast_period'].values[0]))+'小时'+'.gif')
+        utl.write_animation(fig, update, range(nframes),
+            output_dir+'高度场_降水_预报_'+
+            '起报时间_'+initTime.strftime("%Y年%m月%d日%H时")+
+            '预报时效_'+str(int(rain.coords['forecast_period'].values[0]))+'小时'+'.'+anim_format,
+            fps=1)
 
     if(output_dir == None):
-        #animation.save('rain.gif', fps=75, writer='imagemagick')
-        plt.show()
-        #plt.draw()
-        #plt.pause(0.1)
\ No newline at end of file
+        animation = FuncAnimation(fig, update, frames=nframes,interval=1000)
+        plt.show()
\ No newline at end of file
@@ -7,7 +7,6 @@ import numpy as np
 import matplotlib as mpl
 import matplotlib.pyplot as plt
 import cartopy.crs as ccrs
-import cartopy.feature as cfeature
 from cartopy.mpl.gridliner import LONGITUDE_FORMATTER, LATITUDE_FORMATTER
 from nmc_met_graphics.plot.china_map import add_china_map_2cartopy
 from nmc_met_graphics.cmap.cm import guide_cmaps
@@ -53,16 +52,9 @@ def draw_gh_uv_VVEL(gh=None, uv=None, VVEL=None,
     map_extent2=utl.adjust_map_ratio(ax,map_extent=map_extent,datacrs=datacrs)
     #adapt to the map ratio
 
-    ax.add_feature(cfeature.OCEAN)
-    utl.add_china_map_2cartopy_public(
-        ax, name='coastline', edgecolor='gray', lw=0.8, zorder=5,alpha=0.5)
-    if add_china:
-        utl.add_china_map_2cartopy_public(
-            ax, name='province', edgecolor='gray', lw=0.5, zorder=5)
-        utl.add_china_map_2cartopy_public(
-            ax, name='nation', edgecolor='black', lw=0.8, zorder=5)
-        utl.add_china_map_2cartopy_public(
-            ax, name='river', edgecolor='#74b9ff', lw=0.8, zorder=5,alpha=0.5)
+    utl.add_cached_basemap(ax, layers=utl.BASEMAP_UNDER_LAYERS, zorder=0, dpi=200)
+    utl.add_cached_basemap(
+        ax, layers=utl.china_map_layers(add_china), zorder=5, dpi=200)
 
     # define return plots
     plots = {}
@@ -109,7 +101,6 @@ def draw_gh_uv_VVEL(gh=None, uv=None, VVEL=None,
     gl.xlocator = mpl.ticker.FixedLocator(np.arange(0, 360, 15))
     gl.ylocator = mpl.ticker.FixedLocator(np.arange(-90, 90, 15))
 
-    utl.add_cartopy_background(ax,name='RD')
     
     #forecast information
     l, b, w, h = ax.get_position().bounds
@@ -4,7 +4,6 @@ import numpy as np
 import matplotlib as mpl
 import matplotlib.pyplot as plt
 import cartopy.crs as ccrs
-import cartopy.feature as cfeature
 from cartopy.mpl.gridliner import LONGITUDE_FORMATTER, LATITUDE_FORMATTER
 from nmc_met_graphics.plot.china_map import add_china_map_2cartopy
 from nmc_met_graphics.cmap.cm import guide_cmaps
@@ -60,16 +59,9 @@ def draw_T_2m(T_2m=None,
     plt.title('['+T_2m.attrs['model']+']'+' '+T_2m.attrs['title'], 
         loc='left', fontsize=30)
 
-    ax.add_feature(cfeature.OCEAN)
-    utl.add_china_map_2cartopy_public(
-        ax, name='coastline', edgecolor='gray', lw=0.8, zorder=105,alpha=0.5)
-    if add_china:
-        utl.add_china_map_2cartopy_public(
-            ax, name='province', edgecolor='gray', lw=0.5, zorder=105)
-        utl.add_china_map_2cartopy_public(
-            ax, name='nation', edgecolor='black', lw=0.8, zorder=105)
-        utl.add_china_map_2cartopy_public(
-            ax, name='river', edgecolor='#74b9ff', lw=0.8, zorder=105,alpha=0.5)
+    utl.add_cached_basemap(ax, layers=utl.BASEMAP_UNDER_LAYERS, zorder=0, dpi=200)
+    utl.add_cached_basemap(
+        ax, layers=utl.china_map_layers(add_china), zorder=105, dpi=200)
 
     # grid lines
     gl = ax.gridlines(
@@ -77,7 +69,6 @@ def draw_T_2m(T_2m=None,
     gl.xlocator = mpl.ticker.FixedLocator(np.arange(0, 360, 15))
     gl.ylocator = mpl.ticker.FixedLocator(np.arange(-90, 90, 15))
 
-    utl.add_cartopy_background(ax,name='RD')
 
     l, b, w, h = ax.get_position().bounds
 
@@ -187,16 +178,9 @@ def draw_T2m_mslp_uv10m(t2m=None, mslp=None, uv10m=None,
         '10米风场, '+
         '2米 温度', 
         loc='left', fontsize=30)
-    ax.add_feature(cfeature.OCEAN)
-    utl.add_china_map_2cartopy_public(
-        ax, name='coastline', edgecolor='gray', lw=0.8, zorder=4,alpha=0.5)
-    if add_china:
-        utl.add_china_map_2cartopy_public(
-            ax, name='province', edgecolor='gray', lw=0.5, zorder=4)
-        utl.add_china_map_2cartopy_public(
-            ax, name='nation', edgecolor='black', lw=0.8, zorder=4)
-        utl.add_china_map_2cartopy_public(
-            ax, name='river', edgecolor='#74b9ff', lw=0.8, zorder=4,alpha=0.5)
+    utl.add_cached_basemap(ax, layers=utl.BASEMAP_UNDER_LAYERS, zorder=0, dpi=200)
+    utl.add_cached_basemap(
+        ax, layers=utl.china_map_layers(add_china), zorder=4, dpi=200)
 
     # grid lines
     gl = ax.gridlines(
@@ -204,7 +188,6 @@ def draw_T2m_mslp_uv10m(t2m=None, mslp=None, uv10m=None,
     gl.xlocator = mpl.ticker.FixedLocator(np.arange(0, 360, 15))
     gl.ylocator = mpl.ticker.FixedLocator(np.arange(-90, 90, 15))
 
-    utl.add_cartopy_background(ax,name='RD')
 
     l, b, w, h = ax.get_position().bounds
 
@@ -306,16 +289,9 @@ def draw_mslp_gust10m(gust=None, mslp=None,
         '逐6小时最大阵风 ', 
         loc='left', fontsize=30)
 
-    ax.add_feature(cfeature.OCEAN)
-    utl.add_china_map_2cartopy_public(
-        ax, name='coastline', edgecolor='gray', lw=0.8, zorder=3,alpha=0.5)
-    if add_china:
-        utl.add_china_map_2cartopy_public(
-            ax, name='province', edgecolor='gray', lw=0.5, zorder=3)
-        utl.add_china_map_2cartopy_public(
-            ax, name='nation', edgecolor='black', lw=0.8, zorder=3)
-        utl.add_china_map_2cartopy_public(
-            ax, name='river', edgecolor='#74b9ff', lw=0.8, zorder=3,alpha=0.5)
+    utl.add_cached_basemap(ax, layers=utl.BASEMAP_UNDER_LAYERS, zorder=0, dpi=200)
+    utl.add_cached_basemap(
+        ax, layers=utl.china_map_layers(add_china), zorder=3, dpi=200)
 
     # grid lines
     gl = ax.gridlines(
@@ -323,7 +299,6 @@ def draw_mslp_gust10m(gust=None, mslp=None,
     gl.xlocator = mpl.ticker.FixedLocator(np.arange(0, 360, 15))
     gl.ylocator = mpl.ticker.FixedLocator(np.arange(-90, 90, 15))
 
-    utl.add_cartopy_background(ax,name='RD')
 
     l, b, w, h = ax.get_position().bounds
 
@@ -432,16 +407,9 @@ def draw_low_level_wind(uv=None,
     map_extent2=utl.adjust_map_ratio(ax,map_extent=map_extent,datacrs=datacrs)
     #adapt to the map ratio
 
-    ax.add_feature(cfeature.OCEAN)
-    utl.add_china_map_2cartopy_public(
-        ax, name='coastline', edgecolor='gray', lw=0.8, zorder=2,alpha=0.5)
-    if add_china:
-        utl.add_china_map_2cartopy_public(
-            ax, name='province', edgecolor='gray', lw=0.5, zorder=2)
-        utl.add_china_map_2cartopy_public(
-            ax, name='nation', edgecolor='black', lw=0.8, zorder=2)
-        utl.add_china_map_2cartopy_public(
-            ax, name='river', edgecolor='#74b9ff', lw=0.8, zorder=2,alpha=0.5)
+    utl.add_cached_basemap(ax, layers=utl.BASEMAP_UNDER_LAYERS, zorder=0, dpi=200)
+    utl.add_cached_basemap(
+        ax, layers=utl.china_map_layers(add_china), zorder=2, dpi=200)
 
     # grid lines
     gl = ax.gridlines(
@@ -449,7 +417,6 @@ def draw_low_level_wind(uv=None,
     gl.xlocator = mpl.ticker.FixedLocator(np.arange(0, 360, 15))
     gl.ylocator = mpl.ticker.FixedLocator(np.arange(-90, 90, 15))
 
-    utl.add_cartopy_background(ax,name='RD')
 
     l, b, w, h = ax.get_position().bounds
 
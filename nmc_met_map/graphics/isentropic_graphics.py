@@ -7,7 +7,6 @@ import numpy as np
 import matplotlib as mpl
 import matplotlib.pyplot as plt
 import cartopy.crs as ccrs
-import cartopy.feature as cfeature
 from cartopy.mpl.gridliner import LONGITUDE_FORMATTER, LATITUDE_FORMATTER
 from nmc_met_graphics.plot.china_map import add_china_map_2cartopy
 from nmc_met_graphics.cmap.cm import guide_cmaps
@@ -80,16 +79,9 @@ def draw_isentropic_uv(isentrh=None, isentuv=None, isentprs=None,
     str(isentrh['level'].values)+'等熵面  风场 相对湿度 气压', 
         loc='left', fontsize=30)
 
-    ax.add_feature(cfeature.OCEAN)
-    utl.add_china_map_2cartopy_public(
-        ax, name='coastline', edgecolor='gray', lw=0.8, zorder=105,alpha=0.5)
-    if add_china:
-        utl.add_china_map_2cartopy_public(
-            ax, name='province', edgecolor='gray', lw=0.5, zorder=105)
-        utl.add_china_map_2cartopy_public(
-            ax, name='nation', edgecolor='black', lw=0.8, zorder=105)
-        utl.add_china_map_2cartopy_public(
-            ax, name='river', edgecolor='#74b9ff', lw=0.8, zorder=105,alpha=0.5)
+    utl.add_cached_basemap(ax, layers=utl.BASEMAP_UNDER_LAYERS, zorder=0, dpi=200)
+    utl.add_cached_basemap(
+        ax, layers=utl.china_map_layers(add_china), zorder=105, dpi=200)
 
     # grid lines
     gl = ax.gridlines(
@@ -97,7 +89,6 @@ def draw_isentropic_uv(isentrh=None, isentuv=None, isentprs=None,
     gl.xlocator = mpl.ticker.FixedLocator(np.arange(0, 360, 15))
     gl.ylocator = mpl.ticker.FixedLocator(np.arange(-90, 90, 15))
 
-    utl.add_cartopy_background(ax,name='RD')
 
     l, b, w, h = ax.get_position().bounds
 
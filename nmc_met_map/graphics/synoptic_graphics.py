@@ -7,7 +7,6 @@ import numpy as np
 import matplotlib as mpl
 import matplotlib.pyplot as plt
 import cartopy.crs as ccrs
-import cartopy.feature as cfeature
 from cartopy.mpl.gridliner import LONGITUDE_FORMATTER, LATITUDE_FORMATTER
 from nmc_met_graphics.plot.china_map import add_china_map_2cartopy
 from nmc_met_graphics.cmap.cm import guide_cmaps
@@ -17,6 +16,7 @@ from datetime import datetime, timedelta
 import pandas as pd
 import locale
 import sys
+import time
 from matplotlib.colors import BoundaryNorm,ListedColormap
 import nmc_met_graphics.cmap.ctables as dk_ctables
 
@@ -52,16 +52,9 @@ def draw_gh_uv_mslp(gh=None, uv=None, mslp=None,
     map_extent2=utl.adjust_map_ratio(ax,map_extent=map_extent,datacrs=datacrs)
     #adapt to the map ratio
 
-    ax.add_feature(cfeature.OCEAN)
-    utl.add_china_map_2cartopy_public(
-        ax, name='coastline', edgecolor='gray', lw=0.8, zorder=5,alpha=0.5)
-    if add_china:
-        utl.add_china_map_2cartopy_public(
-            ax, name='province', edgecolor='gray', lw=0.5, zorder=5)
-        utl.add_china_map_2cartopy_public(
-            ax, name='nation', edgecolor='black', lw=0.8, zorder=5)
-        utl.add_china_map_2cartopy_public(
-            ax, name='river', edgecolor='#74b9ff', lw=0.8, zorder=5,alpha=0.5)
+    utl.add_cached_basemap(ax, layers=utl.BASEMAP_UNDER_LAYERS, zorder=0, dpi=200)
+    utl.add_cached_basemap(
+        ax, layers=utl.china_map_layers(add_china), zorder=5, dpi=200)
 
     # define return plots
     plots = {}
@@ -99,7 +92,6 @@ def draw_gh_uv_mslp(gh=None, uv=None, mslp=None,
     gl.xlocator = mpl.ticker.FixedLocator(np.arange(0, 360, 15))
     gl.ylocator = mpl.ticker.FixedLocator(np.arange(-90, 90, 15))
 
-    utl.add_cartopy_background(ax,name='RD')
     #forecast information
     l, b, w, h = ax.get_position().bounds
 
@@ -149,6 +141,232 @@ def draw_gh_uv_mslp(gh=None, uv=None, mslp=None,
     if(output_dir == None):
         plt.show()
 
+def _draw_gh_uv_sweep(gh=None, uv=None, draw_shading=None,
+                    title='', cbar=None, output_name='',
+                    gh_color='black', city_zorder=110, city_size=13,
+                    map_extent=(50, 150, 0, 65),
+                    regrid_shape=20,
+                    add_china=True,city=True,south_China_sea=True,
+                    output_dir=None,Global=False):
+    """
+    Draw a gh/uv map with a shaded field for every forecast hour along the
+    time dimension. The figure, map background, logo and colorbar are built
+    once, only the data layers and forecast time labels are replaced for
+    each frame.
+    :param draw_shading: function(ax, itime, datacrs) drawing the shaded
+                         field of the itime-th frame, returns the artist.
+    :param title: the title after the levels of gh and uv.
+    :param cbar: dict of the colorbar, {'ticks', 'extend', 'label'}.
+    :param output_name: the head of the image filenames.
+    :return: dict, {forecast hour: seconds used to draw and save the frame}
+    """
+
+    if(output_dir == None):
+        raise ValueError('output_dir is required to draw a forecast hour sweep')
+
+    plt.rcParams['font.sans-serif'] = ['SimHei'] # 步骤一（替换sans-serif字体）
+    plt.rcParams['axes.unicode_minus'] = False  # 步骤二（解决坐标轴负数的负号显示问题）
+
+    # draw figure
+    fig = plt.figure(figsize=(16,9))
+
+    # set data projection
+    if(Global == True):
+        plotcrs = ccrs.Robinson(central_longitude=115.)
+    else:
+        plotcrs = ccrs.AlbersEqualArea(central_latitude=(map_extent[2]+map_extent[3])/2., 
+            central_longitude=(map_extent[0]+map_extent[1])/2., standard_parallels=[30., 60.])
+ 
+    ax = plt.axes([0.01,0.1,.98,.84], projection=plotcrs)
+    
+    plt.title('['+gh.attrs['model']+'] '+
+    str(int(gh['level'].values[0]))+'hPa 位势高度场, '+
+    str(int(uv['level'].values[0]))+'hPa 风场, '+title, 
+        loc='left', fontsize=30)
+        
+    datacrs = ccrs.PlateCarree()
+
+    #adapt to the map ratio
+    map_extent2=utl.adjust_map_ratio(ax,map_extent=map_extent,datacrs=datacrs)
+    #adapt to the map ratio
+
+    utl.add_cached_basemap(ax, layers=utl.BASEMAP_UNDER_LAYERS, zorder=0, dpi=200)
+    utl.add_cached_basemap(
+        ax, layers=utl.china_map_layers(add_china), zorder=5, dpi=200)
+
+    # grid lines
+    gl = ax.gridlines(
+        crs=datacrs, linewidth=2, color='gray', alpha=0.5, linestyle='--', zorder=4)
+    gl.xlocator = mpl.ticker.FixedLocator(np.arange(0, 360, 15))
+    gl.ylocator = mpl.ticker.FixedLocator(np.arange(-90, 90, 15))
+
+    #forecast information
+    l, b, w, h = ax.get_position().bounds
+
+    bax=plt.axes([l,b+h-0.1,.25,.1],facecolor='#FFFFFFCC')
+    bax.set_yticks([])
+    bax.set_xticks([])
+    bax.axis([0, 10, 0, 10])
+
+    initTime = pd.to_datetime(
+    str(gh.coords['forecast_reference_time'].values)).replace(tzinfo=None).to_pydatetime()
+    #发布时间
+    if(sys.platform[0:3] == 'lin'):
+        locale.setlocale(locale.LC_CTYPE, 'zh_CN.utf8')
+    if(sys.platform[0:3] == 'win'):        
+        locale.setlocale(locale.LC_CTYPE, 'chinese')
+    bax.text(2.5, 7.5,'起报时间: '+initTime.strftime("%Y年%m月%d日%H时"),size=15)
+    bax.text(2.5, 0.5,'www.nmc.cn',size=15)
+
+    # add south China sea
+    if south_China_sea:
+        utl.add_south_China_sea(pos=[l+w-0.091,b,.1,.2])
+
+    small_city=False
+    if(map_extent2[1]-map_extent2[0] < 25):
+        small_city=True
+    if city:
+        utl.add_city_on_map(ax,map_extent=map_extent2,transform=datacrs,zorder=city_zorder,size=city_size,small_city=small_city)
+
+    utl.add_logo_extra_in_axes(pos=[l-0.02,b+h-0.1,.1,.1],which='nmc', size='Xlarge')
+
+    x_uv, y_uv = np.meshgrid(uv['lon'], uv['lat'])
+    x_gh, y_gh = np.meshgrid(gh['lon'], gh['lat'])
+    clevs_gh = np.append(np.append(np.arange(0, 480, 4),np.append(np.arange(480, 584, 8), np.arange(580, 604, 4))), np.arange(604, 2000, 8))
+
+    timing = {}
+    cb = None
+    for itime in range(0,len(gh['forecast_period'].values)):
+        t_start = time.time()
+        fhour = int(gh['forecast_period'].values[itime])
+
+        # draw the data layers of this forecast hour
+        plots = {}
+        plots['shading'] = draw_shading(ax, itime, datacrs)
+        u = np.squeeze(uv['u'].values[itime]) * 2.5
+        v = np.squeeze(uv['v'].values[itime]) * 2.5
+        plots['uv'] = ax.barbs(
+            x_uv, y_uv, u, v, length=6, regrid_shape=regrid_shape,
+            transform=datacrs, fill_empty=False, sizes=dict(emptybarb=0.05),
+            zorder=2)
+        plots['gh'] = ax.contour(
+            x_gh, y_gh, np.squeeze(gh['data'].values[itime]), clevs_gh, colors=gh_color,
+            linewidths=2, transform=datacrs, zorder=3)
+        ax.clabel(plots['gh'], inline=1, fontsize=20, fmt='%.0f',colors='black')
+
+        fcst_time=initTime+timedelta(hours=fhour)
+        plots['fcst_time'] = bax.text(2.5, 5,'预报时间: '+fcst_time.strftime("%Y年%m月%d日%H时"),size=15)
+        plots['fhour'] = bax.text(2.5, 2.5,'预报时效: '+str(fhour)+'小时',size=15)
+
+        # add color bar once, all the frames share the same levels
+        if cb is None:
+            cax=fig.add_axes([l,b-0.04,w,.02])
+            cb = plt.colorbar(plots['shading'], cax=cax, orientation='horizontal',
+                            ticks=cbar['ticks'],
+                            extend=cbar['extend'],extendrect=False)
+            cb.ax.tick_params(labelsize='x-large')                      
+            cb.set_label(cbar['label'],size=20)
+
+        plt.savefig(output_dir+output_name+
+        '起报时间_'+initTime.strftime("%Y年%m月%d日%H时")+
+        '预报时效_'+str(gh['forecast_period'].values[itime])+'小时'+'.png', dpi=200,bbox_inches='tight')
+
+        utl.remove_plot_artists(plots.values())
+        timing[fhour] = time.time()-t_start
+
+    plt.close(fig)
+    return timing
+
+def draw_gh_uv_mslp_sweep(gh=None, uv=None, mslp=None,
+                    map_extent=(50, 150, 0, 65),
+                    regrid_shape=20,
+                    add_china=True,city=True,south_China_sea=True,
+                    output_dir=None,Global=False):
+    """
+    Draw gh_uv_mslp for every forecast hour along the time dimension.
+    :return: dict, {forecast hour: seconds used to draw and save the frame}
+    """
+
+    x, y = np.meshgrid(mslp['lon'], mslp['lat'])
+    clevs_mslp = np.arange(960, 1065, 5)
+    cmap = guide_cmaps(26)
+
+    def draw_mslp(ax, itime, datacrs):
+        return ax.contourf(
+            x, y, np.squeeze(mslp['data'].values[itime]), clevs_mslp,
+            cmap=cmap, alpha=0.8, zorder=1, transform=datacrs)
+
+    return _draw_gh_uv_sweep(gh=gh, uv=uv, draw_shading=draw_mslp,
+        title='海平面气压场',
+        cbar={'ticks': clevs_mslp[:-1], 'extend': 'max',
+              'label': 'Mean sea level pressure (hPa)'},
+        output_name='最高温度_预报_', gh_color='purple',
+        city_zorder=6, city_size=15,
+        map_extent=map_extent, regrid_shape=regrid_shape,
+        add_china=add_china, city=city, south_China_sea=south_China_sea,
+        output_dir=output_dir, Global=Global)
+
+def draw_gh_uv_wsp_sweep(gh=None, uv=None, wsp=None,
+                    map_extent=(50, 150, 0, 65),
+                    regrid_shape=20,
+                    add_china=True,city=True,south_China_sea=True,
+                    output_dir=None,Global=False):
+    """
+    Draw gh_uv_wsp for every forecast hour along the time dimension.
+    :return: dict, {forecast hour: seconds used to draw and save the frame}
+    """
+
+    x, y = np.meshgrid(wsp['lon'], wsp['lat'])
+    clevs_wsp = [12, 15, 18,21, 24, 27,30]
+    colors = ["#FFF59D", "#FFEE58", "#FFCA28", "#FFC107","#FF9800", "#FB8C00",'#E64A19','#BF360C'] # #RRGGBBAA
+    cmap=ListedColormap(colors, 'wsp')
+    cmap.set_under(color=[1,1,1,0],alpha=0.0)
+    norm = BoundaryNorm(clevs_wsp, ncolors=cmap.N, clip=False)
+
+    def draw_wsp(ax, itime, datacrs):
+        z=np.array(np.squeeze(wsp.values[itime]))
+        z[z < clevs_wsp[0]]=np.nan
+        return ax.pcolormesh(
+            x, y, z, norm=norm,
+            cmap=cmap, zorder=1,transform=datacrs,alpha=0.5)
+
+    return _draw_gh_uv_sweep(gh=gh, uv=uv, draw_shading=draw_wsp,
+        title='风速',
+        cbar={'ticks': clevs_wsp[:], 'extend': 'max',
+              'label': 'Wind Speed (m/s)'},
+        output_name='高度场_风_预报_',
+        map_extent=map_extent, regrid_shape=regrid_shape,
+        add_china=add_china, city=city, south_China_sea=south_China_sea,
+        output_dir=output_dir, Global=Global)
+
+def draw_gh_uv_r6_sweep(gh=None, uv=None, r6=None,
+                    map_extent=(50, 150, 0, 65),
+                    regrid_shape=20,
+                    add_china=True,city=True,south_China_sea=True,
+                    output_dir=None,Global=False):
+    """
+    Draw gh_uv_r6 for every forecast hour along the time dimension.
+    :return: dict, {forecast hour: seconds used to draw and save the frame}
+    """
+
+    x, y = np.meshgrid(r6['lon'], r6['lat'])
+    clevs_r6 = [0.1, 4, 13, 25, 60, 120]
+
+    def draw_r6(ax, itime, datacrs):
+        return ax.contourf(
+            x, y, np.squeeze(r6['data'].values[itime]), clevs_r6,
+            colors=["#88F492", "#00A929", "#2AB8FF", "#1202FC", "#FF04F4", "#850C3E"],
+            alpha=0.8, zorder=1, transform=datacrs,extend='max',extendrect=False)
+
+    return _draw_gh_uv_sweep(gh=gh, uv=uv, draw_shading=draw_r6,
+        title='6小时降水',
+        cbar={'ticks': clevs_r6[:], 'extend': 'max',
+              'label': '6h precipitation (mm)'},
+        output_name='高度场_风场_降水_预报_',
+        map_extent=map_extent, regrid_shape=regrid_shape,
+        add_china=add_china, city=city, south_China_sea=south_China_sea,
+        output_dir=output_dir, Global=Global)
+
 def draw_gh_uv_wsp(gh=None, uv=None, wsp=None,
                     map_extent=(50, 150, 0, 65),
                     regrid_shape=20,
@@ -181,16 +399,9 @@ def draw_gh_uv_wsp(gh=None, uv=None, wsp=None,
     map_extent2=utl.adjust_map_ratio(ax,map_extent=map_extent,datacrs=datacrs)
     #adapt to the map ratio
 
-    ax.add_feature(cfeature.OCEAN)
-    utl.add_china_map_2cartopy_public(
-        ax, name='coastline', edgecolor='gray', lw=0.8, zorder=5,alpha=0.5)
-    if add_china:
-        utl.add_china_map_2cartopy_public(
-            ax, name='province', edgecolor='gray', lw=0.5, zorder=5)
-        utl.add_china_map_2cartopy_public(
-            ax, name='nation', edgecolor='black', lw=0.8, zorder=5)
-        utl.add_china_map_2cartopy_public(
-            ax, name='river', edgecolor='#74b9ff', lw=0.8, zorder=5,alpha=0.5)
+    utl.add_cached_basemap(ax, layers=utl.BASEMAP_UNDER_LAYERS, zorder=0, dpi=200)
+    utl.add_cached_basemap(
+        ax, layers=utl.china_map_layers(add_china), zorder=5, dpi=200)
 
     # define return plots
     plots = {}
@@ -235,7 +446,6 @@ def draw_gh_uv_wsp(gh=None, uv=None, wsp=None,
     gl.xlocator = mpl.ticker.FixedLocator(np.arange(0, 360, 15))
     gl.ylocator = mpl.ticker.FixedLocator(np.arange(-90, 90, 15))
 
-    utl.add_cartopy_background(ax,name='RD')
 
     l, b, w, h = ax.get_position().bounds
     #forecast information
@@ -319,16 +529,9 @@ def draw_gh_uv_r6(gh=None, uv=None, r6=None,
     map_extent2=utl.adjust_map_ratio(ax,map_extent=map_extent,datacrs=datacrs)
     #adapt to the map ratio
 
-    ax.add_feature(cfeature.OCEAN)
-    utl.add_china_map_2cartopy_public(
-        ax, name='coastline', edgecolor='gray', lw=0.8, zorder=5,alpha=0.5)
-    if add_china:
-        utl.add_china_map_2cartopy_public(
-            ax, name='province', edgecolor='gray', lw=0.5, zorder=5)
-        utl.add_china_map_2cartopy_public(
-            ax, name='nation', edgecolor='black', lw=0.8, zorder=5)
-        utl.add_china_map_2cartopy_public(
-            ax, name='river', edgecolor='#74b9ff', lw=0.8, zorder=5,alpha=0.5)
+    utl.add_cached_basemap(ax, layers=utl.BASEMAP_UNDER_LAYERS, zorder=0, dpi=200)
+    utl.add_cached_basemap(
+        ax, layers=utl.china_map_layers(add_china), zorder=5, dpi=200)
 
     # define return plots
     plots = {}
@@ -366,7 +569,6 @@ def draw_gh_uv_r6(gh=None, uv=None, r6=None,
     gl.xlocator = mpl.ticker.FixedLocator(np.arange(0, 360, 15))
     gl.ylocator = mpl.ticker.FixedLocator(np.arange(-90, 90, 15))
 
-    utl.add_cartopy_background(ax,name='RD')
 
     l, b, w, h = ax.get_position().bounds
     #forecast information
@@ -449,16 +651,9 @@ def draw_PV_Div_uv(pv=None, uv=None, div=None,
     map_extent2=utl.adjust_map_ratio(ax,map_extent=map_extent,datacrs=datacrs)
     #adapt to the map ratio
 
-    ax.add_feature(cfeature.OCEAN)
-    utl.add_china_map_2cartopy_public(
-        ax, name='coastline', edgecolor='gray', lw=0.8, zorder=5,alpha=0.5)
-    if add_china:
-        utl.add_china_map_2cartopy_public(
-            ax, name='province', edgecolor='gray', lw=0.5, zorder=5)
-        utl.add_china_map_2cartopy_public(
-            ax, name='nation', edgecolor='black', lw=0.8, zorder=5)
-        utl.add_china_map_2cartopy_public(
-            ax, name='river', edgecolor='#74b9ff', lw=0.8, zorder=5,alpha=0.5)
+    utl.add_cached_basemap(ax, layers=utl.BASEMAP_UNDER_LAYERS, zorder=0, dpi=200)
+    utl.add_cached_basemap(
+        ax, layers=utl.china_map_layers(add_china), zorder=5, dpi=200)
 
     # define return plots
     plots = {}
@@ -497,7 +692,6 @@ def draw_PV_Div_uv(pv=None, uv=None, div=None,
     gl.xlocator = mpl.ticker.FixedLocator(np.arange(0, 360, 15))
     gl.ylocator = mpl.ticker.FixedLocator(np.arange(-90, 90, 15))
 
-    utl.add_cartopy_background(ax,name='RD')
 
     l, b, w, h = ax.get_position().bounds
     #forecast information
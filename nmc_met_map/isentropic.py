@@ -4,8 +4,7 @@
 Synoptic analysis or diagnostic maps for numeric weather model.
 """
 import numpy as np
-from nmc_met_io.retrieve_micaps_server import get_model_grid,get_model_3D_grid
-import nmc_met_io.retrieve_micaps_server as MICAPS_IO
+from nmc_met_map.lib.grid_cache import fetch_model_grids
 import nmc_met_io.retrieve_cimiss_server as CMISS_IO
 from nmc_met_map.graphics import isentropic_graphics
 import nmc_met_map.lib.utility as utl
@@ -20,6 +19,11 @@ def isentropic_uv(initTime=None, fhour=6, day_back=0,model='ECMWF',data_source='
     Global=False,
     south_China_sea=True,area = '全国',city=False,output_dir=None
      ):
+    if(area != None):
+        cntr_pnt,zoom_ratio=utl.get_map_area(area_name=area)
+
+    map_extent=utl.get_map_extent(cntr_pnt,zoom_ratio,map_ratio)
+
     # micaps data directory
     if(data_source =='MICAPS'):    
         try:
@@ -38,21 +42,15 @@ def isentropic_uv(initTime=None, fhour=6, day_back=0,model='ECMWF',data_source='
             filename=utl.filename_day_back_model(day_back=day_back,fhour=fhour)
             
         # retrieve data from micaps server
-        rh=MICAPS_IO.get_model_3D_grid(directory=data_dir[0][0:-1],filename=filename,levels=levels, allExists=False)
-        if rh is None:
-            return
-
-        u=MICAPS_IO.get_model_3D_grid(directory=data_dir[1][0:-1],filename=filename,levels=levels, allExists=False)
-        if u is None:
-            return
-
-        v=MICAPS_IO.get_model_3D_grid(directory=data_dir[2][0:-1],filename=filename,levels=levels, allExists=False)
-        if v is None:
-            return
-
-        t=MICAPS_IO.get_model_3D_grid(directory=data_dir[3][0:-1],filename=filename,levels=levels, allExists=False)
-        if t is None:
+        data = fetch_model_grids([
+            (data_dir[0][0:-1], filename, levels),
+            (data_dir[1][0:-1], filename, levels),
+            (data_dir[2][0:-1], filename, levels),
+            (data_dir[3][0:-1], filename, levels)],
+            bbox=utl.get_padded_extent(map_extent))
+        if data is None:
             return
+        rh, u, v, t = data
 
     if(data_source =='CIMISS'): 
         # get filename
@@ -106,43 +104,22 @@ def isentropic_uv(initTime=None, fhour=6, day_back=0,model='ECMWF',data_source='
     isentprs, isentrh, isentu, isentv = isent_anal
 
     # prepare data
-    if(area != None):
-        cntr_pnt,zoom_ratio=utl.get_map_area(area_name=area)
-
-    map_extent=[0,0,0,0]
-    map_extent[0]=cntr_pnt[0]-zoom_ratio*1*map_ratio
-    map_extent[1]=cntr_pnt[0]+zoom_ratio*1*map_ratio
-    map_extent[2]=cntr_pnt[1]-zoom_ratio*1
-    map_extent[3]=cntr_pnt[1]+zoom_ratio*1
-
-    delt_x=(map_extent[1]-map_extent[0])*0.2
-    delt_y=(map_extent[3]-map_extent[2])*0.1
-
-    idx_x1 = np.where((lons > map_extent[0]-delt_x) & 
-        (lons < map_extent[1]+delt_x))
-    idx_y1 = np.where((lats > map_extent[2]-delt_y) & 
-        (lats < map_extent[3]+delt_y))
-
-    mask1 = ((t['lon'] > map_extent[0]-delt_x) & 
-            (t['lon'] < map_extent[1]+delt_x) & 
-            (t['lat'] > map_extent[2]-delt_y) & 
-            (t['lat'] < map_extent[3]+delt_y) &
-            (t['level'] == t['level'].values[0]))
-    isentrh1=t.where(mask1 ,drop=True)
-    isentrh1['data'].values=[[np.array(isentrh)[0,idx_y1[0][0]:(idx_y1[0][-1]+1),idx_x1[0][0]:(idx_x1[0][-1]+1)]]]
+    slices=utl.get_area_slices(lons,lats,map_extent)
+    isentrh1=utl.cut_to_map_extent(t.isel(level=[0]),map_extent)
+    isentrh1['data'].values=[[np.array(isentrh)[0,slices['lat'],slices['lon']]]]
     isentrh1.attrs['model']=model
     isentrh1['level'].values=[np.array(isentlev)]
 
     isentu1=isentrh1.copy()
-    isentu1['data'].values=[[np.array(isentu)[0,idx_y1[0][0]:(idx_y1[0][-1]+1),idx_x1[0][0]:(idx_x1[0][-1]+1)]]]
+    isentu1['data'].values=[[np.array(isentu)[0,slices['lat'],slices['lon']]]]
 
     isentv1=isentrh1.copy()
-    isentv1['data'].values=[[np.array(isentv)[0,idx_y1[0][0]:(idx_y1[0][-1]+1),idx_x1[0][0]:(idx_x1[0][-1]+1)]]]
+    isentv1['data'].values=[[np.array(isentv)[0,slices['lat'],slices['lon']]]]
 
     isentuv1=xr.merge([isentu1.rename({'data': 'isentu'}),isentv1.rename({'data': 'isentv'})])
 
     isentprs1=isentrh1.copy()
-    isentprs1['data'].values=[[np.array(isentprs)[0,idx_y1[0][0]:(idx_y1[0][-1]+1),idx_x1[0][0]:(idx_x1[0][-1]+1)]]]
+    isentprs1['data'].values=[[np.array(isentprs)[0,slices['lat'],slices['lon']]]]
 
     isentropic_graphics.draw_isentropic_uv(
         isentrh=isentrh1, isentuv=isentuv1, isentprs=isentprs1,
@@ -0,0 +1,116 @@
+# _*_ coding: utf-8 _*_
+
+"""
+  Interpolate 4D (time, level, lat, lon) model fields to stations given by
+  longitude, latitude and altitude.
+  模式格点在时间/经纬度上是规则的, 只有高度随格点变化, 因此先在每个格点柱中
+  按位势高度垂直插值, 再水平双线性和时间线性插值. 权重由位势高度场计算一次,
+  所有变量共用.
+"""
+
+import numpy as np
+from nmc_met_map.lib.cross_section import fractional_index
+
+
+def linear_weights(coord, values):
+    """
+    Neighbouring indices and weights of values in the 1D coordinate,
+    the weight is NaN outside the coordinate.
+    """
+    coord = np.asarray(coord, dtype=float)
+    values = np.atleast_1d(np.asarray(values, dtype=float))
+    if len(coord) == 1:
+        zeros = np.zeros(len(values), dtype=int)
+        return zeros, zeros, np.where(values == coord[0], 0., np.nan)
+    pos = fractional_index(coord, values)
+    valid = np.isfinite(pos)
+    i0 = np.zeros(len(pos), dtype=int)
+    i0[valid] = np.clip(np.floor(pos[valid]), 0, len(coord)-2).astype(int)
+    return i0, i0+1, np.where(valid, pos-i0, np.nan)
+
+
+class ColumnInterpolator(object):
+    """
+    Interpolator of the 4D fields to stations, built from the geopotential
+    height and shared by all the variables on the same grid.
+
+    :Examples:
+    >>> interp = ColumnInterpolator(HGT_4D['data'], points)
+    >>> U_interped = interp(U_4D['data'])  # [time, station]
+    """
+
+    def __init__(self, hgt, points, times=None, hgt_scale=10.):
+        """
+        :param hgt: xarray DataArray of geopotential height with the
+                    time, level, lat and lon dimensions.
+        :param points: dict, {'lon': [...], 'lat': [...], 'altitude': [...]},
+                       altitude in meter.
+        :param times: forecast periods (hours) of the output, default the
+                      forecast periods of hgt.
+        :param hgt_scale: the factor from the unit of hgt to meter, the
+                          MICAPS geopotential height is in dagpm.
+        """
+        if 'time' not in hgt.dims:
+            hgt = hgt.expand_dims('time')
+        hgt = hgt.transpose('time', 'level', 'lat', 'lon')
+        lon = np.atleast_1d(np.asarray(points['lon'], dtype=float))
+        lat = np.atleast_1d(np.asarray(points['lat'], dtype=float))
+        alt = np.atleast_1d(np.asarray(points['altitude'], dtype=float))
+        self.shape = hgt.shape
+        self.nstation = len(lon)
+
+        # horizontal, the 4 grid columns around each station
+        j0, j1, wy = linear_weights(hgt['lat'].values, lat)
+        i0, i1, wx = linear_weights(hgt['lon'].values, lon)
+        self.j = np.stack([j0, j0, j1, j1], axis=-1)          # [station, 4]
+        self.i = np.stack([i0, i1, i0, i1], axis=-1)
+        self.wxy = np.stack([(1.-wy)*(1.-wx), (1.-wy)*wx,
+                             wy*(1.-wx), wy*wx], axis=-1)
+
+        # vertical, the levels around the altitude in each column
+        columns = np.asarray(hgt.values, dtype=float)[:, :, self.j, self.i]*hgt_scale
+        columns = np.moveaxis(columns, 1, -1)          # [time, station, 4, level]
+        if np.nanmean(columns[..., 0]) > np.nanmean(columns[..., -1]):
+            self.level_order = slice(None, None, -1)
+            columns = columns[..., ::-1]
+        else:
+            self.level_order = slice(None)
+        nlevel = columns.shape[-1]
+        z = alt[None, :, None]
+        k0 = np.clip(np.sum(columns <= z[..., None], axis=-1)-1, 0, nlevel-2)
+        k1 = k0+1
+        z0 = np.take_along_axis(columns, k0[..., None], axis=-1)[..., 0]
+        z1 = np.take_along_axis(columns, k1[..., None], axis=-1)[..., 0]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            wz = (z-z0)/(z1-z0)
+        # no extrapolation out of the columns
+        wz[(wz < 0.) | (wz > 1.)] = np.nan
+        self.k0, self.k1, self.wz = k0, k1, wz
+
+        # time
+        model_times = np.atleast_1d(hgt['forecast_period'].values).astype(float)
+        if times is None:
+            times = model_times
+        self.times = np.atleast_1d(np.asarray(times, dtype=float))
+        self.t0, self.t1, self.wt = linear_weights(model_times, self.times)
+
+    def __call__(self, data):
+        """
+        :param data: xarray DataArray on the grid of hgt.
+        :return: numpy array [time, station].
+        """
+        if 'time' not in data.dims:
+            data = data.expand_dims('time')
+        values = np.asarray(
+            data.transpose('time', 'level', 'lat', 'lon').values, dtype=float)
+        if values.shape != self.shape:
+            raise ValueError('data is not on the grid of the interpolator')
+        columns = np.moveaxis(values[:, :, self.j, self.i], 1, -1)
+        columns = columns[..., self.level_order]
+        v0 = np.take_along_axis(columns, self.k0[..., None], axis=-1)[..., 0]
+        v1 = np.take_along_axis(columns, self.k1[..., None], axis=-1)[..., 0]
+        column_values = v0*(1.-self.wz)+v1*self.wz       # [time, station, 4]
+        station_values = np.sum(column_values*self.wxy, axis=-1)
+        wt = self.wt[:, None]
+        return (station_values[self.t0]*(1.-wt) +
+                station_values[self.t1]*wt)
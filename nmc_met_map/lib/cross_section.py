@@ -0,0 +1,252 @@
+# _*_ coding: utf-8 _*_
+
+"""
+  Helpers of the cross section products.
+  剖面产品只需要剖面线附近的格点, 先把三维场裁剪到剖面线经过的格点带,
+  再计算涡度等导出量和插值.
+"""
+
+from collections import OrderedDict
+import numpy as np
+
+
+def section_path(st_point, ed_point, steps=100):
+    """
+    Points along the great circle between st_point and ed_point.
+    :param st_point: [lat, lon] of the start point.
+    :param ed_point: [lat, lon] of the end point.
+    :param steps: the number of points.
+    :return: lat, lon, 1D numpy arrays, degree.
+    """
+    lat1, lon1 = np.deg2rad(st_point[0]), np.deg2rad(st_point[1])
+    lat2, lon2 = np.deg2rad(ed_point[0]), np.deg2rad(ed_point[1])
+    p1 = np.array([np.cos(lat1)*np.cos(lon1), np.cos(lat1)*np.sin(lon1), np.sin(lat1)])
+    p2 = np.array([np.cos(lat2)*np.cos(lon2), np.cos(lat2)*np.sin(lon2), np.sin(lat2)])
+    omega = np.arccos(np.clip(np.dot(p1, p2), -1., 1.))
+    t = np.linspace(0., 1., steps)
+    if omega < 1e-10:
+        xyz = np.outer(np.ones(steps), p1)
+    else:
+        xyz = (np.outer(np.sin((1.-t)*omega), p1) +
+               np.outer(np.sin(t*omega), p2))/np.sin(omega)
+    lat = np.rad2deg(np.arcsin(np.clip(xyz[:, 2], -1., 1.)))
+    lon = np.rad2deg(np.arctan2(xyz[:, 1], xyz[:, 0]))
+    return lat, lon
+
+
+def _band_slice(coord, values, margin):
+    """
+    Slice of the 1D coordinate covering values with margin grid cells.
+    """
+    coord = np.asarray(coord)
+    idx = np.flatnonzero((coord >= values.min()) & (coord <= values.max()))
+    if len(idx) == 0:
+        # between two grid points
+        idx = np.array([np.argmin(np.abs(coord-values.min())),
+                        np.argmin(np.abs(coord-values.max()))])
+    start = max(int(idx.min())-margin, 0)
+    stop = min(int(idx.max())+margin+1, len(coord))
+    return slice(start, stop)
+
+
+def section_band_slices(lon, lat, st_point, ed_point, margin=3, steps=100):
+    """
+    Index slices of the grid cells crossed by the cross section, with
+    margin cells around for the finite differences and the interpolation.
+    :param lon: 1D longitude of the grid.
+    :param lat: 1D latitude of the grid.
+    :param st_point: [lat, lon] of the start point.
+    :param ed_point: [lat, lon] of the end point.
+    :param margin: number of grid cells added around the path.
+    :return: dict, {'lon': slice, 'lat': slice}, None if the path crosses
+             the border of the longitude range.
+    """
+    path_lat, path_lon = section_path(st_point, ed_point, steps=steps)
+    lon = np.asarray(lon)
+    if lon.max() > 180:
+        path_lon = path_lon % 360.
+    if path_lon.max()-path_lon.min() > 180:
+        return None
+    return {'lon': _band_slice(lon, path_lon, margin),
+            'lat': _band_slice(lat, path_lat, margin)}
+
+
+def cut_to_section(data, st_point, ed_point, margin=3):
+    """
+    Cut the grid to the band of grid cells along the cross section, the
+    derived fields and the interpolation are then computed on the band only.
+    :param data: xarray Dataset with lon and lat dimensions.
+    :param st_point: [lat, lon] of the start point.
+    :param ed_point: [lat, lon] of the end point.
+    :param margin: number of grid cells added around the path.
+    :return: xarray Dataset.
+    """
+    slices = section_band_slices(
+        data['lon'].values, data['lat'].values, st_point, ed_point,
+        margin=margin)
+    if slices is None:
+        return data
+    return data.isel(**slices)
+
+
+def sections_bbox(sections, pad=2., steps=100):
+    """
+    The box covering several cross sections, used to cut the grids once
+    for all of them.
+    :param sections: list of (st_point, ed_point), points are [lat, lon].
+    :param pad: degrees added around the paths.
+    :return: [lon0, lon1, lat0, lat1].
+    """
+    lats, lons = [], []
+    for st_point, ed_point in sections:
+        path_lat, path_lon = section_path(st_point, ed_point, steps=steps)
+        lats.append(path_lat)
+        lons.append(path_lon)
+    lats = np.concatenate(lats)
+    lons = np.concatenate(lons)
+    return [lons.min()-pad, lons.max()+pad, lats.min()-pad, lats.max()+pad]
+
+
+# interpolation weights of the sections, {(grid, st_point, ed_point, steps): weights},
+# least recently used ones are dropped first
+_section_weights = OrderedDict()
+SECTION_WEIGHTS_CACHE_SIZE = 64
+
+
+def fractional_index(coord, values):
+    """
+    Fractional position of values in the 1D coordinate, NaN if outside.
+    """
+    coord = np.asarray(coord, dtype=float)
+    idx = np.arange(len(coord), dtype=float)
+    if coord[0] > coord[-1]:
+        pos = np.interp(values, coord[::-1], idx[::-1])
+    else:
+        pos = np.interp(values, coord, idx)
+    outside = (values < coord.min()) | (values > coord.max())
+    pos[outside] = np.nan
+    return pos
+
+
+def section_weights(lon, lat, st_point, ed_point, steps=100):
+    """
+    Path points and bilinear interpolation weights of a cross section,
+    cached by (grid, st_point, ed_point, steps) so that the sections of
+    many forecast hours on the same grid share them.
+    :param lon: 1D longitude of the grid.
+    :param lat: 1D latitude of the grid.
+    :param st_point: [lat, lon] of the start point.
+    :param ed_point: [lat, lon] of the end point.
+    :param steps: the number of points along the section.
+    :return: dict, path lat/lon, grid indices j0/j1/i0/i1 and weights wy/wx.
+    """
+    lon = np.asarray(lon, dtype=float)
+    lat = np.asarray(lat, dtype=float)
+    key = (lon.tobytes(), lat.tobytes(),
+           tuple(st_point), tuple(ed_point), steps)
+    if key in _section_weights:
+        _section_weights.move_to_end(key)
+    else:
+        path_lat, path_lon = section_path(st_point, ed_point, steps=steps)
+        if lon.max() > 180:
+            path_lon = path_lon % 360.
+        weights = {'lat': path_lat, 'lon': path_lon}
+        for name, coord, values in (('y', lat, path_lat), ('x', lon, path_lon)):
+            pos = fractional_index(coord, values)
+            valid = np.isfinite(pos)
+            i0 = np.zeros(len(pos), dtype=int)
+            i0[valid] = np.clip(np.floor(pos[valid]), 0, len(coord)-2).astype(int)
+            w = np.where(valid, pos-i0, np.nan)
+            weights[name+'0'] = i0
+            weights[name+'1'] = i0+1
+            weights['w'+name] = w
+        _section_weights[key] = weights
+        while len(_section_weights) > SECTION_WEIGHTS_CACHE_SIZE:
+            _section_weights.popitem(last=False)
+    return _section_weights[key]
+
+
+def _interp_section(arr, weights):
+    """
+    Bilinear interpolation of arr [..., lat, lon] to the section points.
+    """
+    j0, j1 = weights['y0'], weights['y1']
+    i0, i1 = weights['x0'], weights['x1']
+    wy, wx = weights['wy'], weights['wx']
+    return (arr[..., j0, i0]*(1.-wy)*(1.-wx) +
+            arr[..., j0, i1]*(1.-wy)*wx +
+            arr[..., j1, i0]*wy*(1.-wx) +
+            arr[..., j1, i1]*wy*wx)
+
+
+def cross_sections(datasets, st_point, ed_point, steps=100):
+    """
+    Cross sections of several Datasets (or DataArrays) in one pass, the same
+    output as metpy.interpolate.cross_section: the lat/lon dimensions are
+    replaced by 'index' with the lat and lon of the points as coordinates.
+    The path and weights are computed once, the variables with the same
+    shape are stacked and interpolated by one gather.
+    :param datasets: list of xarray Dataset or DataArray with lat/lon dims.
+    :param st_point: [lat, lon] of the start point.
+    :param ed_point: [lat, lon] of the end point.
+    :param steps: the number of points along the section.
+    :return: list of the cross sections, in the order of datasets.
+    :Examples:
+    >>> cross_rh, cross_u, cross_v = cross_sections([rh, u, v], [20, 120], [50, 130])
+    """
+    import xarray as xr
+
+    # collect all the variables to interpolate, grouped by grid and shape
+    groups = {}
+    items = []
+    for ids, data in enumerate(datasets):
+        if isinstance(data, xr.DataArray):
+            variables = {None: data}
+        else:
+            variables = dict(data.data_vars)
+        for name, var in variables.items():
+            if 'lat' not in var.dims or 'lon' not in var.dims:
+                continue
+            dims = [d for d in var.dims if d not in ('lat', 'lon')]
+            var = var.transpose(*(dims+['lat', 'lon']))
+            key = (var['lon'].values.tobytes(), var['lat'].values.tobytes(),
+                   var.shape)
+            groups.setdefault(key, []).append(len(items))
+            items.append((ids, name, var, dims))
+
+    values = [None]*len(items)
+    for key, members in groups.items():
+        var = items[members[0]][2]
+        weights = section_weights(
+            var['lon'].values, var['lat'].values, st_point, ed_point,
+            steps=steps)
+        stacked = np.stack([np.asarray(items[m][2].values, dtype=float)
+                            for m in members])
+        result = _interp_section(stacked, weights)
+        for k, m in enumerate(members):
+            values[m] = (result[k], weights)
+
+    crosses = []
+    for ids, data in enumerate(datasets):
+        out_vars = {}
+        for (item_ids, name, var, dims), (value, weights) in zip(items, values):
+            if item_ids != ids:
+                continue
+            coords = {c: var.coords[c] for c in var.coords
+                      if 'lat' not in var.coords[c].dims and
+                      'lon' not in var.coords[c].dims}
+            coords['index'] = np.arange(steps)
+            coords['lat'] = ('index', weights['lat'], var['lat'].attrs)
+            coords['lon'] = ('index', weights['lon'], var['lon'].attrs)
+            out_vars[name] = xr.DataArray(
+                value, dims=dims+['index'], coords=coords, attrs=var.attrs,
+                name=name)
+        if isinstance(data, xr.DataArray):
+            crosses.append(out_vars[None])
+        else:
+            cross = xr.Dataset(out_vars, attrs=data.attrs)
+            for name, var in data.data_vars.items():
+                if name not in out_vars:
+                    cross[name] = var
+            crosses.append(cross)
+    return crosses
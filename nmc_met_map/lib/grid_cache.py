@@ -0,0 +1,497 @@
+# _*_ coding: utf-8 _*_
+
+"""
+  Process-wide cache for the model grids read from MICAPS cassandra service.
+  同一起报时间的一批产品共用同一份格点数据, 每个场只下载和解码一次.
+"""
+
+import os
+import time
+import importlib.util
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import numpy as np
+import xarray as xr
+import nmc_met_io.retrieve_micaps_server as MICAPS_IO
+
+# default cache size, bytes
+GRID_CACHE_MAX_BYTES = 1024*1024*1024
+
+# default number of concurrent requests to the MICAPS service
+GRID_FETCH_WORKERS = 8
+
+# on-disk cache shared by the processes on one host, disabled if no directory
+GRID_DISK_CACHE_DIR = os.environ.get('NMC_MET_MAP_GRID_CACHE_DIR')
+GRID_DISK_CACHE_MAX_BYTES = 20*1024*1024*1024
+GRID_DISK_CACHE_MAX_AGE = 3*24*3600
+
+# seconds between two scans of the disk cache for eviction
+GRID_DISK_EVICT_INTERVAL = 300
+
+
+class GridCache(object):
+    """
+    Size bounded (least recently used by bytes) cache for xarray grids
+    (or any value with nbytes, e.g. numpy arrays).
+    """
+
+    def __init__(self, max_bytes=GRID_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.currbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits = self.hits+1
+                return self._data[key][0]
+            self.misses = self.misses+1
+            return None
+
+    def peek(self, key):
+        with self._lock:
+            if key in self._data:
+                return self._data[key][0]
+            return None
+
+    def put(self, key, data):
+        nbytes = data.nbytes
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                self.currbytes = self.currbytes-self._data.pop(key)[1]
+            self._data[key] = (data, nbytes)
+            self.currbytes = self.currbytes+nbytes
+            self._evict()
+
+    def _evict(self):
+        while self.currbytes > self.max_bytes and len(self._data) > 0:
+            _, (_, old_bytes) = self._data.popitem(last=False)
+            self.currbytes = self.currbytes-old_bytes
+
+    def resize(self, max_bytes):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.currbytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def info(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'entries': len(self._data), 'currbytes': self.currbytes,
+                    'max_bytes': self.max_bytes}
+
+
+_grid_cache = GridCache()
+
+
+class GridDiskCache(object):
+    """
+    Decoded grids saved as NetCDF files under one directory, one file per
+    grid (directory/filename.nc), so all the render workers on a host
+    download and decode each grid once.
+    Files are written to a temporary name and renamed, readers never see
+    a partial file. Files (and temporary files left by killed writers)
+    older than max_age are removed, then the least recently read ones
+    until the total size is below max_bytes.
+    The fields are compressed to keep many runs on disk, so a hit reads
+    and decompresses the whole file, which is still much cheaper than the
+    download and decoding from the service.
+    """
+
+    def __init__(self, cache_dir, max_bytes=GRID_DISK_CACHE_MAX_BYTES,
+                 max_age=GRID_DISK_CACHE_MAX_AGE):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._last_evict = 0
+
+    def path(self, key):
+        directory, filename = key
+        return os.path.join(self.cache_dir, directory.strip('/'), filename+'.nc')
+
+    def get(self, key):
+        fname = self.path(key)
+        if not os.path.isfile(fname):
+            return None
+        try:
+            # keep forecast_period in hours as the MICAPS decoder gives it
+            with xr.open_dataset(fname, decode_timedelta=False) as data:
+                data = data.load()
+            # the modification time records the last use
+            os.utime(fname, None)
+        except Exception:
+            # removed by another process, or not a valid file
+            return None
+        return data
+
+    def put(self, key, data):
+        fname = self.path(key)
+        fdir = os.path.dirname(fname)
+        try:
+            os.makedirs(fdir, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(suffix='.tmp', dir=fdir)
+            os.close(fd)
+        except OSError:
+            return
+        try:
+            data.to_netcdf(tmp, encoding=_netcdf_encoding(data))
+            os.replace(tmp, fname)
+        except Exception:
+            # the grid can not be saved (e.g. attributes), just skip it
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return
+        self.evict()
+
+    def evict(self, force=False):
+        now = time.time()
+        if not force and now-self._last_evict < GRID_DISK_EVICT_INTERVAL:
+            return
+        self._last_evict = now
+
+        files = []
+        for root, _, fnames in os.walk(self.cache_dir):
+            for fname in fnames:
+                if not fname.endswith(('.nc', '.tmp')):
+                    continue
+                fname = os.path.join(root, fname)
+                try:
+                    stat = os.stat(fname)
+                except OSError:
+                    continue
+                if fname.endswith('.tmp'):
+                    # a file being written, removed only when stale
+                    if now-stat.st_mtime >= self.max_age:
+                        try:
+                            os.remove(fname)
+                        except OSError:
+                            pass
+                    continue
+                files.append((stat.st_mtime, stat.st_size, fname))
+
+        total = sum(f[1] for f in files)
+        for mtime, size, fname in sorted(files):
+            if now-mtime < self.max_age and total <= self.max_bytes:
+                break
+            try:
+                os.remove(fname)
+            except OSError:
+                pass
+            total = total-size
+
+
+def _netcdf_encoding(data):
+    """
+    Compress the data variables, chunked by horizontal field.
+    """
+    if importlib.util.find_spec('netCDF4') is None:
+        # scipy backend, NetCDF3 without compression
+        return None
+    encoding = {}
+    for name, var in data.data_vars.items():
+        if var.ndim < 2:
+            continue
+        encoding[name] = {'zlib': True, 'complevel': 1, 'shuffle': True,
+                          'chunksizes': (1,)*(var.ndim-2)+var.shape[-2:]}
+    return encoding
+
+
+_grid_disk_cache = None
+if GRID_DISK_CACHE_DIR:
+    _grid_disk_cache = GridDiskCache(GRID_DISK_CACHE_DIR)
+
+# a fixed set of locks chosen by the hash of the grid key, concurrent
+# requests of the same grid download it once
+GRID_FETCH_LOCK_STRIPES = 64
+_fetch_locks = [threading.Lock() for _ in range(GRID_FETCH_LOCK_STRIPES)]
+
+
+def _fetch_lock(key):
+    return _fetch_locks[hash(key) % GRID_FETCH_LOCK_STRIPES]
+
+
+def grid_cache_key(directory, filename):
+    """
+    Cache key of one grid.
+    MICAPS stores each level in its own directory (e.g. ECMWF_HR/HGT/500/),
+    so (directory, filename) identifies one level of one field; the 3D
+    requests are cached level by level.
+    :param directory: the data directory on the service.
+    :param filename: the data filename.
+    :return: tuple.
+    """
+    return (directory.rstrip('/'), filename)
+
+
+def grid_cache_info():
+    """
+    Return the hit/miss counters and the memory used by the grid cache.
+    :return: dict, {'hits', 'misses', 'entries', 'currbytes', 'max_bytes'}
+    """
+    return _grid_cache.info()
+
+
+def clear_grid_cache():
+    """
+    Drop all the cached grids and reset the counters.
+    """
+    _grid_cache.clear()
+
+
+def set_grid_cache_size(max_bytes):
+    """
+    Set the maximum memory of the grid cache, 0 to disable caching.
+    :param max_bytes: int, bytes.
+    """
+    _grid_cache.resize(max_bytes)
+
+
+def cut_grid(data, bbox=None):
+    """
+    Cut the grid to the bounding box, by index slices on lat/lon.
+    :param data: xarray Dataset with lon and lat dimensions.
+    :param bbox: [lon0, lon1, lat0, lat1], the points strictly inside are
+                 kept; None to return data.
+    :return: xarray Dataset, a view of data.
+    """
+    if bbox is None:
+        return data
+    slices = {}
+    for name, bounds in (('lon', bbox[0:2]), ('lat', bbox[2:4])):
+        coord = data[name].values
+        idx = np.flatnonzero((coord > bounds[0]) & (coord < bounds[1]))
+        if len(idx) == 0:
+            slices[name] = slice(0, 0)
+        else:
+            slices[name] = slice(idx[0], idx[-1]+1)
+    return data.isel(**slices)
+
+
+def set_grid_disk_cache(cache_dir, max_bytes=GRID_DISK_CACHE_MAX_BYTES,
+                        max_age=GRID_DISK_CACHE_MAX_AGE):
+    """
+    Enable the on-disk grid cache (or set NMC_MET_MAP_GRID_CACHE_DIR).
+    :param cache_dir: the directory shared by the workers, None to disable.
+    :param max_bytes: the maximum size of the directory, bytes.
+    :param max_age: the maximum age of the files, seconds.
+    """
+    global _grid_disk_cache
+    if cache_dir is None:
+        _grid_disk_cache = None
+    else:
+        _grid_disk_cache = GridDiskCache(
+            cache_dir, max_bytes=max_bytes, max_age=max_age)
+
+
+def _retrieve_grid(key, directory, filename, **kargs):
+    """
+    Read the grid from the disk cache, or from the MICAPS service.
+    """
+    disk_cache = _grid_disk_cache
+    if disk_cache is not None:
+        data = disk_cache.get(key)
+        if data is not None:
+            return data
+    data = MICAPS_IO.get_model_grid(directory, filename=filename, **kargs)
+    if data is not None and disk_cache is not None:
+        disk_cache.put(key, data)
+    return data
+
+
+def get_model_grid(directory, filename=None, bbox=None, cache=True, **kargs):
+    """
+    Cached version of nmc_met_io.retrieve_micaps_server.get_model_grid.
+    The whole grid is cached, only the part inside bbox is copied out, so
+    the memory and time of regional products scale with the region.
+    :param directory: the data directory on the service.
+    :param filename: the data filename, None for the latest file (not cached).
+    :param bbox: [lon0, lon1, lat0, lat1], cut the grid to the box.
+    :param cache: False to read the grid without keeping it in memory (an
+                  already cached grid is still used), the whole grid is
+                  freed once the part inside bbox is copied out.
+    :return: xarray Dataset, a copy of the cached grid; None if not exist.
+    """
+    if filename is None:
+        data = MICAPS_IO.get_model_grid(directory, filename=filename, **kargs)
+        if data is None:
+            return None
+        return cut_grid(data, bbox)
+
+    key = grid_cache_key(directory, filename)
+    if not cache:
+        data = _grid_cache.peek(key)
+        if data is None:
+            data = _retrieve_grid(key, directory, filename, **kargs)
+            if data is None:
+                return None
+        return cut_grid(data, bbox).copy(deep=True)
+
+    data = _grid_cache.get(key)
+    if data is None:
+        with _fetch_lock(key):
+            data = _grid_cache.peek(key)
+            if data is None:
+                data = _retrieve_grid(key, directory, filename, **kargs)
+                if data is None:
+                    return None
+                _grid_cache.put(key, data)
+
+    # products modify the data in place, never hand out the cached one
+    return cut_grid(data, bbox).copy(deep=True)
+
+
+def get_model_grids(directory, filenames, allExists=True, bbox=None, **kargs):
+    """
+    Cached version of nmc_met_io.retrieve_micaps_server.get_model_grids.
+    :param directory: the data directory on the service.
+    :param filenames: the list of filenames.
+    :param allExists: all files should exist, or return None.
+    :param bbox: [lon0, lon1, lat0, lat1], cut the grids to the box.
+    :return: xarray Dataset concatenated along time.
+    """
+    dataset = []
+    for filename in filenames:
+        data = get_model_grid(directory, filename=filename, bbox=bbox, **kargs)
+        if data:
+            dataset.append(data)
+        else:
+            if allExists:
+                return None
+    if len(dataset) == 0:
+        return None
+    return xr.concat(dataset, dim='time')
+
+
+def get_model_3D_grid(directory, filename, levels, allExists=True, bbox=None,
+                      **kargs):
+    """
+    Cached version of nmc_met_io.retrieve_micaps_server.get_model_3D_grid.
+    每层单独缓存, 因此不同层次组合的请求可以共用已取得的层.
+    :param directory: the data directory on the service, without level.
+    :param filename: the data filename.
+    :param levels: pressure levels.
+    :param allExists: all levels should exist, or return None.
+    :param bbox: [lon0, lon1, lat0, lat1], cut the grids to the box.
+    :return: xarray Dataset concatenated along level.
+    """
+    dataset = []
+    for level in levels:
+        data = get_model_grid(
+            directory+'/'+str(int(level)).strip(), filename=filename,
+            bbox=bbox, **kargs)
+        if data:
+            dataset.append(data)
+        else:
+            if allExists:
+                return None
+    if len(dataset) == 0:
+        return None
+    return xr.concat(dataset, dim='level')
+
+
+def get_model_3D_grids(directory, filenames, levels, allExists=True, bbox=None,
+                       **kargs):
+    """
+    Cached version of nmc_met_io.retrieve_micaps_server.get_model_3D_grids.
+    :param directory: the data directory on the service, without level.
+    :param filenames: the list of filenames.
+    :param levels: pressure levels.
+    :param allExists: all files should exist, or return None.
+    :param bbox: [lon0, lon1, lat0, lat1], cut the grids to the box.
+    :return: xarray Dataset concatenated along time and level.
+    """
+    dataset = []
+    for filename in filenames:
+        data = get_model_3D_grid(
+            directory, filename, levels, allExists=allExists, bbox=bbox,
+            **kargs)
+        if data:
+            dataset.append(data)
+        else:
+            if allExists:
+                return None
+    if len(dataset) == 0:
+        return None
+    return xr.concat(dataset, dim='time')
+
+
+def _fetch_one(request, allExists, bbox):
+    directory, filenames = request[0], request[1]
+    levels = request[2] if len(request) > 2 else None
+    if len(request) > 3:
+        allExists = request[3]
+    if isinstance(filenames, str):
+        if levels is None:
+            return get_model_grid(directory, filename=filenames, bbox=bbox)
+        return get_model_3D_grid(
+            directory, filenames, levels, allExists=allExists, bbox=bbox)
+    if levels is None:
+        return get_model_grids(
+            directory, filenames, allExists=allExists, bbox=bbox)
+    return get_model_3D_grids(
+        directory, filenames, levels, allExists=allExists, bbox=bbox)
+
+
+def fetch_model_grids(plan, max_workers=GRID_FETCH_WORKERS, allExists=False,
+                      bbox=None):
+    """
+    Retrieve all the grids required by one product concurrently.
+    产品需要的全部格点数据一次列出, 在有界线程池中并发下载,
+    总耗时约等于最慢的一次下载.
+
+    :param plan: list of requests, each one is
+                 (directory, filename) -> get_model_grid,
+                 (directory, filename, levels) -> get_model_3D_grid,
+                 (directory, [filenames]) -> get_model_grids,
+                 (directory, [filenames], levels) -> get_model_3D_grids,
+                 a fourth item (levels may be None) sets allExists of
+                 this request, e.g. (directory, filename, levels, True).
+    :param max_workers: the maximum number of concurrent requests.
+    :param allExists: passed to the multi-file/multi-level requests
+                      without their own allExists.
+    :param bbox: [lon0, lon1, lat0, lat1], cut all the grids to the box,
+                 e.g. utl.get_padded_extent(map_extent).
+    :return: list of xarray Dataset in the order of plan,
+             None if any of the required grids is missing.
+    :Examples:
+    >>> gh, u, v = fetch_model_grids([
+            ('ECMWF_HR/HGT/500/', '20021908.024'),
+            ('ECMWF_HR/UGRD/850/', '20021908.024'),
+            ('ECMWF_HR/VGRD/850/', '20021908.024')])
+    """
+    if len(plan) == 0:
+        return []
+
+    results = [None]*len(plan)
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(plan)))
+    try:
+        futures = {executor.submit(_fetch_one, request, allExists, bbox): i
+                   for i, request in enumerate(plan)}
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                data = future.result()
+                if data is None:
+                    # one field is missing, the product can not be drawn
+                    for other in pending:
+                        other.cancel()
+                    return None
+                results[futures[future]] = data
+    finally:
+        executor.shutdown(wait=False)
+    return results
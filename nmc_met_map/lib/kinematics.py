@@ -0,0 +1,122 @@
+# _*_ coding: utf-8 _*_
+
+"""
+  Level batched kinematics on (..., lat, lon) grids.
+  与metpy.calc的有限差分公式一致(非均匀网格二阶中心差分, 边界二阶单侧差分),
+  但网格距只计算一次, 所有层一次算完.
+"""
+
+from collections import OrderedDict
+import numpy as np
+
+# the same earth radius (sphere) and rotation rate as metpy
+EARTH_RADIUS = 6370997.
+EARTH_OMEGA = 7.292115e-5
+
+# grid deltas already computed, {(lon, lat): (dx, dy)}, least recently
+# used grids are dropped first
+_grid_deltas = OrderedDict()
+GRID_DELTAS_CACHE_SIZE = 16
+
+
+def lat_lon_grid_deltas(lon, lat):
+    """
+    Great circle distance between the neighbouring points of a lat/lon grid.
+    :param lon: 1D longitude, degree.
+    :param lat: 1D latitude, degree.
+    :return: dx [nlat, nlon-1] and dy [nlat-1, nlon], meter, positive
+             eastward and northward.
+    """
+    lon = np.asarray(lon, dtype=float)
+    lat = np.asarray(lat, dtype=float)
+    key = (lon.tobytes(), lat.tobytes())
+    if key in _grid_deltas:
+        _grid_deltas.move_to_end(key)
+    else:
+        rlon = np.deg2rad(lon)
+        rlat = np.deg2rad(lat)
+        dlon = np.diff(rlon)
+        # distance along the great circle between (lat, lon0) and (lat, lon1)
+        dx = 2.*EARTH_RADIUS*np.arcsin(
+            np.abs(np.cos(rlat)[:, None]*np.sin(dlon/2.)[None, :]))
+        dx = dx*np.sign(dlon)[None, :]
+        dy = EARTH_RADIUS*np.diff(rlat)[:, None]*np.ones(len(lon))[None, :]
+        _grid_deltas[key] = (dx, dy)
+        while len(_grid_deltas) > GRID_DELTAS_CACHE_SIZE:
+            _grid_deltas.popitem(last=False)
+    return _grid_deltas[key]
+
+
+def first_derivative(f, delta, axis):
+    """
+    First derivative along axis with the non-uniform deltas.
+    :param f: numpy array.
+    :param delta: deltas between the points along axis, broadcastable to f
+                  with the length of axis minus 1.
+    :param axis: the axis to differentiate.
+    :return: numpy array, the same shape as f.
+    """
+    f = np.moveaxis(np.asarray(f, dtype=float), axis, -1)
+    delta = np.moveaxis(np.asarray(delta, dtype=float), axis, -1)
+    out = np.empty_like(f)
+
+    # centered difference
+    d0 = delta[..., :-1]
+    d1 = delta[..., 1:]
+    out[..., 1:-1] = (-d1/(d0*(d0+d1))*f[..., :-2] +
+                      (d1-d0)/(d0*d1)*f[..., 1:-1] +
+                      d0/(d1*(d0+d1))*f[..., 2:])
+
+    # one-sided difference on the boundaries
+    d0 = delta[..., 0]
+    d1 = delta[..., 1]
+    combined = d0+d1
+    out[..., 0] = (-(combined+d0)/(combined*d0)*f[..., 0] +
+                   combined/(d0*d1)*f[..., 1] -
+                   d0/(combined*d1)*f[..., 2])
+
+    d0 = delta[..., -2]
+    d1 = delta[..., -1]
+    combined = d0+d1
+    out[..., -1] = (d1/(d0*combined)*f[..., -3] -
+                    combined/(d0*d1)*f[..., -2] +
+                    (combined+d1)/(combined*d1)*f[..., -1])
+
+    return np.moveaxis(out, -1, axis)
+
+
+def vorticity(u, v, lon, lat):
+    """
+    Relative vorticity dv/dx - du/dy of all the levels.
+    :param u: numpy array [..., lat, lon], m/s.
+    :param v: numpy array [..., lat, lon], m/s.
+    :param lon: 1D longitude.
+    :param lat: 1D latitude.
+    :return: numpy array [..., lat, lon], 1/s.
+    """
+    dx, dy = lat_lon_grid_deltas(lon, lat)
+    return (first_derivative(v, dx, axis=-1) -
+            first_derivative(u, dy, axis=-2))
+
+
+def absolute_vorticity(u, v, lon, lat):
+    """
+    Absolute vorticity (relative vorticity plus coriolis parameter).
+    :return: numpy array [..., lat, lon], 1/s.
+    """
+    f = 2.*EARTH_OMEGA*np.sin(np.deg2rad(np.asarray(lat, dtype=float)))
+    return vorticity(u, v, lon, lat)+f[:, None]
+
+
+def divergence(u, v, lon, lat):
+    """
+    Horizontal divergence du/dx + dv/dy of all the levels.
+    :param u: numpy array [..., lat, lon], m/s.
+    :param v: numpy array [..., lat, lon], m/s.
+    :param lon: 1D longitude.
+    :param lat: 1D latitude.
+    :return: numpy array [..., lat, lon], 1/s.
+    """
+    dx, dy = lat_lon_grid_deltas(lon, lat)
+    return (first_derivative(u, dx, axis=-1) +
+            first_derivative(v, dy, axis=-2))
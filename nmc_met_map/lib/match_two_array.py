@@ -19,6 +19,74 @@ import matplotlib.ticker as mticker
 
 
 
+def _as_ids(ids):
+    ids = np.asarray(ids)
+    if ids.dtype == object:
+        # e.g. the ID column of a DataFrame, keep the type of the values
+        # (int IDs stay numbers), strings if they are mixed
+        ids = np.array(ids.tolist())
+        if ids.dtype == object:
+            ids = ids.astype(str)
+    if ids.dtype.kind == 'S':
+        ids = ids.astype(str)
+    return ids
+
+
+def _is_numeric(ids):
+    return ids.dtype.kind in 'biuf'
+
+
+class StationIndex(object):
+    """
+    Sorted index of station IDs, built once and used to match many arrays
+    of station IDs with searchsorted, O((n+m) log m).
+
+    :Examples:
+    >>> index = StationIndex(sta2513_ID)
+    >>> idx1, idx2 = index.match(obs_ID)
+    """
+
+    def __init__(self, ids):
+        """
+        :param ids: the station IDs to be indexed (array2 of match_two_array).
+        """
+        self.ids = _as_ids(ids)
+        # stable sort, the first one is used for the duplicated IDs
+        self.order = np.argsort(self.ids, kind='mergesort')
+        self.sorted_ids = self.ids[self.order]
+
+    def lookup(self, ids):
+        """
+        Index of each of ids in the indexed IDs.
+        :param ids: station IDs.
+        :return: int numpy array, -1 for the IDs not found.
+        """
+        ids = _as_ids(ids)
+        if (len(self.sorted_ids) == 0 or len(ids) == 0 or
+                _is_numeric(ids) != _is_numeric(self.sorted_ids)):
+            # numbers never equal strings, as with ==
+            return np.full(ids.shape, -1, dtype=int)
+        pos = np.searchsorted(self.sorted_ids, ids, side='left')
+        pos = np.clip(pos, 0, len(self.sorted_ids)-1)
+        found = self.sorted_ids[pos] == ids
+        return np.where(found, self.order[pos], -1)
+
+    def match(self, ids):
+        """
+        :param ids: station IDs (array1 of match_two_array).
+        :return: idx1 and idx2, int numpy arrays, ids[idx1] == indexed_ids[idx2].
+        """
+        idx = self.lookup(ids)
+        idx1 = np.flatnonzero(idx >= 0)
+        return idx1, idx[idx1]
+
+
+# the index of the last array2, usually the same station list is matched
+# against the observations of many hours
+# (key, StationIndex), replaced as a whole so threads never see a mixed pair
+_last_index = (None, None)
+
+
 def match_two_array(array1='none', array2='none'):
     """
     Arguments:
@@ -28,19 +96,13 @@ def match_two_array(array1='none', array2='none'):
     Return:
     
     idx1 and idx2 are the index of array1 and array2 where the station ID are the same
+    (int numpy arrays, empty if no station ID is the same)
     """
-    idx2=0
-    idx1=0
-    nsta1=len(array1)
-    ns=0
-    for i in range(0,nsta1):
-        idx=np.where(array2 == array1[i])
-        if(idx[0] >= 0):
-            if(ns == 0):
-                idx2=idx[0]
-                idx1=i
-            if(ns != 0):
-                idx2=np.append(idx2,idx[0])
-                idx1=np.append(idx1,i)
-            ns=ns+1
-    return idx1,idx2
\ No newline at end of file
+    global _last_index
+    array2 = _as_ids(array2)
+    key = (array2.dtype.str, array2.tobytes())
+    last_key, index = _last_index
+    if last_key != key:
+        index = StationIndex(array2)
+        _last_index = (key, index)
+    return index.match(array1)
@@ -0,0 +1,147 @@
+# _*_ coding: utf-8 _*_
+
+"""
+  Precipitation stages of the QPF products.
+  降水累加, 滑动时段累计等, 均沿预报时效一次向量化完成.
+"""
+
+import numpy as np
+import xarray as xr
+import nmc_met_io.retrieve_cimiss_server as CMISS_IO
+import nmc_met_map.lib.utility as utl
+
+
+def accumulate(rain, window=None, accumulated=False):
+    """
+    Accumulated precipitation along forecast_period with one cumulative sum.
+    :param rain: xarray Dataset, 'data' of the precipitation of each interval,
+                 with the time dimension.
+    :param window: hours of the rolling accumulation window, e.g. 24 for the
+                   24h precipitation out of RAIN03 or RAIN06. None to
+                   accumulate from the first time. The windows reaching
+                   before the first time are accumulated from the start.
+    :param accumulated: rain is already accumulated from the initial time
+                        (e.g. the CIMISS TPE), only the windows are computed.
+    :return: new xarray Dataset, rain is not modified.
+    :Examples:
+    >>> rain24 = accumulate(rain06, window=24)
+    """
+    data = rain['data']
+    axis = data.get_axis_num('time')
+    values = np.asarray(data.values, dtype=float)
+    total = values if accumulated else np.cumsum(values, axis=axis)
+
+    if window is not None:
+        fhours = np.atleast_1d(rain['forecast_period'].values).astype(float)
+        # total[i]-total[j], j the last time not later than fhours[i]-window
+        start = np.searchsorted(fhours, fhours-window, side='right')
+        padded = np.concatenate(
+            [np.zeros_like(np.take(total, [0], axis=axis)), total], axis=axis)
+        total = (np.take(padded, np.arange(1, len(fhours)+1), axis=axis) -
+                 np.take(padded, start, axis=axis))
+
+    result = rain.copy()
+    result['data'] = data.copy(data=total)
+    return result
+
+
+def classify_precip_type(rain, snow, threshold=0.1):
+    """
+    Rain, snow and sleet of a whole (time, lat, lon) stack in one pass.
+    雨: 降水>threshold且降雪<threshold; 雪: 降雪>threshold且雨<threshold;
+    雨夹雪: 降雪和雨都>threshold.
+    :param rain: xarray Dataset, 'data' of the total precipitation.
+    :param snow: xarray Dataset, 'data' of the snowfall, the same grid as rain.
+    :param threshold: the threshold of the precipitation, mm.
+    :return: xarray Dataset with the 'rain', 'snow' and 'sleet' variables,
+             NaN where the precipitation is not of the type.
+    """
+    total = np.asarray(rain['data'].values, dtype=float)
+    solid = np.asarray(snow['data'].values, dtype=float)
+    liquid = total-solid
+    with np.errstate(invalid='ignore'):
+        is_snow = solid > threshold
+        sleet = np.where((liquid > threshold) & is_snow, total, np.nan)
+        snw = np.where((liquid < threshold) & is_snow, solid, np.nan)
+        rn = np.where((total > threshold) & (solid < threshold), total, np.nan)
+    return xr.Dataset({'rain': rain['data'].copy(data=rn),
+                       'snow': snow['data'].copy(data=snw),
+                       'sleet': rain['data'].copy(data=sleet)},
+                      attrs=rain.attrs)
+
+
+def interval_precip(accumulated, fhours, t_gap):
+    """
+    Precipitation of the t_gap hours ending at each of fhours, the
+    differences of the precipitation accumulated from the initial time.
+    :param accumulated: xarray Dataset, 'data' accumulated from the initial
+                        time, with the time dimension, containing the
+                        forecast hours fhours and fhours-t_gap.
+    :param fhours: the end of the intervals, hours.
+    :param t_gap: the length of the intervals, hours.
+    :return: xarray Dataset at the times of fhours.
+    """
+    data = accumulated['data']
+    axis = data.get_axis_num('time')
+    available = np.atleast_1d(accumulated['forecast_period'].values).astype(float)
+    fhours = np.asarray(fhours, dtype=float)
+    end = np.searchsorted(available, fhours)
+    start = np.searchsorted(available, fhours-t_gap)
+    if (np.any(end >= len(available)) or np.any(start >= len(available)) or
+            np.any(available[end] != fhours) or
+            np.any(available[start] != fhours-t_gap)):
+        raise ValueError('The accumulated precipitation of some hours is missing')
+
+    values = np.asarray(data.values, dtype=float)
+    if len(fhours) == len(available)-1 and np.all(start == end-1):
+        # consecutive intervals, one difference along time
+        total = np.diff(values, axis=axis)
+    else:
+        total = np.take(values, end, axis=axis)-np.take(values, start, axis=axis)
+    result = accumulated.isel(time=end)
+    result['data'] = result['data'].copy(data=total)
+    return result
+
+
+def cimiss_accumulated_precip(init_time_str, valid_times, model='ECMWF',
+                              var_name='TPE'):
+    """
+    Precipitation accumulated from the initial time from CIMISS, all the
+    valid times in one request.
+    :param init_time_str: the initial time, e.g. '2020021908'.
+    :param valid_times: the forecast hours.
+    :param model: the model name.
+    :param var_name: 'TPE' for the total precipitation, 'TTSP' for snowfall.
+    :return: xarray Dataset, mm, None if the data is missing.
+    """
+    valid_times = np.unique(np.asarray(valid_times, dtype=int))
+    try:
+        data = CMISS_IO.cimiss_model_by_times(
+            init_time_str, valid_times=valid_times,
+            data_code=utl.CMISS_data_code(data_source=model, var_name=var_name),
+            levattrs={'long_name': 'Height above Ground', 'units': 'm',
+                      '_CoordinateAxisType': '-'},
+            fcst_level=0, fcst_ele=var_name, units='kg*m^-2')
+    except KeyError:
+        raise ValueError('Can not find all data needed')
+    if data is None:
+        return None
+    data['data'].values = data['data'].values*1000
+    return data
+
+
+def cimiss_interval_precip(init_time_str, fhours, t_gap, model='ECMWF',
+                           var_name='TPE'):
+    """
+    Precipitation of the t_gap hours ending at each of fhours from CIMISS.
+    The union of fhours and fhours-t_gap is fetched once, the two sets
+    overlap in all but one time for the consecutive intervals.
+    :return: xarray Dataset, mm, None if the data is missing.
+    """
+    fhours = np.atleast_1d(np.asarray(fhours, dtype=int))
+    accumulated = cimiss_accumulated_precip(
+        init_time_str, np.union1d(fhours, fhours-t_gap), model=model,
+        var_name=var_name)
+    if accumulated is None:
+        return None
+    return interval_precip(accumulated, fhours, t_gap)
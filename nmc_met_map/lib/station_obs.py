@@ -0,0 +1,101 @@
+# _*_ coding: utf-8 _*_
+
+"""
+  Station observation time series from the MICAPS station files.
+  所需时次的观测文件并发读取, 按站号取出目标站后缓存, 重绘同一站点时不再重复下载.
+"""
+
+import threading
+from datetime import datetime
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from nmc_met_io.retrieve_micaps_server import get_station_data
+from nmc_met_map.lib.grid_cache import GRID_FETCH_WORKERS
+
+# the number of (file, stations) records kept in memory
+OBS_CACHE_SIZE = 1024
+
+# the records of the stations in each file, {(directory, filename, ids): DataFrame}
+_obs_records = OrderedDict()
+_obs_lock = threading.Lock()
+
+
+def clear_obs_cache():
+    """
+    Clear the cached station records.
+    """
+    with _obs_lock:
+        _obs_records.clear()
+
+
+def _station_records(directory, filename, ids):
+    """
+    The records of the stations in one file, None if the file is missing.
+    """
+    key = (directory, filename, ids)
+    with _obs_lock:
+        if key in _obs_records:
+            _obs_records.move_to_end(key)
+            return _obs_records[key]
+
+    try:
+        obs_data = get_station_data(directory, filename=filename)
+    except Exception:
+        obs_data = None
+    if obs_data is None:
+        # not cached, the file may come later
+        return None
+
+    records = obs_data.loc[obs_data['ID'].isin(ids)]
+    with _obs_lock:
+        _obs_records[key] = records
+        while len(_obs_records) > OBS_CACHE_SIZE:
+            _obs_records.popitem(last=False)
+    return records
+
+
+def get_station_obs_series(ids, times, directory='SURFACE/PLOT/',
+                           max_workers=GRID_FETCH_WORKERS):
+    """
+    Observation time series of the stations.
+    :param ids: station ID or list of station IDs.
+    :param times: list of datetime, the observation times.
+    :param directory: the directory of the station files.
+    :param max_workers: the maximum number of concurrent requests.
+    :return: pandas DataFrame of the records in time order, up to the
+             first missing file or the current time, None if no records.
+    :Examples:
+    >>> obs = get_station_obs_series(
+            54511, [datetime(2020, 2, 19, 8)+timedelta(hours=3*i) for i in range(8)])
+    """
+    if np.ndim(ids) == 0:
+        ids = [ids]
+    ids = tuple(sorted(set(ids)))
+    # the future hours of a forecast have no observation yet
+    now = datetime.now()
+    filenames = []
+    for time in times:
+        if time > now:
+            break
+        filenames.append(time.strftime("%Y%m%d%H")+'0000.000')
+    if len(filenames) == 0:
+        return None
+
+    with ThreadPoolExecutor(
+            max_workers=min(max_workers, len(filenames))) as executor:
+        records = list(executor.map(
+            lambda filename: _station_records(directory, filename, ids),
+            filenames))
+
+    series = []
+    for record in records:
+        if record is None:
+            # no later observations
+            break
+        if len(record) > 0:
+            series.append(record)
+    if len(series) == 0:
+        return None
+    return pd.concat(series, ignore_index=True)
@@ -15,7 +15,9 @@ import matplotlib.pyplot as plt
 import matplotlib.patheffects as mpatheffects
 import matplotlib.ticker as mticker
 from cartopy.io.shapereader import Reader
+import shapely.geometry as sgeom
 import locale
+import warnings
 import cartopy.feature as cfeature
 import sys
 ########
@@ -29,14 +31,24 @@ from nmc_met_io import DataBlock_pb2
 from nmc_met_io.config import _get_config_from_rcfile
 import math
 import struct
-from nmc_met_io.retrieve_micaps_server import get_model_grids
+from nmc_met_map.lib.grid_cache import get_model_grid, GridCache
+import nmc_met_map.lib.column_interp as colint
 from scipy.ndimage import gaussian_filter
-from scipy.interpolate import griddata
+from scipy.interpolate import LinearNDInterpolator
+from scipy.spatial import Delaunay
 import matplotlib as mpl
 import os.path
+import hashlib
+import tempfile
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 from matplotlib.text import TextPath
 from matplotlib.patches import PathPatch
-from matplotlib.transforms import IdentityTransform
+from matplotlib.transforms import IdentityTransform, Affine2D
+from matplotlib.collections import PathCollection
+from matplotlib.font_manager import FontProperties
+from matplotlib.contour import ContourSet
+from matplotlib.artist import Artist
 import cartopy.io.img_tiles as cimgt
 import matplotlib.colors as colors
 def obs_radar_filename(time='none', product_name='CREF'):
@@ -133,77 +145,271 @@ def add_logo_extra_in_axes(pos=[0.1,0.1,.2,.4],
     ax.imshow(logo,alpha=0.6)
     ax.axis('off')
 
+# city tables parsed from the resources, {fname: (lon, lat, names)}
+_city_tables = {}
+
+# label paths of the city tables, {(fname, size): [TextPath]}
+_city_label_paths = {}
+
+# the province cities labelled on the right of the marker
+_CITY_LABEL_LEFT = ['香港', '南京', '石家庄', '天津']
+
+
+def _load_city_table(fname):
+    if fname not in _city_tables:
+        city = read_micaps_17(pkg_resources.resource_filename(
+            'nmc_met_map', "resource/" + fname))
+        if city is None:
+            raise ValueError('can not find the file '+fname+' in the resources')
+        lon = city['lon'].values.astype(float)
+        lat = city['lat'].values.astype(float)
+        if fname == 'city_province.000':
+            lon = lon/100.
+            lat = lat/100.
+        _city_tables[fname] = (lon, lat, city['Name'].values)
+    return _city_tables[fname]
+
+
+def _load_city_label_paths(fname, size):
+    """
+    Text paths of the city names in points, aligned to the top right
+    (top left for _CITY_LABEL_LEFT) of the origin.
+    """
+    key = (fname, size)
+    if key not in _city_label_paths:
+        _, _, city_names = _load_city_table(fname)
+        prop = FontProperties(family='SimHei')
+        paths = []
+        for name in city_names:
+            path = TextPath((0, 0), name, size=size, prop=prop)
+            ext = path.get_extents()
+            if name in _CITY_LABEL_LEFT and fname == 'city_province.000':
+                dx = -ext.x0
+            else:
+                dx = -ext.x1
+            paths.append(path.transformed(Affine2D().translate(dx, -ext.y1)))
+        _city_label_paths[key] = paths
+    return _city_label_paths[key]
+
+
+def _add_city_labels(ax, fname, idx, lon, lat, size, zorder, transform):
+    """
+    Draw all the labels in one PathCollection, the text paths are in points
+    and placed at the city positions.
+    """
+    if len(idx) == 0:
+        return None
+    paths = _load_city_label_paths(fname, size)
+    if transform is None:
+        offset_trans = ax.transData
+    elif hasattr(transform, '_as_mpl_transform'):
+        offset_trans = transform._as_mpl_transform(ax)
+    else:
+        offset_trans = transform
+    offsets = np.column_stack([lon[idx], lat[idx]])
+    try:
+        labels = PathCollection(
+            [paths[i] for i in idx], sizes=[1], offsets=offsets,
+            offset_transform=offset_trans, facecolors='black',
+            edgecolors='none', zorder=zorder)
+    except TypeError:
+        # matplotlib < 3.6
+        labels = PathCollection(
+            [paths[i] for i in idx], sizes=[1], offsets=offsets,
+            transOffset=offset_trans, facecolors='black',
+            edgecolors='none', zorder=zorder)
+    labels.set_transform(IdentityTransform())
+    ax.add_collection(labels, autolim=False)
+    return labels
+
+
 def add_city_on_map(ax,map_extent=[70,140,15,55],size=7,small_city=False,zorder=10, **kwargs):
     """
+    Add the cities (marker and name) inside map_extent.
+    The city tables are read once per process, all the markers of one table
+    are drawn by one scatter and all the names by one PathCollection.
     :param ax: `matplotlib.figure`, The `figure` instance used for plotting
-    :param x: x position padding in pixels
-    :param kwargs:
-    :return: `matplotlib.image.FigureImage`
-             The `matplotlib.image.FigureImage` instance created.
+    :param map_extent: [lon0, lon1, lat0, lat1]
+    :param size: font size, the names are drawn with size-4.
+    :param small_city: add the small cities.
+    :param kwargs: transform and other arguments of ax.scatter.
+    :return: None
     """
     dlon=map_extent[1]-map_extent[0]
     dlat=map_extent[3]-map_extent[2]
+    transform = kwargs.get('transform', None)
+
+    def inside(lon, lat, margin):
+        return ((lon > map_extent[0]+dlon*margin) & (lon < map_extent[1]-dlon*margin) &
+                (lat > map_extent[2]+dlat*margin) & (lat < map_extent[3]-dlat*margin))
 
     #small city
     if(small_city):
-        try:
-            fname = 'small_city.000'
-            fpath = "resource/" + fname
-        except KeyError:
-            raise ValueError('can not find the file small_city.000 in the resources')
-        city = read_micaps_17(pkg_resources.resource_filename(
-            'nmc_met_map', fpath))
-
-        lon=city['lon'].values.astype(np.float)
-        lat=city['lat'].values.astype(np.float)
-        city_names=city['Name'].values
-
-        for i in range(0,len(city_names)):
-            if((lon[i] > map_extent[0]+dlon*0.05) and (lon[i] < map_extent[1]-dlon*0.05) and
-            (lat[i] > map_extent[2]+dlat*0.05) and (lat[i] < map_extent[3]-dlat*0.05)):
-                    #ax.text(lon[i],lat[i],city_names[i], family='SimHei-Bold',ha='right',va='top',size=size-4,color='w',zorder=zorder,**kwargs)
-                ax.text(lon[i],lat[i],city_names[i], family='SimHei',ha='right',va='top',size=size-4,color='black',zorder=zorder,**kwargs)
-            ax.scatter(lon[i], lat[i], c='black', s=25, alpha=0.5,zorder=zorder, **kwargs)
-    #province city
-    try:
-        fname = 'city_province.000'
-        fpath = "resource/" + fname
-    except KeyError:
-        raise ValueError('can not find the file city_province.000 in the resources')
-
-    city = read_micaps_17(pkg_resources.resource_filename(
-        'nmc_met_map', fpath))
-
-    lon=city['lon'].values.astype(np.float)/100.
-    lat=city['lat'].values.astype(np.float)/100.
-    city_names=city['Name'].values
+        lon, lat, _ = _load_city_table('small_city.000')
+        mask = inside(lon, lat, 0.05)
+        _add_city_labels(ax, 'small_city.000', np.flatnonzero(mask),
+                         lon, lat, size-4, zorder, transform)
+        mask = inside(lon, lat, 0)
+        ax.scatter(lon[mask], lat[mask], c='black', s=25, alpha=0.5,zorder=zorder, **kwargs)
 
+    #province city
      # 步骤一（替换sans-serif字体） #得删除C:\Users\HeyGY\.matplotlib 然后重启vs，刷新该缓存目录获得新的字体
-    plt.rcParams['font.sans-serif'] = ['SimHei']     
+    plt.rcParams['font.sans-serif'] = ['SimHei']
     plt.rcParams['axes.unicode_minus'] = False  # 步骤二（解决坐标轴负数的负号显示问题）
-    for i in range(0,len(city_names)):
-        if((lon[i] > map_extent[0]+dlon*0.05) and (lon[i] < map_extent[1]-dlon*0.05) and
-        (lat[i] > map_extent[2]+dlat*0.05) and (lat[i] < map_extent[3]-dlat*0.05)):
-            if(city_names[i] != '香港' and city_names[i] != '南京' and city_names[i] != '石家庄' and  city_names[i] != '天津'):
-                r = city_names[i]
-                ax.text(lon[i],lat[i],city_names[i], family='SimHei',ha='right',va='top',size=size-4,color='black',zorder=zorder,**kwargs)
-            else:
-                ax.text(lon[i],lat[i],city_names[i], family='SimHei',ha='left',va='top',size=size-4,color='black',zorder=zorder,**kwargs)
-                #"""带白边字体，字体大小会随着地图范围放大缩小，尚未解决该问题
-                #r = city_names[i]
-                #text_path = TextPath((int(lon[i])+100*(lon[i]-int(lon[i]))/60., int(lat[i])+100*(lat[i]-int(lat[i]))/60.), r,ha='left',va='top', size=size, **kwargs)
-                #p1 = PathPatch(text_path, ec="w", lw=3, fc="w", **kwargs,visible=True)
-                #p2 = PathPatch(text_path, ec="none", fc="k", **kwargs,visible=True)
-                #ax.add_artist(p1)
-                #ax.add_artist(p2)
-                #"""
-            ax.scatter(int(lon[i])+100*(lon[i]-int(lon[i]))/60., int(lat[i])+100*(lat[i]-int(lat[i]))/60., c='black', s=25, zorder=zorder,**kwargs)
+    lon, lat, _ = _load_city_table('city_province.000')
+    idx = np.flatnonzero(inside(lon, lat, 0.05))
+    _add_city_labels(ax, 'city_province.000', idx,
+                     lon, lat, size-4, zorder, transform)
+    # the table is in degree.minute, the markers are drawn in degree
+    lon_deg = lon[idx].astype(int)+100*(lon[idx]-lon[idx].astype(int))/60.
+    lat_deg = lat[idx].astype(int)+100*(lat[idx]-lat[idx].astype(int))/60.
+    ax.scatter(lon_deg, lat_deg, c='black', s=25, zorder=zorder,**kwargs)
     return
 
+# parsed shapefiles, {name: (geometries, bounds)}
+_china_map_geometries = {}
+
+# geometries clipped to a view and simplified for its zoom level
+_china_map_views = {}
+
+CHINA_MAP_NAMES = {'nation': "NationalBorder", 'province': "Province",
+                   'county': "County", 'river': "hyd1_4l",
+                   'river_high': "hyd2_4l",
+                   'coastline': 'ne_10m_coastline'}
+
+
+def _load_china_map(name):
+    """
+    Read the shapefile once per process.
+    :return: (list of shapely geometries, bounds array [n, 4])
+    """
+    if name not in _china_map_geometries:
+        shpfile = pkg_resources.resource_filename(
+            'nmc_met_map', "/resource/shapefile/" + CHINA_MAP_NAMES[name] + ".shp")
+        geoms = [geom for geom in Reader(shpfile).geometries()
+                 if geom is not None and not geom.is_empty]
+        bounds = np.array([geom.bounds for geom in geoms]).reshape(-1, 4)
+        _china_map_geometries[name] = (geoms, bounds)
+    return _china_map_geometries[name]
+
+
+def _map_area_box(area_name, map_ratio=19/9.):
+    """
+    lon/lat box of the named area in get_map_area, padded as the products
+    mask the data (20% in lon, 10% in lat).
+    """
+    cntr_pnt, zoom_ratio = get_map_area(area_name)
+    return tuple(get_padded_extent(
+        get_map_extent(cntr_pnt, zoom_ratio, map_ratio)))
+
+
+def _china_map_tolerance(box):
+    # about one pixel of a 16 inches figure at dpi 200, rounded to a power
+    # of 2 so that close views share the simplified geometries
+    tol = (box[1]-box[0])/3200.
+    return 2.**np.floor(np.log2(tol))
+
+
+def _clip_china_map(name, box):
+    geoms, bounds = _load_china_map(name)
+    inside = ((bounds[:, 2] >= box[0]) & (bounds[:, 0] <= box[1]) &
+              (bounds[:, 3] >= box[2]) & (bounds[:, 1] <= box[3]))
+    tol = _china_map_tolerance(box)
+    clip_box = sgeom.box(box[0], box[2], box[1], box[3])
+    clipped = []
+    for idx in np.flatnonzero(inside):
+        geom = geoms[idx]
+        b = bounds[idx]
+        if not (b[0] >= box[0] and b[2] <= box[1] and
+                b[1] >= box[2] and b[3] <= box[3]):
+            geom = geom.intersection(clip_box)
+        geom = geom.simplify(tol, preserve_topology=False)
+        if geom.geom_type == 'GeometryCollection':
+            # the clipping may leave points on the edge of the box
+            clipped.extend(part for part in geom.geoms
+                           if 'Point' not in part.geom_type)
+        elif not geom.is_empty:
+            clipped.append(geom)
+    return clipped
+
+
+def precompute_china_map_areas(names=['coastline', 'province', 'nation', 'river'],
+                               areas=None):
+    """
+    Clip and simplify the map geometries for the named areas in advance,
+    e.g. once at the start of a batch of products.
+    :param names: map names, see add_china_map_2cartopy_public.
+    :param areas: area names of get_map_area, default all.
+    :return: None
+    """
+    if areas is None:
+        areas = list(MAP_AREA_CNTR_PNT.keys())
+    for area in areas:
+        box = _map_area_box(area)
+        if box[0] < -180 or box[1] > 180:
+            continue
+        for name in names:
+            key = (name, area)
+            if key not in _china_map_views:
+                _china_map_views[key] = _clip_china_map(name, box)
+
+
+def get_china_map_geometries(name, box=None):
+    """
+    Return the geometries of map name inside the lon/lat box.
+    视野落在get_map_area某一区域内时, 使用该区域预先裁剪好的几何体,
+    否则按视野(取整到1度)裁剪并缓存.
+    :param name: map name, see add_china_map_2cartopy_public.
+    :param box: [lon0, lon1, lat0, lat1], None for all the geometries.
+    :return: list of shapely geometries.
+    """
+    if box is None:
+        return _load_china_map(name)[0]
+
+    # the smallest named area containing the view
+    area_key = None
+    area_size = None
+    for area in MAP_AREA_CNTR_PNT.keys():
+        area_box = _map_area_box(area)
+        if (area_box[0] <= box[0] and area_box[1] >= box[1] and
+                area_box[2] <= box[2] and area_box[3] >= box[3]):
+            size = (area_box[1]-area_box[0])*(area_box[3]-area_box[2])
+            if area_size is None or size < area_size:
+                area_key, area_size = area, size
+    if area_key is not None:
+        box = _map_area_box(area_key)
+    else:
+        box = (np.floor(box[0]), np.ceil(box[1]),
+               np.floor(box[2]), np.ceil(box[3]))
+        area_key = box
+
+    key = (name, area_key)
+    if key not in _china_map_views:
+        _china_map_views[key] = _clip_china_map(name, box)
+    return _china_map_views[key]
+
+
+def _view_box(ax):
+    """
+    lon/lat box of the axes view with 1 degree margin, None if the view
+    crosses the dateline or covers the whole globe.
+    """
+    try:
+        box = ax.get_extent(crs=ccrs.PlateCarree())
+    except Exception:
+        return None
+    box = (box[0]-1, box[1]+1, box[2]-1, box[3]+1)
+    if box[0] < -180 or box[1] > 180 or box[0] >= box[1]:
+        return None
+    return box
+
+
 def add_china_map_2cartopy_public(ax, name='province', facecolor='none',
                            edgecolor='c', lw=2, **kwargs):
     """
     Draw china boundary on cartopy map.
+    The shapefile is read once per process, and only the geometries inside
+    the view (simplified for the zoom level) are handed to cartopy.
     :param ax: matplotlib axes instance.
     :param name: map name.
     :param facecolor: fill color, default is none.
@@ -212,21 +418,31 @@ def add_china_map_2cartopy_public(ax, name='province', facecolor='none',
     :return: None
     """
 
-    # map name
-    names = {'nation': "NationalBorder", 'province': "Province",
-             'county': "County", 'river': "hyd1_4l",
-             'river_high': "hyd2_4l",
-             'coastline':'ne_10m_coastline'}
-
-    # get shape filename
-    shpfile = pkg_resources.resource_filename(
-        'nmc_met_map', "/resource/shapefile/" + names[name] + ".shp")
-
     # add map
     ax.add_geometries(
-        Reader(shpfile).geometries(), ccrs.PlateCarree(),
+        get_china_map_geometries(name, box=_view_box(ax)), ccrs.PlateCarree(),
         facecolor=facecolor, edgecolor=edgecolor, lw=lw, **kwargs)
 
+def remove_plot_artists(artists):
+    """
+    Remove the data layers drawn on a map, so the map can be reused.
+    :param artists: list of matplotlib artists, ContourSet included.
+    :return: None
+    """
+    for artist in artists:
+        if artist is None:
+            continue
+        if isinstance(artist, ContourSet):
+            for text in artist.labelTexts:
+                text.remove()
+            artist.labelTexts = []
+            if not isinstance(artist, Artist):
+                # matplotlib < 3.8, ContourSet is not an artist itself
+                for coll in artist.collections:
+                    coll.remove()
+                continue
+        artist.remove()
+
 def add_public_title(title, initTime,
                     fhour=0, fontsize=20, multilines=False,atime=24,
                     English=False):
@@ -286,39 +502,63 @@ def add_south_China_sea(map_extent=[107,120,2,20],pos=[0.1,0.1,.2,.4], **kwargs)
     #ax.background_img(name='RD', resolution='high')
     add_cartopy_background(ax,name='RD')
     
+# solved extents, {(projection, data crs, map_extent): map_extent2}
+_map_ratio_extents = {}
+
+# tolerance of the x/y ratio of the map extent
+MAP_RATIO_TOLERANCE = 0.001
+
+
+def _extent_ratio(ax, map_extent, datacrs):
+    """
+    x/y ratio of the extent cartopy gives ax for map_extent.
+    """
+    ax.set_extent(map_extent, crs=datacrs)
+    x0, x1, y0, y1 = ax.get_extent()
+    return (x1-x0)/(y1-y0)
+
+
 def adjust_map_ratio(ax,map_extent=None,datacrs=None):
     '''
     adjust the map_ratio in the projection of AlbersEqualArea in different area
+    the latitude span is solved by bisection with ax.set_extent/get_extent
+    (about 20 steps), and memoised per (projection, map_extent).
     :ax = Axes required
     :map_extent=map_extent required
     :datacrs data projection reqired
-    :return none
+    :return map_extent2, the extent set on ax
     '''
     map_ratio=(map_extent[1]-map_extent[0])/(map_extent[3]-map_extent[2])
-    ax.set_extent(map_extent, crs=datacrs)
-    d_y=map_extent[3]-map_extent[2]
-    for i in range(0,10000):
-        map_ratio_real=(ax.get_extent()[1]-ax.get_extent()[0])/2./((ax.get_extent()[3]-ax.get_extent()[2])/2.)
-        if(abs(map_ratio_real-map_ratio) < 0.001):
-           break
-        if(i == 0):
-            if(map_ratio_real-map_ratio > 0):   
-                d_y=d_y+d_y*0.001
-            if(map_ratio_real-map_ratio <= 0):   
-                d_y=d_y-d_y*0.001
-            bottom=(map_extent[2]+map_extent[3])/2-d_y/2
-            top=(map_extent[2]+map_extent[3])/2+d_y/2
-            map_extent2=[map_extent[0],map_extent[1],bottom,top]
-        if(i > 0):
-            d_y=map_extent2[3]-map_extent2[2]
-            if(map_ratio_real-map_ratio > 0):   
-                d_y=d_y+d_y*0.001
-            if(map_ratio_real-map_ratio <= 0):   
-                d_y=d_y-d_y*0.001
-            bottom=(map_extent2[2]+map_extent2[3])/2-d_y/2
-            top=(map_extent2[2]+map_extent2[3])/2+d_y/2
-            map_extent2=[map_extent2[0],map_extent2[1],bottom,top]
-        ax.set_extent(map_extent2, crs=datacrs)
+    key = (ax.projection.proj4_init, datacrs.proj4_init, tuple(map_extent))
+    if key not in _map_ratio_extents:
+        cntr_lat=(map_extent[2]+map_extent[3])/2.
+        d_y=map_extent[3]-map_extent[2]
+
+        def extent(d_y):
+            return [map_extent[0],map_extent[1],cntr_lat-d_y/2.,cntr_lat+d_y/2.]
+
+        # the projected ratio decreases with the latitude span
+        d_y_low = d_y/10.
+        d_y_high = min(d_y*10., 2.*(89.-abs(cntr_lat)))
+        map_extent2 = extent(d_y)
+        for i in range(0,60):
+            map_ratio_real = _extent_ratio(ax, map_extent2, datacrs)
+            if(abs(map_ratio_real-map_ratio) < MAP_RATIO_TOLERANCE):
+                break
+            if(map_ratio_real-map_ratio > 0):
+                d_y_low = d_y
+            else:
+                d_y_high = d_y
+            d_y = (d_y_low+d_y_high)/2.
+            map_extent2 = extent(d_y)
+        _map_ratio_extents[key] = map_extent2
+
+    map_extent2 = list(_map_ratio_extents[key])
+    # check the ratio actually set on ax
+    map_ratio_real = _extent_ratio(ax, map_extent2, datacrs)
+    if(abs(map_ratio_real-map_ratio) > 10*MAP_RATIO_TOLERANCE):
+        warnings.warn('the map ratio %.3f differs from %.3f for the extent %s'
+                      % (map_ratio_real, map_ratio, str(map_extent)))
     return map_extent2
 
 def add_public_title_obs(title=None, initTime=None,valid_hour=0, fontsize=20, multilines=False,
@@ -360,6 +600,50 @@ def add_public_title_obs(title=None, initTime=None,valid_hour=0, fontsize=20, mu
     plt.title(title, loc='left', fontsize=fontsize)
     plt.title(time_str, loc='right', fontsize=fontsize-6)
 
+# zoom ratio and center point of the named areas
+MAP_AREA_ZOOM_RATIO = {
+    '全国':20,
+    '华北':5,
+    '东北':11,
+    '华南':5,
+    '西北':6,
+    '江南':5,
+    '江淮':5,
+    '华中':4,
+    '西南':7,
+    '西欧':15,
+    '欧洲':25,
+    '北美':30,
+    '南美':27,
+    '南亚':11,
+    '东南亚':12,
+    '中亚':13,
+    '东北亚':20,
+    '北非':18,
+    '南非':18,
+    '澳洲':20}
+MAP_AREA_CNTR_PNT = {
+    '全国':[102,34],
+    '华北':[116,38],
+    '东北':[123.5,45],
+    '华南':[110.5,22],
+    '西北':[90,43],
+    '江南':[112,27.6],
+    '江淮':[115,31],
+    '华中':[112,30],
+    '西南':[103,26.5],
+    '西欧':[5,45],
+    '欧洲':[14,48],
+    '北美':[263,45],
+    '南美':[300,-15],
+    '南亚':[80,16],
+    '东南亚':[110,4],
+    '中亚':[55,40],
+    '东北亚':[135,40],
+    '北非':[13,15],
+    '南非':[27,-12],
+    '澳洲':[140,-28]}
+
 def get_map_area(area_name):
 
     """
@@ -369,54 +653,102 @@ def get_map_area(area_name):
     :param cntr_pnt
     :return: None.
     """
-    zoom_ratio = {
-        '全国':20,
-        '华北':5,
-        '东北':11,
-        '华南':5,
-        '西北':6,
-        '江南':5,
-        '江淮':5,
-        '华中':4,
-        '西南':7,
-        '西欧':15,
-        '欧洲':25,
-        '北美':30,
-        '南美':27,
-        '南亚':11,
-        '东南亚':12,
-        '中亚':13,
-        '东北亚':20,
-        '北非':18,
-        '南非':18,
-        '澳洲':20}
-    cntr_pnt = {
-        '全国':[102,34],
-        '华北':[116,38],
-        '东北':[123.5,45],
-        '华南':[110.5,22],
-        '西北':[90,43],
-        '江南':[112,27.6],
-        '江淮':[115,31],
-        '华中':[112,30],
-        '西南':[103,26.5],
-        '西欧':[5,45],
-        '欧洲':[14,48],
-        '北美':[263,45],
-        '南美':[300,-15],
-        '南亚':[80,16],
-        '东南亚':[110,4],
-        '中亚':[55,40],
-        '东北亚':[135,40],
-        '北非':[13,15],
-        '南非':[27,-12],
-        '澳洲':[140,-28]}
-
-    cntr_pnt_back=cntr_pnt[area_name]
-    zoom_ratio_back=zoom_ratio[area_name]
+    cntr_pnt_back=MAP_AREA_CNTR_PNT[area_name]
+    zoom_ratio_back=MAP_AREA_ZOOM_RATIO[area_name]
 
     return cntr_pnt_back,zoom_ratio_back
 
+def get_map_extent(cntr_pnt, zoom_ratio, map_ratio):
+    """
+    The map extent of the products.
+    :param cntr_pnt: [lon, lat] of the center.
+    :param zoom_ratio: half of the latitude span.
+    :param map_ratio: the ratio of longitude span to latitude span.
+    :return: [lon0, lon1, lat0, lat1]
+    """
+    return [cntr_pnt[0]-zoom_ratio*1*map_ratio,
+            cntr_pnt[0]+zoom_ratio*1*map_ratio,
+            cntr_pnt[1]-zoom_ratio*1,
+            cntr_pnt[1]+zoom_ratio*1]
+
+def get_padded_extent(map_extent, pad_x=0.2, pad_y=0.1):
+    """
+    The extent of the data drawn on the map, larger than the map so that
+    the contours and their labels are not cut at the border.
+    :param map_extent: [lon0, lon1, lat0, lat1]
+    :param pad_x: padding of longitude, ratio of the longitude span.
+    :param pad_y: padding of latitude, ratio of the latitude span.
+    :return: [lon0, lon1, lat0, lat1]
+    """
+    delt_x=(map_extent[1]-map_extent[0])*pad_x
+    delt_y=(map_extent[3]-map_extent[2])*pad_y
+    return [map_extent[0]-delt_x, map_extent[1]+delt_x,
+            map_extent[2]-delt_y, map_extent[3]+delt_y]
+
+# index slices of the grids, {(grid, extent): {'lon': slice, 'lat': slice}}
+_area_slices = {}
+
+def get_area_slices(lon, lat, map_extent, pad_x=0.2, pad_y=0.1):
+    """
+    Integer slices of a regular grid inside the padded map extent,
+    the same points as the mask (lon > x0) & (lon < x1) & ... .
+    :param lon: 1D longitude of the grid.
+    :param lat: 1D latitude of the grid.
+    :param map_extent: [lon0, lon1, lat0, lat1]
+    :return: dict, {'lon': slice, 'lat': slice}, for xarray isel.
+    """
+    lon=np.asarray(lon)
+    lat=np.asarray(lat)
+    key=(lon.size, float(lon[0]), float(lon[-1]),
+         lat.size, float(lat[0]), float(lat[-1]),
+         tuple(map_extent), pad_x, pad_y)
+    if key not in _area_slices:
+        extent=get_padded_extent(map_extent, pad_x=pad_x, pad_y=pad_y)
+        slices={}
+        for name, coord, bounds in (('lon', lon, extent[0:2]),
+                                    ('lat', lat, extent[2:4])):
+            idx=np.flatnonzero((coord > bounds[0]) & (coord < bounds[1]))
+            if len(idx) == 0:
+                slices[name]=slice(0, 0)
+            else:
+                slices[name]=slice(idx[0], idx[-1]+1)
+        _area_slices[key]=slices
+    return dict(_area_slices[key])
+
+def cut_to_map_extent(data, map_extent, pad_x=0.2, pad_y=0.1):
+    """
+    Cut the grid to the padded map extent, a view of data instead of
+    data.where(mask, drop=True).
+    :param data: xarray Dataset or DataArray with lon and lat dimensions.
+    :param map_extent: [lon0, lon1, lat0, lat1]
+    :return: the same type as data.
+    """
+    return data.isel(**get_area_slices(
+        data['lon'].values, data['lat'].values, map_extent,
+        pad_x=pad_x, pad_y=pad_y))
+
+def get_area_catalogue(area_name, map_ratio=19/9, grid=None):
+    """
+    All the information of a named area needed by the products.
+    :param area_name: the name of the area in get_map_area.
+    :param map_ratio: the ratio of longitude span to latitude span.
+    :param grid: xarray Dataset, the model grid to cut, optional.
+    :return: dict, {'cntr_pnt', 'zoom_ratio', 'map_extent',
+             'padded_extent'} and 'isel' (the slices of grid) if grid is given.
+    :Examples:
+    >>> area = get_area_catalogue('华北', grid=gh)
+    >>> gh = gh.isel(**area['isel'])
+    """
+    cntr_pnt, zoom_ratio = get_map_area(area_name)
+    map_extent = get_map_extent(cntr_pnt, zoom_ratio, map_ratio)
+    area = {'cntr_pnt': cntr_pnt, 'zoom_ratio': zoom_ratio,
+            'map_extent': map_extent,
+            'padded_extent': get_padded_extent(map_extent)}
+    if grid is not None:
+        area['isel'] = get_area_slices(
+            grid['lon'].values, grid['lat'].values, map_extent)
+    return area
+
 
 def Tmax_stastics(Tmax):
 
@@ -794,9 +1126,113 @@ if __name__ == '__main__':
     print(data)
 
 
+# triangulations of the valid grid points used by the null filling,
+# {(window coordinates, valid mask): Delaunay}, the null mask seldom changes in time
+_null_fill_triangulations = {}
+
+# degrees of longitude and latitude around the points used to fill the nulls
+_NULL_FILL_WINDOW = (6, 5)
+
+
+def _fill_null_points(data, weights, points, Null_value=0, window=_NULL_FILL_WINDOW):
+    """
+    Fill the null values of the grid points used by the points with the
+    linear interpolation of the valid values around. Only the window of
+    window[0] degrees in longitude and window[1] in latitude around the
+    points is used, and the triangulation of the valid points is reused
+    as long as the null mask does not change.
+    :param data: xarray Dataset, with the 'data' variable.
+    :param weights: the output of get_point_weights.
+    :param points: dict, {'lon':[...], 'lat':[...]}.
+    :param Null_value: the value of the null grid points.
+    :return: xarray Dataset.
+    """
+    lon=np.asarray(data['lon'].values)
+    lat=np.asarray(data['lat'].values)
+    idx_x=np.flatnonzero((lon > np.min(points['lon'])-window[0]) &
+                         (lon < np.max(points['lon'])+window[0]))
+    idx_y=np.flatnonzero((lat > np.min(points['lat'])-window[1]) &
+                         (lat < np.max(points['lat'])+window[1]))
+    if len(idx_x) == 0 or len(idx_y) == 0:
+        return data
+    win_x=slice(idx_x[0], idx_x[-1]+1)
+    win_y=slice(idx_y[0], idx_y[-1]+1)
+
+    # the grid points used by the points, in the window
+    cells=np.unique(np.stack([weights['lat'].ravel(), weights['lon'].ravel()]), axis=1)
+    inside=((cells[0] >= win_y.start) & (cells[0] < win_y.stop) &
+            (cells[1] >= win_x.start) & (cells[1] < win_x.stop))
+    cells=cells[:, inside]
+
+    values=np.array(data['data'].values)
+    flat=values.reshape((-1,)+values.shape[-2:])
+    x,y=np.meshgrid(lon[win_x], lat[win_y])
+    for it in range(flat.shape[0]):
+        null=flat[it, cells[0], cells[1]] == Null_value
+        if not null.any():
+            continue
+        sub=flat[it, win_y, win_x]
+        valid=sub != Null_value
+        if valid.sum() < 3:
+            continue
+        key=(hashlib.md5(lon[win_x].tobytes()+lat[win_y].tobytes()).hexdigest(),
+             hashlib.md5(valid.tobytes()).hexdigest())
+        tri=_null_fill_triangulations.get(key)
+        if tri is None:
+            if len(_null_fill_triangulations) > 16:
+                _null_fill_triangulations.clear()
+            tri=Delaunay(np.column_stack([y[valid], x[valid]]))
+            _null_fill_triangulations[key]=tri
+        fill=LinearNDInterpolator(tri, sub[valid])(
+            np.column_stack([lat[cells[0][null]], lon[cells[1][null]]]))
+        flat[it, cells[0][null], cells[1][null]]=fill
+
+    data['data'].values=flat.reshape(values.shape)
+    return data
+
+
+def get_point_weights(lon, lat, points):
+    """
+    The 4 neighbouring grid points and the bilinear weights of the points.
+    :param lon: 1D longitude of the grid.
+    :param lat: 1D latitude of the grid.
+    :param points: dict, {'lon':[...], 'lat':[...]}.
+    :return: dict, lat/lon indices and weights, [points, 4],
+             the weights are NaN outside the grid.
+    """
+    j0, j1, wy = colint.linear_weights(lat, points['lat'])
+    i0, i1, wx = colint.linear_weights(lon, points['lon'])
+    return {'lat': np.stack([j0, j0, j1, j1], axis=-1),
+            'lon': np.stack([i0, i1, i0, i1], axis=-1),
+            'weights': np.stack([(1.-wy)*(1.-wx), (1.-wy)*wx,
+                                 wy*(1.-wx), wy*wx], axis=-1)}
+
+
+def extract_points(data, weights, points):
+    """
+    Bilinear interpolation of the grids to the points, the same result as
+    data.interp(lon=('points', points['lon']), lat=('points', points['lat'])).
+    :param data: xarray Dataset, with the 'data' variable.
+    :param weights: the output of get_point_weights.
+    :param points: dict, {'lon':[...], 'lat':[...]}.
+    :return: xarray Dataset, the lat and lon dimensions replaced by points.
+    """
+    corners=data['data'].isel(
+        lat=xr.DataArray(weights['lat'], dims=('points', 'corner')),
+        lon=xr.DataArray(weights['lon'], dims=('points', 'corner')))
+    values=(corners*xr.DataArray(weights['weights'], dims=('points', 'corner'))).sum(
+        'corner', skipna=False)
+    values.attrs=data['data'].attrs
+    values=values.assign_coords(lon=('points', np.asarray(points['lon'])),
+                                lat=('points', np.asarray(points['lat'])))
+    return xr.Dataset({'data': values}, attrs=data.attrs)
+
+
 def get_model_points_gy(directory, filenames, points, allExists=True,fill_null=False,Null_value=0):
     """
     Retrieve point time series from MICAPS cassandra service.
+    每个文件解码后只保留站点周围的区域(不进入格点缓存), 取出站点周围的
+    4个格点后即丢弃, 内存只与站点数和时次数有关.
     
     Args:
         directory (string): the data directory on the service.
@@ -812,47 +1248,34 @@ def get_model_points_gy(directory, filenames, points, allExists=True,fill_null=F
     >>> allExists (boolean): all files should exist, or return None.
     """
 
-    data = get_model_grids(directory, filenames, allExists=allExists)
-    
-    #if(fill_null is True):
-    #    temp=np.array(data['data'].values)
-    #    idx_null=np.where(temp == Null_value)
-    #    #temp[idx_null]=np.nan
-    #    temp2=gaussian_filter(temp,5)
-    #    temp[idx_null]=temp2[idx_null]
-    #    data['data'].values=temp
-
-    if(fill_null is True):
-        temp=np.array(data['data'].values)
-        dims=np.shape(temp)
-        grid_x=np.array(data['lon'].values)
-        grid_y=np.array(data['lat'].values)
-        x,y=np.meshgrid(data['lon'].values, data['lat'].values)
-        idx_x=np.squeeze(np.where((grid_x > points['lon'][0]-6) & (grid_x < points['lon'][0]+6)))
-        idx_y=np.squeeze(np.where((grid_y > points['lat'][0]-5) & (grid_y < points['lat'][0]+5)))
-        x2,y2=np.meshgrid(grid_x[idx_x[0]:idx_x[-1]], grid_y[idx_y[0]:idx_y[-1]])
-        nx2=len(idx_x)
-        ny2=len(idx_y)
-        x=x.reshape(dims[1]*dims[2])
-        y=y.reshape(dims[1]*dims[2])
-        nt=dims[0]
-        for it in range(0,nt):
-            temp2=np.squeeze(temp[it,:,:])
-            temp2=temp2.reshape(dims[1]*dims[2])
-            idx_ok=np.squeeze(np.where((temp2 != Null_value) & 
-                (x < points['lon'][0]+6) & (x > points['lon'][0]-6) &
-                (y < points['lat'][0]+5) & (y > points['lat'][0]-5)))
-
-            n_ok=len(idx_ok)
-            data_new=griddata(np.squeeze(np.dstack(([y[idx_ok],x[idx_ok]]))), temp2[idx_ok], (y2,x2))
-            temp[it,idx_y[0]:idx_y[-1],idx_x[0]:idx_x[-1]]=data_new.reshape(1,ny2-1,nx2-1)
-
-        data['data'].values=temp
-        
-    if data:
-        return data.interp(lon=('points', points['lon']), lat=('points', points['lat']))
-    else:
+    # the stations plus the window used to fill the null values
+    pad=max(_NULL_FILL_WINDOW)+1.
+    bbox=[np.min(points['lon'])-pad, np.max(points['lon'])+pad,
+          np.min(points['lat'])-pad, np.max(points['lat'])+pad]
+
+    dataset=[]
+    grid=None
+    for filename in filenames:
+        data=get_model_grid(directory, filename=filename, bbox=bbox, cache=False)
+        if data is None:
+            if allExists:
+                return None
+            continue
+
+        # the weights are computed once unless the grid changes
+        key=(data['lon'].values.tobytes(), data['lat'].values.tobytes())
+        if grid != key:
+            grid=key
+            weights=get_point_weights(data['lon'].values, data['lat'].values, points)
+
+        if(fill_null is True):
+            data=_fill_null_points(data, weights, points, Null_value=Null_value)
+        dataset.append(extract_points(data, weights, points))
+        del data
+
+    if len(dataset) == 0:
         return None
+    return xr.concat(dataset, dim='time')
 
 def gy_cm_rain_nws(atime=24, pos=None):
     """
@@ -1021,6 +1444,146 @@ def add_cartopy_background(ax,name='RD'):
     os.environ["CARTOPY_USER_BACKGROUNDS"] = bg_dir
     ax.background_img(name=name, resolution='high')
 
+# the static map layers drawn on every chart, and their default style
+_BASEMAP_LAYERS = {
+    'background': lambda ax: add_cartopy_background(ax, name='RD'),
+    'ocean': lambda ax: ax.add_feature(cfeature.OCEAN),
+    'coastline': lambda ax: add_china_map_2cartopy_public(
+        ax, name='coastline', edgecolor='gray', lw=0.8, alpha=0.5),
+    'province': lambda ax: add_china_map_2cartopy_public(
+        ax, name='province', edgecolor='gray', lw=0.5),
+    'nation': lambda ax: add_china_map_2cartopy_public(
+        ax, name='nation', edgecolor='black', lw=0.8),
+    'river': lambda ax: add_china_map_2cartopy_public(
+        ax, name='river', edgecolor='#74b9ff', lw=0.8, alpha=0.5)}
+
+# layers under the data (drawn in this order)
+BASEMAP_UNDER_LAYERS = ['background', 'ocean']
+
+# memory of the rasterised basemaps kept in this process, bytes
+BASEMAP_CACHE_MAX_BYTES = 512*1024*1024
+
+# rasterised basemaps already loaded in this process (uint8 RGBA),
+# least recently used ones are dropped first
+_basemap_images = GridCache(max_bytes=BASEMAP_CACHE_MAX_BYTES)
+
+
+def china_map_layers(add_china=True):
+    """
+    The boundary layers drawn over the data.
+    :param add_china: add the province, nation and river of China.
+    :return: list of layer names.
+    """
+    if add_china:
+        return ['coastline', 'province', 'nation', 'river']
+    return ['coastline']
+
+
+def basemap_cache_dir():
+    """
+    Directory of the rasterised basemaps, set NMC_MET_MAP_BASEMAP_DIR to
+    share it between machines or keep it across reboots.
+    """
+    return os.environ.get(
+        'NMC_MET_MAP_BASEMAP_DIR',
+        os.path.join(tempfile.gettempdir(), 'nmc_met_map_basemap'))
+
+
+def _basemap_key(ax, layers, dpi):
+    fig = ax.figure
+    key = repr((
+        ax.projection.proj4_init,
+        tuple(np.round(ax.get_extent(), 3)),
+        tuple(np.round(fig.get_size_inches(), 4)),
+        dpi,
+        tuple(np.round(ax.get_position().bounds, 4)),
+        tuple(layers)))
+    return hashlib.md5(key.encode('utf-8')).hexdigest()
+
+
+def _render_basemap(ax, layers, dpi):
+    """
+    Render the static layers on an offscreen figure with the same size,
+    axes position, projection and extent as ax, return the RGBA pixels of
+    the axes area.
+    """
+    fig = Figure(figsize=ax.figure.get_size_inches(), dpi=dpi)
+    canvas = FigureCanvasAgg(fig)
+    fig.patch.set_alpha(0)
+    cax = fig.add_axes(ax.get_position().bounds, projection=ax.projection)
+    cax.set_extent(ax.get_extent(), crs=ax.projection)
+    cax.set_axis_off()
+    cax.patch.set_visible(False)
+    for i, layer in enumerate(layers):
+        n_artists = len(cax.get_children())
+        _BASEMAP_LAYERS[layer](cax)
+        # keep the order of the layers in the list
+        for artist in cax.get_children()[n_artists:]:
+            artist.set_zorder(i)
+
+    canvas.draw()
+    buf = np.asarray(canvas.buffer_rgba())
+    x0, y0, x1, y1 = np.round(cax.bbox.extents).astype(int)
+    height = buf.shape[0]
+    return buf[height-y1:height-y0, x0:x1].copy()
+
+
+def add_cached_basemap(ax, layers=BASEMAP_UNDER_LAYERS, zorder=0, dpi=None,
+                       cache_dir=None):
+    """
+    Draw the static map layers (ocean, background, coastline, boundaries)
+    from a pre-rendered image.
+    图层按 (投影, 范围, 图幅, dpi, 图层) 渲染一次并保存为png, 之后相同
+    底图的产品直接贴图, 不再重新投影shapefile.
+
+    :param ax: cartopy GeoAxes, the extent should already be set
+               (after adjust_map_ratio).
+    :param layers: list of layer names, 'background', 'ocean', 'coastline',
+                   'province', 'nation', 'river'.
+    :param zorder: zorder of the image, 0 under the data, 5 for boundaries.
+    :param dpi: the dpi of the saved figure, None for savefig.dpi of
+                matplotlib (or the figure dpi).
+    :param cache_dir: the directory of the images, default basemap_cache_dir().
+    :return: matplotlib AxesImage.
+    :Examples:
+    >>> utl.add_cached_basemap(ax, layers=utl.BASEMAP_UNDER_LAYERS, zorder=0)
+    >>> utl.add_cached_basemap(ax, layers=utl.china_map_layers(), zorder=5)
+    """
+    if dpi is None:
+        dpi = plt.rcParams['savefig.dpi']
+        if dpi == 'figure':
+            dpi = ax.figure.dpi
+    key = _basemap_key(ax, layers, dpi)
+    img = _basemap_images.get(key)
+    if img is None:
+        if cache_dir is None:
+            cache_dir = basemap_cache_dir()
+        fname = os.path.join(cache_dir, key+'.png')
+        if os.path.isfile(fname):
+            img = plt.imread(fname)
+            if img.dtype != np.uint8:
+                # png is read as float, 4 times the memory
+                img = np.round(img*255).astype(np.uint8)
+        else:
+            img = _render_basemap(ax, layers, dpi)
+            if not os.path.exists(cache_dir):
+                os.makedirs(cache_dir, exist_ok=True)
+            # write to a temporary file first, other processes never see
+            # a partial image
+            fd, tmp = tempfile.mkstemp(suffix='.png', dir=cache_dir)
+            os.close(fd)
+            plt.imsave(tmp, img)
+            os.replace(tmp, fname)
+        _basemap_images.put(key, img)
+
+    extent = ax.get_extent()
+    xlim, ylim = ax.get_xlim(), ax.get_ylim()
+    image = ax.imshow(img, extent=extent, transform=ax.projection,
+                      origin='upper', interpolation='nearest', zorder=zorder)
+    ax.set_xlim(xlim)
+    ax.set_ylim(ylim)
+    return image
+
 class TDT_img(cimgt.GoogleWTS):
     def _image_url(self, tile):
         x, y, z = tile
@@ -1050,4 +1613,41 @@ def get_part_clev_and_cmap(clev_range=[0,4],color_all=None,clev_slt=None):
     if color_all is not None:
         cmap=mpl.colors.LinearSegmentedColormap.from_list(" ", color_all)    
     color_slt=np.array(cmap((clev_slt-clev_range[0])/(clev_range[-1]-clev_range[0]))).reshape(1,4)
-    return color_slt
\ No newline at end of file
+    return color_slt
+
+
+# the ffmpeg codecs of the animation formats
+ANIMATION_CODECS = {'.gif': 'gif', '.mp4': 'h264', '.webp': 'libwebp'}
+
+
+def write_animation(fig, update, frames, filename, fps=1, dpi=100):
+    """
+    Render the frames one by one straight into the encoder.
+    每帧由update更新已有的图元后写入编码器管道(ffmpeg或imagemagick),
+    内存占用与帧数无关.
+    :param fig: the matplotlib Figure.
+    :param update: function(frame), update the artists of fig for the frame.
+    :param frames: iterable of the frames passed to update.
+    :param filename: the output file, .gif, .mp4 or .webp.
+    :param fps: frames per second.
+    :param dpi: the dpi of the frames.
+    :return: filename.
+    """
+    import matplotlib.animation as manimation
+
+    ext = os.path.splitext(filename)[1].lower()
+    if manimation.writers.is_available('ffmpeg'):
+        extra_args = ['-loop', '0'] if ext in ('.gif', '.webp') else None
+        writer = manimation.FFMpegWriter(
+            fps=fps, codec=ANIMATION_CODECS.get(ext), extra_args=extra_args)
+    elif ext == '.gif' and manimation.writers.is_available('imagemagick'):
+        writer = manimation.ImageMagickWriter(fps=fps)
+    else:
+        # no encoder to pipe into, the frames are kept in memory
+        writer = manimation.PillowWriter(fps=fps)
+
+    with writer.saving(fig, filename, dpi):
+        for frame in frames:
+            update(frame)
+            writer.grab_frame()
+    return filename
@@ -4,6 +4,7 @@
 Synoptic analysis or diagnostic maps for numeric weather model.
 """
 import numpy as np
+from nmc_met_map.lib.grid_cache import fetch_model_grids
 import nmc_met_io.retrieve_micaps_server as MICAPS_IO
 import nmc_met_io.retrieve_cimiss_server as CIMISS_IO
 from nmc_met_map.graphics import local_scale_graphics
@@ -11,7 +12,7 @@ import nmc_met_map.lib.utility as utl
 from metpy.units import units
 import metpy.calc as mpcalc
 import xarray as xr
-from scipy.interpolate import LinearNDInterpolator
+import nmc_met_map.lib.column_interp as colint
 from datetime import datetime, timedelta
 
 def wind_rh_according_to_4D_data(initTime=None, fhour=6, day_back=0,
@@ -36,11 +37,7 @@ def wind_rh_according_to_4D_data(initTime=None, fhour=6, day_back=0,
         cntr_pnt,zoom_ratio=utl.get_map_area(area_name=area)
 
     cntr_pnt=np.append(np.mean(sta_fcs['lon']),np.mean(sta_fcs['lat']))
-    map_extent=[0,0,0,0]
-    map_extent[0]=cntr_pnt[0]-zoom_ratio*1*map_ratio
-    map_extent[1]=cntr_pnt[0]+zoom_ratio*1*map_ratio
-    map_extent[2]=cntr_pnt[1]-zoom_ratio*1
-    map_extent[3]=cntr_pnt[1]+zoom_ratio*1
+    map_extent=utl.get_map_extent(cntr_pnt,zoom_ratio,map_ratio)
 
     bkgd_level=utl.cal_background_zoom_ratio(zoom_ratio)
     # micaps data directory
@@ -65,39 +62,20 @@ def wind_rh_according_to_4D_data(initTime=None, fhour=6, day_back=0,
             initTime=filename[0:8]
             
         # retrieve data from micaps server
-        gh=MICAPS_IO.get_model_3D_grid(directory=data_dir[0][0:-1],filename=filename,levels=levels)
-        if(gh is None):
+        data = fetch_model_grids([
+            (data_dir[0][0:-1], filename, levels, True),
+            (data_dir[1][0:-1], filename, levels),
+            (data_dir[2][0:-1], filename, levels),
+            (data_dir[3][0:-1], filename, levels),
+            (data_dir[4], filename),
+            (data_dir[5], filename),
+            (data_dir[6], filename),
+            (data_dir[7], filename)])
+        if data is None:
             return
+        gh, rh, u, v, u10m, v10m, td2m, t2m = data
         gh['data'].values=gh['data'].values*10
 
-        rh=MICAPS_IO.get_model_3D_grid(directory=data_dir[1][0:-1],filename=filename,levels=levels, allExists=False)
-        if rh is None:
-            return
-
-        u=MICAPS_IO.get_model_3D_grid(directory=data_dir[2][0:-1],filename=filename,levels=levels, allExists=False)
-        if u is None:
-            return
-
-        v=MICAPS_IO.get_model_3D_grid(directory=data_dir[3][0:-1],filename=filename,levels=levels, allExists=False)
-        if v is None:
-            return
-
-        u10m=MICAPS_IO.get_model_grid(directory=data_dir[4],filename=filename)
-        if u10m is None:
-            return
-
-        v10m=MICAPS_IO.get_model_grid(directory=data_dir[5],filename=filename)
-        if v10m is None:
-            return
-
-        td2m=MICAPS_IO.get_model_grid(directory=data_dir[6],filename=filename)
-        if td2m is None:
-            return
-
-        t2m=MICAPS_IO.get_model_grid(directory=data_dir[7],filename=filename)
-        if t2m is None:
-            return
-
         if(draw_zd == True):
             validtime=(datetime.strptime('20'+initTime, '%Y%m%d%H')+timedelta(hours=fhour)).strftime("%Y%m%d%H")
             directory_obs=utl.Cassandra_dir(data_type='surface',data_source='OBS',var_name='PLOT_ALL')
@@ -259,40 +237,34 @@ def wind_rh_according_to_4D_data(initTime=None, fhour=6, day_back=0,
 
 #maskout area
     delt_xy=rh['lon'].values[1]-rh['lon'].values[0]
-    #+ to solve the problem of labels on all the contours
-    mask1 = (rh['lon'] > map_extent[0]-delt_xy) & (rh['lon'] < map_extent[1]+delt_xy) & (rh['lat'] > map_extent[2]-delt_xy) & (rh['lat'] < map_extent[3]+delt_xy)
-    mask2 = (u10m['lon'] > map_extent[0]-delt_xy) & (u10m['lon'] < map_extent[1]+delt_xy) & (u10m['lat'] > map_extent[2]-delt_xy) & (u10m['lat'] < map_extent[3]+delt_xy)
-    #- to solve the problem of labels on all the contours
-    rh=rh.where(mask1,drop=True)
-    u=u.where(mask1,drop=True)
-    v=v.where(mask1,drop=True)
-    gh=gh.where(mask1,drop=True)
-    u10m=u10m.where(mask2,drop=True)
-    v10m=v10m.where(mask2,drop=True)
+    pad_x=delt_xy/(map_extent[1]-map_extent[0])
+    pad_y=delt_xy/(map_extent[3]-map_extent[2])
+    rh=utl.cut_to_map_extent(rh,map_extent,pad_x=pad_x,pad_y=pad_y)
+    u=utl.cut_to_map_extent(u,map_extent,pad_x=pad_x,pad_y=pad_y)
+    v=utl.cut_to_map_extent(v,map_extent,pad_x=pad_x,pad_y=pad_y)
+    gh=utl.cut_to_map_extent(gh,map_extent,pad_x=pad_x,pad_y=pad_y)
+    u10m=utl.cut_to_map_extent(u10m,map_extent,pad_x=pad_x,pad_y=pad_y)
+    v10m=utl.cut_to_map_extent(v10m,map_extent,pad_x=pad_x,pad_y=pad_y)
 #prepare interpolator
-    Ex1 = np.squeeze(u['data'].values).flatten()
-    Ey1 = np.squeeze(v['data'].values).flatten()
-    Ez1 = np.squeeze(rh['data'].values).flatten()
-    z = (np.squeeze(gh['data'].values)).flatten()
-
-    coords = np.zeros((np.size(levels),u['lat'].size,u['lon'].size,3))
-    coords[...,1] = u['lat'].values.reshape((1,u['lat'].size,1))
-    coords[...,2] = u['lon'].values.reshape((1,1,u['lon'].size))
-    coords = coords.reshape((Ex1.size,3))
-    coords[:,0]=z
-
-    interpolator_U = LinearNDInterpolator(coords,Ex1,rescale=True)
-    interpolator_V = LinearNDInterpolator(coords,Ey1,rescale=True)
-    interpolator_RH = LinearNDInterpolator(coords,Ez1,rescale=True)
+    # vertical interpolation in geopotential height in the grid columns
+    # around the targets, the weights are shared by U, V and RH
+    nfcs=np.size(sta_fcs['lon'])
+    targets={'lon':np.atleast_1d(sta_fcs['lon']),
+            'lat':np.atleast_1d(sta_fcs['lat']),
+            'altitude':np.atleast_1d(sta_fcs['altitude'])}
+    if(draw_zd is True):
+        targets={'lon':np.append(targets['lon'],zd_sm_lon),
+                'lat':np.append(targets['lat'],zd_sm_lat),
+                'altitude':np.append(targets['altitude'],zd_sm_alt)}
+    interpolator=colint.ColumnInterpolator(gh['data'],targets,hgt_scale=1.)
+    u_targets=interpolator(u['data'])[0]
+    v_targets=interpolator(v['data'])[0]
+    RH_targets=interpolator(rh['data'])[0]
 
 #process sta_fcs 10m wind
-    coords2=np.zeros((np.size(sta_fcs['lon']),3))
-    coords2[:,0]=sta_fcs['altitude']
-    coords2[:,1]=sta_fcs['lat']
-    coords2[:,2]=sta_fcs['lon']
-    u_sta=interpolator_U(coords2)
-    v_sta=interpolator_V(coords2)
-    RH_sta=interpolator_RH(coords2)
+    u_sta=u_targets[:nfcs]
+    v_sta=v_targets[:nfcs]
+    RH_sta=RH_targets[:nfcs]
     wsp_sta=(u_sta**2+v_sta**2)**0.5
     u10m_2D=u10m.interp(lon=('points', sta_fcs['lon']), lat=('points', sta_fcs['lat']))
     v10m_2D=v10m.interp(lon=('points', sta_fcs['lon']), lat=('points', sta_fcs['lat']))
@@ -320,12 +292,8 @@ def wind_rh_according_to_4D_data(initTime=None, fhour=6, day_back=0,
 #process zd_sta 10m wind
     zd_fcst_obs=None
     if(draw_zd is True):
-        coords3=np.zeros((np.size(zd_sm_alt),3))
-        coords3[:,0]=zd_sm_alt
-        coords3[:,1]=zd_sm_lat
-        coords3[:,2]=zd_sm_lon
-        u_sm_sta=interpolator_U(coords3)
-        v_sm_sta=interpolator_V(coords3)
+        u_sm_sta=u_targets[nfcs:]
+        v_sm_sta=v_targets[nfcs:]
         wsp_sm_sta=(u_sm_sta**2+v_sm_sta**2)**0.5
         u10m_sm=u10m.interp(lon=('points', zd_sm_lon), lat=('points', zd_sm_lat))
         v10m_sm=v10m.interp(lon=('points', zd_sm_lon), lat=('points', zd_sm_lat))
@@ -4,8 +4,7 @@
 Synoptic analysis or diagnostic maps for numeric weather model.
 """
 import numpy as np
-from nmc_met_io.retrieve_micaps_server import get_model_grid
-import nmc_met_io.retrieve_micaps_server as MICAPS_IO
+from nmc_met_map.lib.grid_cache import fetch_model_grids
 import nmc_met_io.retrieve_cimiss_server as CMISS_IO
 from nmc_met_map.graphics import moisture_graphics
 import nmc_met_map.lib.utility as utl
@@ -22,6 +21,11 @@ def gh_uv_pwat(initTime=None, fhour=6, day_back=0,model='ECMWF',
     if(area != '全国'):
         south_China_sea=False
 
+    if(area != None):
+        cntr_pnt,zoom_ratio=utl.get_map_area(area_name=area)
+
+    map_extent=utl.get_map_extent(cntr_pnt,zoom_ratio,map_ratio)
+
     # micaps data directory
     if(data_source =='MICAPS'):       
         try:
@@ -39,20 +43,16 @@ def gh_uv_pwat(initTime=None, fhour=6, day_back=0,model='ECMWF',
             filename=utl.filename_day_back_model(day_back=day_back,fhour=fhour)
 
         # retrieve data from micaps server
-        gh = MICAPS_IO.get_model_grid(data_dir[0], filename=filename)
-        if gh is None:
-            return
-        
-        u = MICAPS_IO.get_model_grid(data_dir[1], filename=filename)
-        if u is None:
-            return
-            
-        v = MICAPS_IO.get_model_grid(data_dir[2], filename=filename)
-        if v is None:
-            return
-        pwat = MICAPS_IO.get_model_grid(data_dir[3], filename=filename)
-        if v is None:
+        data = fetch_model_grids([
+            (data_dir[0], filename),
+            (data_dir[1], filename),
+            (data_dir[2], filename),
+            (data_dir[3], filename)],
+            bbox=utl.get_padded_extent(map_extent))
+        if data is None:
             return
+        gh, u, v, pwat = data
+
     if(data_source =='CIMISS'):
         # get filename
         if(initTime != None):
@@ -99,31 +99,14 @@ def gh_uv_pwat(initTime=None, fhour=6, day_back=0,model='ECMWF',
             raise ValueError('Can not find all data needed')        
     # prepare data
 
-    if(area != None):
-        cntr_pnt,zoom_ratio=utl.get_map_area(area_name=area)
-
-    map_extent=[0,0,0,0]
-    map_extent[0]=cntr_pnt[0]-zoom_ratio*1*map_ratio
-    map_extent[1]=cntr_pnt[0]+zoom_ratio*1*map_ratio
-    map_extent[2]=cntr_pnt[1]-zoom_ratio*1
-    map_extent[3]=cntr_pnt[1]+zoom_ratio*1
 
-    delt_x=(map_extent[1]-map_extent[0])*0.2
-    delt_y=(map_extent[3]-map_extent[2])*0.1
-
-#+ to solve the problem of labels on all the contours
-    mask1 = (gh['lon'] > map_extent[0]-delt_x) & (gh['lon'] < map_extent[1]+delt_x) & (gh['lat'] > map_extent[2]-delt_y) & (gh['lat'] < map_extent[3]+delt_y)
-    mask2 = (u['lon'] > map_extent[0]-delt_x) & (u['lon'] < map_extent[1]+delt_x) & (u['lat'] > map_extent[2]-delt_y) & (u['lat'] < map_extent[3]+delt_y)
-    mask3 = (pwat['lon'] > map_extent[0]-delt_x) & (pwat['lon'] < map_extent[1]+delt_x) & (pwat['lat'] > map_extent[2]-delt_y) & (pwat['lat'] < map_extent[3]+delt_y)
-#- to solve the problem of labels on all the contours
-
-    gh=gh.where(mask1,drop=True)
+    gh=utl.cut_to_map_extent(gh,map_extent)
     gh.attrs['model']=model
 
-    u=u.where(mask2,drop=True)
-    v=v.where(mask2,drop=True)
+    u=utl.cut_to_map_extent(u,map_extent)
+    v=utl.cut_to_map_extent(v,map_extent)
     uv=xr.merge([u.rename({'data': 'u'}),v.rename({'data': 'v'})])
-    pwat=pwat.where(mask3,drop=True)
+    pwat=utl.cut_to_map_extent(pwat,map_extent)
 
     moisture_graphics.draw_gh_uv_pwat(
         pwat=pwat, gh=gh, uv=uv,
@@ -140,6 +123,11 @@ def gh_uv_rh(initTime=None, fhour=6, day_back=0,model='ECMWF',
 
     if(area != '全国'):
         south_China_sea=False
+    if(area != None):
+        cntr_pnt,zoom_ratio=utl.get_map_area(area_name=area)
+
+    map_extent=utl.get_map_extent(cntr_pnt,zoom_ratio,map_ratio)
+
     if(data_source =='MICAPS'):
         # micaps data directory
         try:
@@ -157,20 +145,15 @@ def gh_uv_rh(initTime=None, fhour=6, day_back=0,model='ECMWF',
             filename=utl.filename_day_back_model(day_back=day_back,fhour=fhour)
 
         # retrieve data from micaps server
-        gh = MICAPS_IO.get_model_grid(data_dir[0], filename=filename)
-        if gh is None:
-            return
-        
-        u = MICAPS_IO.get_model_grid(data_dir[1], filename=filename)
-        if u is None:
-            return
-            
-        v = MICAPS_IO.get_model_grid(data_dir[2], filename=filename)
-        if v is None:
-            return
-        rh = MICAPS_IO.get_model_grid(data_dir[3], filename=filename)
-        if rh is None:
+        data = fetch_model_grids([
+            (data_dir[0], filename),
+            (data_dir[1], filename),
+            (data_dir[2], filename),
+            (data_dir[3], filename)],
+            bbox=utl.get_padded_extent(map_extent))
+        if data is None:
             return
+        gh, u, v, rh = data
 
     if(data_source =='CIMISS'):
 
@@ -214,33 +197,14 @@ def gh_uv_rh(initTime=None, fhour=6, day_back=0,model='ECMWF',
 
     # prepare data
 
-    if(area != None):
-        cntr_pnt,zoom_ratio=utl.get_map_area(area_name=area)
-
-    map_extent=[0,0,0,0]
-    map_extent[0]=cntr_pnt[0]-zoom_ratio*1*map_ratio
-    map_extent[1]=cntr_pnt[0]+zoom_ratio*1*map_ratio
-    map_extent[2]=cntr_pnt[1]-zoom_ratio*1
-    map_extent[3]=cntr_pnt[1]+zoom_ratio*1
-
-    delt_x=(map_extent[1]-map_extent[0])*0.2
-    delt_y=(map_extent[3]-map_extent[2])*0.1
-
-#+ to solve the problem of labels on all the contours
-    mask1 = (gh['lon'] > map_extent[0]-delt_x) & (gh['lon'] < map_extent[1]+delt_x) & (gh['lat'] > map_extent[2]-delt_y) & (gh['lat'] < map_extent[3]+delt_y)
-
-    mask2 = (u['lon'] > map_extent[0]-delt_x) & (u['lon'] < map_extent[1]+delt_x) & (u['lat'] > map_extent[2]-delt_y) & (u['lat'] < map_extent[3]+delt_y)
-
-    mask3 = (rh['lon'] > map_extent[0]-delt_x) & (rh['lon'] < map_extent[1]+delt_x) & (rh['lat'] > map_extent[2]-delt_y) & (rh['lat'] < map_extent[3]+delt_y)
-#- to solve the problem of labels on all the contours
-    gh=gh.where(mask1,drop=True)
+    gh=utl.cut_to_map_extent(gh,map_extent)
     gh.attrs['model']=model
 
-    u=u.where(mask2,drop=True)
-    v=v.where(mask2,drop=True)
+    u=utl.cut_to_map_extent(u,map_extent)
+    v=utl.cut_to_map_extent(v,map_extent)
     uv=xr.merge([u.rename({'data': 'u'}),v.rename({'data': 'v'})])
 
-    rh=rh.where(mask3,drop=True)
+    rh=utl.cut_to_map_extent(rh,map_extent)
     moisture_graphics.draw_gh_uv_rh(
         rh=rh, gh=gh, uv=uv,
         map_extent=map_extent, regrid_shape=20,
@@ -257,6 +221,11 @@ def gh_uv_spfh(initTime=None, fhour=6, day_back=0,model='ECMWF',
     if(area != '全国'):
         south_China_sea=False
 
+    if(area != None):
+        cntr_pnt,zoom_ratio=utl.get_map_area(area_name=area)
+
+    map_extent=utl.get_map_extent(cntr_pnt,zoom_ratio,map_ratio)
+
     if(data_source=='MICAPS'):
         # micaps data directory
         try:
@@ -274,20 +243,15 @@ def gh_uv_spfh(initTime=None, fhour=6, day_back=0,model='ECMWF',
             filename=utl.filename_day_back_model(day_back=day_back,fhour=fhour)
 
         # retrieve data from micaps server
-        gh = MICAPS_IO.get_model_grid(data_dir[0], filename=filename)
-        if gh is None:
-            return
-        
-        u = MICAPS_IO.get_model_grid(data_dir[1], filename=filename)
-        if u is None:
-            return
-            
-        v = MICAPS_IO.get_model_grid(data_dir[2], filename=filename)
-        if v is None:
-            return
-        spfh = MICAPS_IO.get_model_grid(data_dir[3], filename=filename)
-        if spfh is None:
+        data = fetch_model_grids([
+            (data_dir[0], filename),
+            (data_dir[1], filename),
+            (data_dir[2], filename),
+            (data_dir[3], filename)],
+            bbox=utl.get_padded_extent(map_extent))
+        if data is None:
             return
+        gh, u, v, spfh = data
 
     if(data_source == 'CIMISS'):
 
@@ -328,30 +292,11 @@ def gh_uv_spfh(initTime=None, fhour=6, day_back=0,model='ECMWF',
             raise ValueError('Can not find all data needed')                
     # prepare data
 
-    if(area != None):
-        cntr_pnt,zoom_ratio=utl.get_map_area(area_name=area)
-
-    map_extent=[0,0,0,0]
-    map_extent[0]=cntr_pnt[0]-zoom_ratio*1*map_ratio
-    map_extent[1]=cntr_pnt[0]+zoom_ratio*1*map_ratio
-    map_extent[2]=cntr_pnt[1]-zoom_ratio*1
-    map_extent[3]=cntr_pnt[1]+zoom_ratio*1
-
-    delt_x=(map_extent[1]-map_extent[0])*0.2
-    delt_y=(map_extent[3]-map_extent[2])*0.1
-
-#+ to solve the problem of labels on all the contours
-    mask1 = (gh['lon'] > map_extent[0]-delt_x) & (gh['lon'] < map_extent[1]+delt_x) & (gh['lat'] > map_extent[2]-delt_y) & (gh['lat'] < map_extent[3]+delt_y)
-
-    mask2 = (u['lon'] > map_extent[0]-delt_x) & (u['lon'] < map_extent[1]+delt_x) & (u['lat'] > map_extent[2]-delt_y) & (u['lat'] < map_extent[3]+delt_y)
-
-    mask3 = (spfh['lon'] > map_extent[0]-delt_x) & (spfh['lon'] < map_extent[1]+delt_x) & (spfh['lat'] > map_extent[2]-delt_y) & (spfh['lat'] < map_extent[3]+delt_y)
-#- to solve the problem of labels on all the contours
-    gh=gh.where(mask1,drop=True)
+    gh=utl.cut_to_map_extent(gh,map_extent)
     gh.attrs['model']=model
-    u=u.where(mask2,drop=True)
-    v=v.where(mask2,drop=True)
-    spfh=spfh.where(mask3,drop=True)
+    u=utl.cut_to_map_extent(u,map_extent)
+    v=utl.cut_to_map_extent(v,map_extent)
+    spfh=utl.cut_to_map_extent(spfh,map_extent)
 
     uv=xr.merge([u.rename({'data': 'u'}),v.rename({'data': 'v'})])
 
@@ -370,6 +315,11 @@ def gh_uv_wvfl(initTime=None, fhour=6, day_back=0,model='GRAPES_GFS',
     if(area != '全国'):
         south_China_sea=False
 
+    if(area != None):
+        cntr_pnt,zoom_ratio=utl.get_map_area(area_name=area)
+
+    map_extent=utl.get_map_extent(cntr_pnt,zoom_ratio,map_ratio)
+
     # micaps data directory
     if(data_source =='MICAPS'):        
         try:
@@ -388,20 +338,15 @@ def gh_uv_wvfl(initTime=None, fhour=6, day_back=0,model='GRAPES_GFS',
             filename=utl.filename_day_back_model(day_back=day_back,fhour=fhour)
 
         # retrieve data from micaps server
-        gh = MICAPS_IO.get_model_grid(data_dir[0], filename=filename)
-        if gh is None:
-            return
-        
-        u = MICAPS_IO.get_model_grid(data_dir[1], filename=filename)
-        if u is None:
-            return
-            
-        v = MICAPS_IO.get_model_grid(data_dir[2], filename=filename)
-        if v is None:
-            return
-        wvfl = MICAPS_IO.get_model_grid(data_dir[3], filename=filename)
-        if wvfl is None:
+        data = fetch_model_grids([
+            (data_dir[0], filename),
+            (data_dir[1], filename),
+            (data_dir[2], filename),
+            (data_dir[3], filename)],
+            bbox=utl.get_padded_extent(map_extent))
+        if data is None:
             return
+        gh, u, v, wvfl = data
 
     if(data_source =='CIMISS'):
 
@@ -444,30 +389,12 @@ def gh_uv_wvfl(initTime=None, fhour=6, day_back=0,model='GRAPES_GFS',
             raise ValueError('Can not find all data needed')            
     # prepare data
 
-    if(area != None):
-        cntr_pnt,zoom_ratio=utl.get_map_area(area_name=area)
-
-    map_extent=[0,0,0,0]
-    map_extent[0]=cntr_pnt[0]-zoom_ratio*1*map_ratio
-    map_extent[1]=cntr_pnt[0]+zoom_ratio*1*map_ratio
-    map_extent[2]=cntr_pnt[1]-zoom_ratio*1
-    map_extent[3]=cntr_pnt[1]+zoom_ratio*1
-
-    delt_x=(map_extent[1]-map_extent[0])*0.2
-    delt_y=(map_extent[3]-map_extent[2])*0.1
-
-#+ to solve the problem of labels on all the contours
-    mask1 = (gh['lon'] > map_extent[0]-delt_x) & (gh['lon'] < map_extent[1]+delt_x) & (gh['lat'] > map_extent[2]-delt_y) & (gh['lat'] < map_extent[3]+delt_y)
-    mask2 = (u['lon'] > map_extent[0]-delt_x) & (u['lon'] < map_extent[1]+delt_x) & (u['lat'] > map_extent[2]-delt_y) & (u['lat'] < map_extent[3]+delt_y)
-    mask3 = (wvfl['lon'] > map_extent[0]-delt_x) & (u['lon'] < map_extent[1]+delt_x) & (u['lat'] > map_extent[2]-delt_y) & (u['lat'] < map_extent[3]+delt_y)
-
-#- to solve the problem of labels on all the contours
-    gh=gh.where(mask1,drop=True)
+    gh=utl.cut_to_map_extent(gh,map_extent)
     gh.attrs['model']=model
-    u=u.where(mask2,drop=True)
-    v=v.where(mask2,drop=True)
+    u=utl.cut_to_map_extent(u,map_extent)
+    v=utl.cut_to_map_extent(v,map_extent)
     uv=xr.merge([u.rename({'data': 'u'}),v.rename({'data': 'v'})])
-    wvfl=v.where(wvfl,drop=True)
+    wvfl=utl.cut_to_map_extent(wvfl,map_extent)
 
     moisture_graphics.draw_gh_uv_wvfl(
         wvfl=wvfl, gh=gh, uv=uv,
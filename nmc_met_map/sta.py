@@ -6,7 +6,8 @@ import os
 import xarray as xr
 import metpy.calc as mpcalc
 from metpy.units import units
-from nmc_met_io.retrieve_micaps_server import get_model_points,get_model_3D_grid,get_latest_initTime,get_model_3D_grids,get_station_data,get_model_grids
+from nmc_met_io.retrieve_micaps_server import get_model_points,get_latest_initTime
+from nmc_met_map.lib.grid_cache import fetch_model_grids
 import nmc_met_map.lib.utility as utl
 from nmc_met_map.graphics import sta_graphics
 import matplotlib.pyplot as plt
@@ -15,7 +16,8 @@ from metpy.cbook import get_test_data
 from metpy.plots import add_metpy_logo, SkewT
 from metpy.units import units
 from scipy.stats import norm
-from scipy.interpolate import LinearNDInterpolator
+import nmc_met_map.lib.column_interp as colint
+import nmc_met_map.lib.station_obs as station_obs
 
 def Station_Synthetical_Forecast_From_Cassandra(
         model='ECMWF',
@@ -370,21 +372,21 @@ def sta_SkewT(model='ECMWF',points={'lon':[116.3833], 'lat':[39.9]},
     # # 度数据
     initTime = get_latest_initTime(data_dir[0][0:-1]+"850")
     filename = initTime+'.'+str(fhour).zfill(3)
-    TMP_4D=get_model_3D_grid(directory=data_dir[0][0:-1],filename=filename,levels=levels, allExists=False)
+    data = fetch_model_grids([
+        (data_dir[0][0:-1], filename, levels),
+        (data_dir[1][0:-1], filename, levels),
+        (data_dir[2][0:-1], filename, levels),
+        (data_dir[3][0:-1], filename, levels),
+        (data_dir[4][0:-1], filename, levels)])
+    if data is None:
+        return
+    TMP_4D, u_4D, v_4D, HGT_4D, RH_4D = data
     TMP_2D=TMP_4D.interp(lon=('points', points['lon']), lat=('points', points['lat']))
-
-    u_4D=get_model_3D_grid(directory=data_dir[1][0:-1],filename=filename,levels=levels, allExists=False)
     u_2D=u_4D.interp(lon=('points', points['lon']), lat=('points', points['lat']))
-
-    v_4D=get_model_3D_grid(directory=data_dir[2][0:-1],filename=filename,levels=levels, allExists=False)
     v_2D=v_4D.interp(lon=('points', points['lon']), lat=('points', points['lat']))
-
-    HGT_4D=get_model_3D_grid(directory=data_dir[3][0:-1],filename=filename,levels=levels, allExists=False)
     HGT_2D=HGT_4D.interp(lon=('points', points['lon']), lat=('points', points['lat']))
     HGT_2D.attrs['model']=model
     HGT_2D.attrs['points']=points
-
-    RH_4D=get_model_3D_grid(directory=data_dir[4][0:-1],filename=filename,levels=levels, allExists=False)
     RH_2D=RH_4D.interp(lon=('points', points['lon']), lat=('points', points['lat']))
 
     wind_dir_2D=mpcalc.wind_direction(u_2D['data'].values* units.meter / units.second,
@@ -417,7 +419,7 @@ def point_wind_time_fcst_according_to_3D_wind(
         t_range=[0,60],
         t_gap=3,
         points={'lon':[116.3833], 'lat':[39.9], 'altitude':[1351]},
-        initTime=None,draw_obs=True,obs_ID=54511,day_back=0,
+        initTime=None,draw_obs=True,obs_ID=54511,day_back=0,draw=True,
         extra_info={
             'output_head_name':' ',
             'output_tail_name':' ',
@@ -439,82 +441,34 @@ def point_wind_time_fcst_according_to_3D_wind(
         initTime = get_latest_initTime(dir_rqd[0][0:-1]+'/850')
         #initTime=utl.filename_day_back_model(day_back=day_back,fhour=0)[0:8]
 
-    directory=dir_rqd[0][0:-1]
     fhours = np.arange(t_range[0], t_range[1], t_gap)
     filenames = [initTime+'.'+str(fhour).zfill(3) for fhour in fhours]
-    HGT_4D=get_model_3D_grids(directory=directory,filenames=filenames,levels=extra_info['levels_for_interp'], allExists=False)
-    directory=dir_rqd[1][0:-1]
-    U_4D=get_model_3D_grids(directory=directory,filenames=filenames,levels=extra_info['levels_for_interp'], allExists=False)
-    directory=dir_rqd[2][0:-1]
-    V_4D=get_model_3D_grids(directory=directory,filenames=filenames,levels=extra_info['levels_for_interp'], allExists=False)
+    levels=extra_info['levels_for_interp']
+    fcst = get_points_3D_fcst(model=model, var_names=['UGRD', 'VGRD'],
+        filenames=filenames, points=points, levels=levels)
+    if fcst is None:
+        return
     #obs
     if(draw_obs == True):
-        initTime=pd.to_datetime(str(V_4D['forecast_reference_time'].values)).replace(tzinfo=None).to_pydatetime()
-        sign=0
-        for ifhour in V_4D['forecast_period'].values:
-            temp=(initTime+timedelta(hours=ifhour))
-            filenames_obs=temp.strftime("%Y%m%d%H")+'0000.000'
-            try:
-                obs_data=get_station_data('SURFACE/PLOT/',filename=filenames_obs)
-            except:
-                break
-
-            if(obs_data is not None):
-                temp=obs_data.where(obs_data['ID']==obs_ID).dropna(how='all')
-                if ((ifhour == V_4D['forecast_period'].values[0]) or ((ifhour > V_4D['forecast_period'].values[0]) and (sign==0))):
-                    if(len(temp) > 0):
-                        sta_obs_data=obs_data.where(obs_data['ID']==obs_ID).dropna(how='all').reset_index()
-                        sign=1
-                else:
-                    if(len(temp) > 0):
-                        sta_obs_data=sta_obs_data.append(temp).reset_index()
-            if(obs_data is None):
-                break
-        try:
-            sta_obs_data
-        except:
+        initTime=pd.to_datetime(str(fcst['forecast_reference_time'].values)).replace(tzinfo=None).to_pydatetime()
+        sta_obs_data=station_obs.get_station_obs_series(obs_ID,
+            [initTime+timedelta(hours=int(ifhour)) for ifhour in fcst['forecast_period'].values])
+        if(sta_obs_data is None):
             draw_obs=False
 
-    delt_xy=HGT_4D['lon'].values[1]-HGT_4D['lon'].values[0]
-    mask = (HGT_4D['lon']<(points['lon']+2*delt_xy))&(HGT_4D['lon']>(points['lon']-2*delt_xy))&(HGT_4D['lat']<(points['lat']+2*delt_xy))&(HGT_4D['lat']>(points['lat']-2*delt_xy))
-
-    HGT_4D_sm=HGT_4D['data'].where(mask,drop=True)
-    U_4D_sm=U_4D['data'].where(mask,drop=True)
-    V_4D_sm=V_4D['data'].where(mask,drop=True)
-
-    lon_md=np.squeeze(HGT_4D_sm['lon'].values)
-    lat_md=np.squeeze(HGT_4D_sm['lat'].values)
-    alt_md=np.squeeze(HGT_4D_sm.values*10).flatten()
-    time_md=np.squeeze(HGT_4D_sm['forecast_period'].values)
-
-    coords = np.zeros((len(time_md),len(extra_info['levels_for_interp']),len(lat_md),len(lon_md),4))
-    coords[...,0]=time_md.reshape((len(time_md),1,1,1))
-    coords[...,2] = lat_md.reshape((1,1,len(lat_md),1))
-    coords[...,3] = lon_md.reshape((1,1,1,len(lon_md)))
-    coords = coords.reshape((alt_md.size,4))
-    coords[:,1]=alt_md
-
-    interpolator_U = LinearNDInterpolator(coords,U_4D_sm.values.reshape((U_4D_sm.values.size)),rescale=True)
-    interpolator_V = LinearNDInterpolator(coords,V_4D_sm.values.reshape((V_4D_sm.values.size)),rescale=True)
-
-    coords2 = np.zeros((len(time_md),1,1,1,4))
-    coords2[...,0]=time_md.reshape((len(time_md),1,1,1))
-    coords2[...,1]=points['altitude'][0]
-    coords2[...,2] = points['lat'][0]
-    coords2[...,3] = points['lon'][0]
-    coords2 = coords2.reshape((time_md.size,4))
-
-    U_interped=np.squeeze(interpolator_U(coords2))
-    V_interped=np.squeeze(interpolator_V(coords2))
-    time_info=HGT_4D_sm.coords
-
-    sta_graphics.draw_point_wind(U=U_interped,V=V_interped,
-        model=model,
-        output_dir=output_dir,
-        points=points,
-        time_info=time_info,
-        extra_info=extra_info
-            )        
+    if(draw):
+        for ista in range(fcst.sizes['station']):
+            sta_points, sta_info=_station_points(points, extra_info, ista)
+            sta_graphics.draw_point_wind(U=fcst['UGRD'].values[:, ista],
+                V=fcst['VGRD'].values[:, ista],
+                model=model,
+                output_dir=output_dir,
+                points=sta_points,
+                time_info=fcst.coords,
+                extra_info=sta_info
+                    )
+            plt.close('all')
+    return fcst
 
 def point_fcst(
         model='ECMWF',
@@ -543,7 +497,6 @@ def point_fcst(
         initTime = get_latest_initTime(dir_rqd[0])
         #initTime=utl.filename_day_back_model(day_back=day_back,fhour=0)[0:8]
 
-    directory=dir_rqd[0][0:-1]
     fhours = np.arange(t_range[0], t_range[1], t_gap)
     filenames = [initTime+'.'+str(fhour).zfill(3) for fhour in fhours]
     t2m=utl.get_model_points_gy(dir_rqd[0], filenames, points,allExists=False)
@@ -557,13 +510,75 @@ def point_fcst(
         extra_info=extra_info
             )                 
 
+def get_points_3D_fcst(model='ECMWF', var_names=['UGRD', 'VGRD', 'TMP'],
+        filenames=None, points=None,
+        levels=[1000, 950, 925, 900, 850, 800, 700, 600, 500]):
+    """
+    Time series of the 3D fields at N stations. The 4D fields are fetched
+    once, cut to the box of the stations, and all the stations are
+    interpolated in one pass (see column_interp.ColumnInterpolator).
+    :param model: the model name.
+    :param var_names: the variables to interpolate, e.g. ['UGRD', 'VGRD', 'RH'].
+    :param filenames: the list of filenames.
+    :param points: dict, {'lon': [...], 'lat': [...], 'altitude': [...]}.
+    :param levels: the pressure levels used for the vertical interpolation.
+    :return: xarray Dataset, one variable of dims (time, station) for each
+             of var_names, None if any data is missing.
+    :Examples:
+    >>> fcst = get_points_3D_fcst(
+            filenames=['20021908.'+str(fhour).zfill(3) for fhour in range(0, 72, 3)],
+            points={'lon': [116.3833, 117.17], 'lat': [39.9, 39.08],
+                    'altitude': [1351, 3]})
+    """
+    try:
+        dir_rqd=[utl.Cassandra_dir(data_type='high',data_source=model,var_name=var_name,lvl='')
+                 for var_name in ['HGT']+list(var_names)]
+    except KeyError:
+        raise ValueError('Can not find all required directories needed')
+
+    # only the grid columns around the stations are needed
+    lon=np.atleast_1d(points['lon'])
+    lat=np.atleast_1d(points['lat'])
+    bbox=[lon.min()-2, lon.max()+2, lat.min()-2, lat.max()+2]
+    data = fetch_model_grids(
+        [(idir[0:-1], filenames, levels) for idir in dir_rqd], bbox=bbox)
+    if data is None:
+        return None
+    HGT_4D=data[0]
+
+    interpolator = colint.ColumnInterpolator(HGT_4D['data'], points)
+    coords={'time': HGT_4D['time'].values,
+            'forecast_period': ('time', np.atleast_1d(HGT_4D['forecast_period'].values)),
+            'forecast_reference_time': HGT_4D['forecast_reference_time'].values,
+            'station': np.arange(len(lon)),
+            'lon': ('station', lon),
+            'lat': ('station', lat),
+            'altitude': ('station', np.atleast_1d(points['altitude']))}
+    return xr.Dataset(
+        {var_name: (('time', 'station'), interpolator(var_4D['data']))
+         for var_name, var_4D in zip(var_names, data[1:])},
+        coords=coords)
+
+
+def _station_points(points, extra_info, ista):
+    """
+    points and extra_info of the ista-th station, for the station plots.
+    points['name'] is an optional list of the station names.
+    """
+    sta_points={key: [points[key][ista]] for key in ('lon', 'lat', 'altitude')}
+    sta_info=dict(extra_info)
+    if 'name' in points:
+        sta_info['point_name']=points['name'][ista]
+    return sta_points, sta_info
+
+
 def point_fcst_according_to_3D_field(
         model='ECMWF',
         output_dir=None,
         t_range=[0,60],
         t_gap=3,
         points={'lon':[116.3833], 'lat':[39.9], 'altitude':[1351]},
-        initTime=None,obs_ID=54511,day_back=0,
+        initTime=None,obs_ID=54511,day_back=0,draw=True,
         extra_info={
             'output_head_name':' ',
             'output_tail_name':' ',
@@ -586,77 +601,38 @@ def point_fcst_according_to_3D_field(
         initTime = get_latest_initTime(dir_rqd[0][0:-1]+'/850')
         #initTime=utl.filename_day_back_model(day_back=day_back,fhour=0)[0:8]
 
-    directory=dir_rqd[0][0:-1]
-
     if(t_range[1] > 72):
         fhours = np.append(np.arange(t_range[0], 72, t_gap),np.arange(72,241,6))
     else:
         fhours = np.arange(t_range[0], t_range[1], t_gap)
 
     filenames = [initTime+'.'+str(fhour).zfill(3) for fhour in fhours]
-    HGT_4D=get_model_3D_grids(directory=directory,filenames=filenames,levels=extra_info['levels_for_interp'], allExists=False)
-    directory=dir_rqd[1][0:-1]
-    U_4D=get_model_3D_grids(directory=directory,filenames=filenames,levels=extra_info['levels_for_interp'], allExists=False)
-    directory=dir_rqd[2][0:-1]
-    V_4D=get_model_3D_grids(directory=directory,filenames=filenames,levels=extra_info['levels_for_interp'], allExists=False)
-
-    directory=dir_rqd[3][0:-1]
-    TMP_4D=get_model_3D_grids(directory=directory,filenames=filenames,levels=extra_info['levels_for_interp'], allExists=False)
-    
-    rn=utl.get_model_points_gy(dir_rqd[4], filenames, points,allExists=False)
+    levels=extra_info['levels_for_interp']
+    fcst = get_points_3D_fcst(model=model, var_names=['UGRD', 'VGRD', 'TMP'],
+        filenames=filenames, points=points, levels=levels)
+    if fcst is None:
+        return
 
-    directory=dir_rqd[3][0:-1]
-    coords_info_2D=utl.get_model_points_gy(directory+str(extra_info['levels_for_interp'][0])+'/',
-                        points=points,filenames=filenames,allExists=False)
-
-    delt_xy=HGT_4D['lon'].values[1]-HGT_4D['lon'].values[0]
-    mask = (HGT_4D['lon']<(points['lon']+2*delt_xy))&(HGT_4D['lon']>(points['lon']-2*delt_xy))&(HGT_4D['lat']<(points['lat']+2*delt_xy))&(HGT_4D['lat']>(points['lat']-2*delt_xy))
-
-    HGT_4D_sm=HGT_4D['data'].where(mask,drop=True)
-    U_4D_sm=U_4D['data'].where(mask,drop=True)
-    V_4D_sm=V_4D['data'].where(mask,drop=True)
-    TMP_4D_sm=TMP_4D['data'].where(mask,drop=True)
-
-    lon_md=np.squeeze(HGT_4D_sm['lon'].values)
-    lat_md=np.squeeze(HGT_4D_sm['lat'].values)
-    alt_md=np.squeeze(HGT_4D_sm.values*10).flatten()
-    time_md=np.squeeze(HGT_4D_sm['forecast_period'].values)
-
-    coords = np.zeros((len(time_md),len(extra_info['levels_for_interp']),len(lat_md),len(lon_md),4))
-    coords[...,0]=time_md.reshape((len(time_md),1,1,1))
-    coords[...,2] = lat_md.reshape((1,1,len(lat_md),1))
-    coords[...,3] = lon_md.reshape((1,1,1,len(lon_md)))
-    coords = coords.reshape((alt_md.size,4))
-    coords[:,1]=alt_md
-
-    interpolator_U = LinearNDInterpolator(coords,U_4D_sm.values.reshape((U_4D_sm.values.size)),rescale=True)
-    interpolator_V = LinearNDInterpolator(coords,V_4D_sm.values.reshape((V_4D_sm.values.size)),rescale=True)
-    interpolator_TMP = LinearNDInterpolator(coords,TMP_4D_sm.values.reshape((TMP_4D_sm.values.size)),rescale=True)
-
-    coords2 = np.zeros((len(time_md),1,1,1,4))
-    coords2[...,0]=time_md.reshape((len(time_md),1,1,1))
-    coords2[...,1]=points['altitude'][0]
-    coords2[...,2] = points['lat'][0]
-    coords2[...,3] = points['lon'][0]
-    coords2 = coords2.reshape((time_md.size,4))
-
-    U_interped=np.squeeze(interpolator_U(coords2))
-    V_interped=np.squeeze(interpolator_V(coords2))
-    TMP_interped=np.squeeze(interpolator_TMP(coords2))
-
-    U_interped_xr=coords_info_2D.copy()
-    U_interped_xr['data'].values=U_interped.reshape(U_interped.size,1,1)
-    V_interped_xr=coords_info_2D.copy()
-    V_interped_xr['data'].values=V_interped.reshape(V_interped.size,1,1)
-    TMP_interped_xr=coords_info_2D.copy()
-    TMP_interped_xr['data'].values=TMP_interped.reshape(TMP_interped.size,1,1)
-    
-    sta_graphics.draw_point_fcst(t2m=TMP_interped_xr,u10m=U_interped_xr,v10m=V_interped_xr,rn=rn,
-        model=model,
-        output_dir=output_dir,
-        points=points,
-        extra_info=extra_info
-            )        
+    rn=utl.get_model_points_gy(dir_rqd[4], filenames, points,allExists=False)
+    rn=rn['data'].isel(level=0) if 'level' in rn['data'].dims else rn['data']
+    fcst['RAIN']=(('time', 'station'),
+        rn.reindex(time=fcst['time'].values).transpose('time', 'points').values)
+
+    if(draw):
+        for ista in range(fcst.sizes['station']):
+            sta_fcst=fcst.isel(station=[ista])
+            sta_points, sta_info=_station_points(points, extra_info, ista)
+            sta_graphics.draw_point_fcst(t2m=sta_fcst[['TMP']].rename({'TMP': 'data'}),
+                u10m=sta_fcst[['UGRD']].rename({'UGRD': 'data'}),
+                v10m=sta_fcst[['VGRD']].rename({'VGRD': 'data'}),
+                rn=sta_fcst[['RAIN']].rename({'RAIN': 'data'}),
+                model=model,
+                output_dir=output_dir,
+                points=sta_points,
+                extra_info=sta_info
+                    )
+            plt.close('all')
+    return fcst
 
 
 def point_uv_rh_fcst_according_to_3D_field(
@@ -665,7 +641,7 @@ def point_uv_rh_fcst_according_to_3D_field(
         t_range=[0,60],
         t_gap=3,
         points={'lon':[116.3833], 'lat':[39.9], 'altitude':[1351]},
-        initTime=None,obs_ID=54511,day_back=0,
+        initTime=None,obs_ID=54511,day_back=0,draw=True,
         extra_info={
             'output_head_name':' ',
             'output_tail_name':' ',
@@ -692,74 +668,35 @@ def point_uv_rh_fcst_according_to_3D_field(
         initTime = get_latest_initTime(dir_rqd[0][0:-1]+'/850')
         #initTime=utl.filename_day_back_model(day_back=day_back,fhour=0)[0:8]
 
-    directory=dir_rqd[0][0:-1]
-
     if(t_range[1] > 72):
         fhours = np.append(np.arange(t_range[0], 72, t_gap),np.arange(72,241,6))
     else:
         fhours = np.arange(t_range[0], t_range[1], t_gap)
 
     filenames = [initTime+'.'+str(fhour).zfill(3) for fhour in fhours]
-    HGT_4D=get_model_3D_grids(directory=directory,filenames=filenames,levels=extra_info['levels_for_interp'], allExists=False)
-    directory=dir_rqd[1][0:-1]
-    U_4D=get_model_3D_grids(directory=directory,filenames=filenames,levels=extra_info['levels_for_interp'], allExists=False)
-    directory=dir_rqd[2][0:-1]
-    V_4D=get_model_3D_grids(directory=directory,filenames=filenames,levels=extra_info['levels_for_interp'], allExists=False)
-
-    directory=dir_rqd[3][0:-1]
-    RH_4D=get_model_3D_grids(directory=directory,filenames=filenames,levels=extra_info['levels_for_interp'], allExists=False)
-    
-    rn=utl.get_model_points_gy(dir_rqd[4], filenames, points,allExists=False)
+    levels=extra_info['levels_for_interp']
+    fcst = get_points_3D_fcst(model=model, var_names=['UGRD', 'VGRD', 'RH'],
+        filenames=filenames, points=points, levels=levels)
+    if fcst is None:
+        return
 
-    directory=dir_rqd[3][0:-1]
-    coords_info_2D=utl.get_model_points_gy(directory+str(extra_info['levels_for_interp'][0])+'/',
-                        points=points,filenames=filenames,allExists=False)
-
-    delt_xy=HGT_4D['lon'].values[1]-HGT_4D['lon'].values[0]
-    mask = (HGT_4D['lon']<(points['lon']+2*delt_xy))&(HGT_4D['lon']>(points['lon']-2*delt_xy))&(HGT_4D['lat']<(points['lat']+2*delt_xy))&(HGT_4D['lat']>(points['lat']-2*delt_xy))
-
-    HGT_4D_sm=HGT_4D['data'].where(mask,drop=True)
-    U_4D_sm=U_4D['data'].where(mask,drop=True)
-    V_4D_sm=V_4D['data'].where(mask,drop=True)
-    RH_4D_sm=RH_4D['data'].where(mask,drop=True)
-
-    lon_md=np.squeeze(HGT_4D_sm['lon'].values)
-    lat_md=np.squeeze(HGT_4D_sm['lat'].values)
-    alt_md=np.squeeze(HGT_4D_sm.values*10).flatten()
-    time_md=np.squeeze(HGT_4D_sm['forecast_period'].values)
-
-    coords = np.zeros((len(time_md),len(extra_info['levels_for_interp']),len(lat_md),len(lon_md),4))
-    coords[...,0]=time_md.reshape((len(time_md),1,1,1))
-    coords[...,2] = lat_md.reshape((1,1,len(lat_md),1))
-    coords[...,3] = lon_md.reshape((1,1,1,len(lon_md)))
-    coords = coords.reshape((alt_md.size,4))
-    coords[:,1]=alt_md
-
-    interpolator_U = LinearNDInterpolator(coords,U_4D_sm.values.reshape((U_4D_sm.values.size)),rescale=True)
-    interpolator_V = LinearNDInterpolator(coords,V_4D_sm.values.reshape((V_4D_sm.values.size)),rescale=True)
-    interpolator_RH = LinearNDInterpolator(coords,RH_4D_sm.values.reshape((RH_4D_sm.values.size)),rescale=True)
-
-    coords2 = np.zeros((len(time_md),1,1,1,4))
-    coords2[...,0]=time_md.reshape((len(time_md),1,1,1))
-    coords2[...,1]=points['altitude'][0]
-    coords2[...,2] = points['lat'][0]
-    coords2[...,3] = points['lon'][0]
-    coords2 = coords2.reshape((time_md.size,4))
-
-    U_interped=np.squeeze(interpolator_U(coords2))
-    V_interped=np.squeeze(interpolator_V(coords2))
-    RH_interped=np.squeeze(interpolator_RH(coords2))
-
-    U_interped_xr=coords_info_2D.copy()
-    U_interped_xr['data'].values=U_interped.reshape(U_interped.size,1,1)
-    V_interped_xr=coords_info_2D.copy()
-    V_interped_xr['data'].values=V_interped.reshape(V_interped.size,1,1)
-    RH_interped_xr=coords_info_2D.copy()
-    RH_interped_xr['data'].values=RH_interped.reshape(RH_interped.size,1,1)
-    
-    sta_graphics.draw_point_uv_rh_fcst(rh2m=RH_interped_xr,u10m=U_interped_xr,v10m=V_interped_xr,rn=rn,
-        model=model,
-        output_dir=output_dir,
-        points=points,
-        extra_info=extra_info
-            )                    
+    rn=utl.get_model_points_gy(dir_rqd[4], filenames, points,allExists=False)
+    rn=rn['data'].isel(level=0) if 'level' in rn['data'].dims else rn['data']
+    fcst['RAIN']=(('time', 'station'),
+        rn.reindex(time=fcst['time'].values).transpose('time', 'points').values)
+
+    if(draw):
+        for ista in range(fcst.sizes['station']):
+            sta_fcst=fcst.isel(station=[ista])
+            sta_points, sta_info=_station_points(points, extra_info, ista)
+            sta_graphics.draw_point_uv_rh_fcst(rh2m=sta_fcst[['RH']].rename({'RH': 'data'}),
+                u10m=sta_fcst[['UGRD']].rename({'UGRD': 'data'}),
+                v10m=sta_fcst[['VGRD']].rename({'VGRD': 'data'}),
+                rn=sta_fcst[['RAIN']].rename({'RAIN': 'data'}),
+                model=model,
+                output_dir=output_dir,
+                points=sta_points,
+                extra_info=sta_info
+                    )
+            plt.close('all')
+    return fcst
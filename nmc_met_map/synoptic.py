@@ -4,11 +4,12 @@
 Synoptic analysis or diagnostic maps for numeric weather model.
 """
 import numpy as np
-from nmc_met_io.retrieve_micaps_server import get_model_grid,get_model_3D_grid
+from nmc_met_map.lib.grid_cache import fetch_model_grids
 import nmc_met_io.retrieve_micaps_server as MICAPS_IO
 import nmc_met_io.retrieve_cimiss_server as CMISS_IO
 from nmc_met_map.graphics import synoptic_graphics
 import nmc_met_map.lib.utility as utl
+import nmc_met_map.lib.kinematics as kin
 import metpy.calc as mpcalc
 from metpy.units import units
 import math as mth
@@ -23,6 +24,11 @@ def gh_uv_mslp(initTime=None, fhour=0, day_back=0,model='ECMWF',
     if(area != '全国'):
         south_China_sea=False
 
+    if(area != None):
+        cntr_pnt,zoom_ratio=utl.get_map_area(area_name=area)
+
+    map_extent=utl.get_map_extent(cntr_pnt,zoom_ratio,map_ratio)
+
     # micaps data directory
     if(data_source =='MICAPS'):
         try:
@@ -44,20 +50,15 @@ def gh_uv_mslp(initTime=None, fhour=0, day_back=0,model='ECMWF',
             filename=utl.filename_day_back_model(day_back=day_back,fhour=fhour)
 
         # retrieve data from micaps server
-        gh = MICAPS_IO.get_model_grid(data_dir[0], filename=filename)
-        if gh is None:
-            return
-        
-        u = MICAPS_IO.get_model_grid(data_dir[1], filename=filename)
-        if u is None:
-            return
-            
-        v = MICAPS_IO.get_model_grid(data_dir[2], filename=filename)
-        if v is None:
-            return
-        mslp = MICAPS_IO.get_model_grid(data_dir[3], filename=filename)
-        if mslp is None:
+        data = fetch_model_grids([
+            (data_dir[0], filename),
+            (data_dir[1], filename),
+            (data_dir[2], filename),
+            (data_dir[3], filename)],
+            bbox=utl.get_padded_extent(map_extent))
+        if data is None:
             return
+        gh, u, v, mslp = data
 
     if(data_source =='CIMISS'):
 
@@ -107,40 +108,165 @@ def gh_uv_mslp(initTime=None, fhour=0, day_back=0,model='ECMWF',
             raise ValueError('Can not find all data needed')                
     # prepare data
 
-    if(area != None):
-        cntr_pnt,zoom_ratio=utl.get_map_area(area_name=area)
+    gh=utl.cut_to_map_extent(gh,map_extent)
+    gh.attrs['model']=model
 
-    map_extent=[0,0,0,0]
-    map_extent[0]=cntr_pnt[0]-zoom_ratio*1*map_ratio
-    map_extent[1]=cntr_pnt[0]+zoom_ratio*1*map_ratio
-    map_extent[2]=cntr_pnt[1]-zoom_ratio*1
-    map_extent[3]=cntr_pnt[1]+zoom_ratio*1
+    u=utl.cut_to_map_extent(u,map_extent)
+    v=utl.cut_to_map_extent(v,map_extent)
+    mslp=utl.cut_to_map_extent(mslp,map_extent)
 
-    delt_x=(map_extent[1]-map_extent[0])*0.2
-    delt_y=(map_extent[3]-map_extent[2])*0.1
+    uv=xr.merge([u.rename({'data': 'u'}),v.rename({'data': 'v'})])
 
-#+ to solve the problem of labels on all the contours
-    mask1 = (gh['lon'] > map_extent[0]-delt_x) & (gh['lon'] < map_extent[1]+delt_x) & (gh['lat'] > map_extent[2]-delt_y) & (gh['lat'] < map_extent[3]+delt_y)
+    synoptic_graphics.draw_gh_uv_mslp(
+        mslp=mslp, gh=gh, uv=uv,
+        map_extent=map_extent, regrid_shape=20,
+        city=city,south_China_sea=south_China_sea,
+        output_dir=output_dir,Global=Global)
 
-    mask2 = (u['lon'] > map_extent[0]-delt_x) & (u['lon'] < map_extent[1]+delt_x) & (u['lat'] > map_extent[2]-delt_y) & (u['lat'] < map_extent[3]+delt_y)
+def _get_gh_uv_sweep(initTime=None, fhours=np.arange(0,241,6), day_back=0,model='ECMWF',
+    gh_lev=500,uv_lev=850,map_extent=None,surface_vars=[]):
+    """
+    Retrieve all the time steps of gh, uv and the surface fields of a sweep
+    with one fetch_model_grids call, cut to the map extent.
+    :param fhours: list of forecast hours.
+    :param surface_vars: the names of the surface fields, e.g. ['PRMSL'].
+    :return: gh, uv and the list of the surface fields, None if any missing.
+    """
 
-    mask3 = (mslp['lon'] > map_extent[0]-delt_x) & (mslp['lon'] < map_extent[1]+delt_x) & (mslp['lat'] > map_extent[2]-delt_y) & (mslp['lat'] < map_extent[3]+delt_y)
-#- to solve the problem of labels on all the contours
-    gh=gh.where(mask1,drop=True)
+    # micaps data directory
+    try:
+        data_dir = [utl.Cassandra_dir(data_type='high',data_source=model,var_name='HGT',lvl=gh_lev),
+                    utl.Cassandra_dir(data_type='high',data_source=model,var_name='UGRD',lvl=uv_lev),
+                    utl.Cassandra_dir(data_type='high',data_source=model,var_name='VGRD',lvl=uv_lev)]
+        data_dir += [utl.Cassandra_dir(data_type='surface',data_source=model,var_name=var_name)
+                     for var_name in surface_vars]
+    except KeyError:
+        raise ValueError('Can not find all directories needed')
+
+    # get filenames
+    if(initTime == None):
+        initTime = MICAPS_IO.get_latest_initTime(data_dir[-1])
+    if(initTime != None):
+        filenames = [utl.model_filename(initTime, int(fhour)) for fhour in fhours]
+    else:
+        filenames = [utl.filename_day_back_model(day_back=day_back,fhour=int(fhour)) for fhour in fhours]
+
+    # retrieve all the time steps from micaps server
+    data = fetch_model_grids([(idir, filenames) for idir in data_dir],
+        allExists=True, bbox=utl.get_padded_extent(map_extent))
+    if data is None:
+        return None
+    data = [utl.cut_to_map_extent(idata,map_extent) for idata in data]
+    gh, u, v = data[0:3]
     gh.attrs['model']=model
 
-    u=u.where(mask2,drop=True)
-    v=v.where(mask2,drop=True)
-    mslp=mslp.where(mask3,drop=True)
-
     uv=xr.merge([u.rename({'data': 'u'}),v.rename({'data': 'v'})])
+    return gh, uv, data[3:]
 
-    synoptic_graphics.draw_gh_uv_mslp(
+def gh_uv_mslp_sweep(initTime=None, fhours=np.arange(0,241,6), day_back=0,model='ECMWF',
+    gh_lev=500,uv_lev=850,
+    map_ratio=19/9,zoom_ratio=20,cntr_pnt=[102,34],
+    south_China_sea=True,area = '全国',city=False,output_dir=None,
+    Global=False):
+    """
+    Draw gh_uv_mslp for a list of forecast hours from one data load.
+    All the time steps are retrieved once with get_model_grids, the map is
+    built once and only the data layers are replaced for each forecast hour.
+    :param fhours: list of forecast hours.
+    :param output_dir: output directory of the images, required.
+    :return: dict, {forecast hour: seconds used to draw the frame}
+    """
+
+    if(area != '全国'):
+        south_China_sea=False
+
+    if(area != None):
+        cntr_pnt,zoom_ratio=utl.get_map_area(area_name=area)
+
+    map_extent=utl.get_map_extent(cntr_pnt,zoom_ratio,map_ratio)
+
+    data = _get_gh_uv_sweep(initTime=initTime, fhours=fhours, day_back=day_back,
+        model=model, gh_lev=gh_lev, uv_lev=uv_lev, map_extent=map_extent,
+        surface_vars=['PRMSL'])
+    if data is None:
+        return
+    gh, uv, (mslp,) = data
+
+    return synoptic_graphics.draw_gh_uv_mslp_sweep(
         mslp=mslp, gh=gh, uv=uv,
         map_extent=map_extent, regrid_shape=20,
         city=city,south_China_sea=south_China_sea,
         output_dir=output_dir,Global=Global)
 
+def gh_uv_wsp_sweep(initTime=None, fhours=np.arange(0,241,6), day_back=0,model='ECMWF',
+    gh_lev=500,uv_lev=850,
+    map_ratio=19/9,zoom_ratio=20,cntr_pnt=[102,34],
+    south_China_sea=True,area = '全国',city=False,output_dir=None,
+    Global=False):
+    """
+    Draw gh_uv_wsp for a list of forecast hours from one data load,
+    see gh_uv_mslp_sweep.
+    :param fhours: list of forecast hours.
+    :param output_dir: output directory of the images, required.
+    :return: dict, {forecast hour: seconds used to draw the frame}
+    """
+
+    if(area != '全国'):
+        south_China_sea=False
+
+    if(area != None):
+        cntr_pnt,zoom_ratio=utl.get_map_area(area_name=area)
+
+    map_extent=utl.get_map_extent(cntr_pnt,zoom_ratio,map_ratio)
+
+    data = _get_gh_uv_sweep(initTime=initTime, fhours=fhours, day_back=day_back,
+        model=model, gh_lev=gh_lev, uv_lev=uv_lev, map_extent=map_extent)
+    if data is None:
+        return
+    gh, uv, _ = data
+
+    wsp=(uv['u']**2+uv['v']**2)**0.5
+
+    return synoptic_graphics.draw_gh_uv_wsp_sweep(
+        wsp=wsp, gh=gh, uv=uv,
+        map_extent=map_extent, regrid_shape=20,
+        city=city,south_China_sea=south_China_sea,
+        output_dir=output_dir,Global=Global)
+
+def gh_uv_r6_sweep(initTime=None, fhours=np.arange(6,241,6), day_back=0,model='ECMWF',
+    gh_lev=500,uv_lev=850,
+    map_ratio=19/9,zoom_ratio=20,cntr_pnt=[102,34],
+    south_China_sea=True,area = '全国',city=False,output_dir=None,
+    Global=False):
+    """
+    Draw gh_uv_r6 for a list of forecast hours from one data load,
+    see gh_uv_mslp_sweep.
+    :param fhours: list of forecast hours.
+    :param output_dir: output directory of the images, required.
+    :return: dict, {forecast hour: seconds used to draw the frame}
+    """
+
+    if(area != '全国'):
+        south_China_sea=False
+
+    if(area != None):
+        cntr_pnt,zoom_ratio=utl.get_map_area(area_name=area)
+
+    map_extent=utl.get_map_extent(cntr_pnt,zoom_ratio,map_ratio)
+
+    data = _get_gh_uv_sweep(initTime=initTime, fhours=fhours, day_back=day_back,
+        model=model, gh_lev=gh_lev, uv_lev=uv_lev, map_extent=map_extent,
+        surface_vars=['RAIN06'])
+    if data is None:
+        return
+    gh, uv, (r6,) = data
+
+    return synoptic_graphics.draw_gh_uv_r6_sweep(
+        r6=r6, gh=gh, uv=uv,
+        map_extent=map_extent, regrid_shape=20,
+        city=city,south_China_sea=south_China_sea,
+        output_dir=output_dir,Global=Global)
+
 def gh_uv_wsp(initTime=None, fhour=6, day_back=0,model='ECMWF',
     gh_lev=500,uv_lev=850,
     map_ratio=19/9,zoom_ratio=20,cntr_pnt=[102,34],
@@ -150,6 +276,11 @@ def gh_uv_wsp(initTime=None, fhour=6, day_back=0,model='ECMWF',
     if(area != '全国'):
         south_China_sea=False
 
+    if(area != None):
+        cntr_pnt,zoom_ratio=utl.get_map_area(area_name=area)
+
+    map_extent=utl.get_map_extent(cntr_pnt,zoom_ratio,map_ratio)
+
     # micaps data directory
     if(data_source =='MICAPS'):    
         try:
@@ -166,18 +297,15 @@ def gh_uv_wsp(initTime=None, fhour=6, day_back=0,model='ECMWF',
             filename=utl.filename_day_back_model(day_back=day_back,fhour=fhour)
 
         # retrieve data from micaps server
-        gh = MICAPS_IO.get_model_grid(data_dir[0], filename=filename)
-        if gh is None:
-            return
-        
-        u = MICAPS_IO.get_model_grid(data_dir[1], filename=filename)
-        if u is None:
+        data = fetch_model_grids([
+            (data_dir[0], filename),
+            (data_dir[1], filename),
+            (data_dir[2], filename)],
+            bbox=utl.get_padded_extent(map_extent))
+        if data is None:
             return
-            
-        v = MICAPS_IO.get_model_grid(data_dir[2], filename=filename)
-        if v is None:
-            return
-        
+        gh, u, v = data
+
     if(data_source =='CIMISS'):
 
         # get filename
@@ -211,29 +339,11 @@ def gh_uv_wsp(initTime=None, fhour=6, day_back=0,model='ECMWF',
         except KeyError:
             raise ValueError('Can not find all data needed')                      
     # prepare data
-    if(area != None):
-        cntr_pnt,zoom_ratio=utl.get_map_area(area_name=area)
-
-    map_extent=[0,0,0,0]
-    map_extent[0]=cntr_pnt[0]-zoom_ratio*1*map_ratio
-    map_extent[1]=cntr_pnt[0]+zoom_ratio*1*map_ratio
-    map_extent[2]=cntr_pnt[1]-zoom_ratio*1
-    map_extent[3]=cntr_pnt[1]+zoom_ratio*1
-
-    delt_x=(map_extent[1]-map_extent[0])*0.2
-    delt_y=(map_extent[3]-map_extent[2])*0.1
-
-#+ to solve the problem of labels on all the contours
-    mask1 = (gh['lon'] > map_extent[0]-delt_x) & (gh['lon'] < map_extent[1]+delt_x) & (gh['lat'] > map_extent[2]-delt_y) & (gh['lat'] < map_extent[3]+delt_y)
-
-    mask2 = (u['lon'] > map_extent[0]-delt_x) & (u['lon'] < map_extent[1]+delt_x) & (u['lat'] > map_extent[2]-delt_y) & (u['lat'] < map_extent[3]+delt_y)
-
-#- to solve the problem of labels on all the contours
-    gh=gh.where(mask1,drop=True)
+    gh=utl.cut_to_map_extent(gh,map_extent)
     gh.attrs['model']=model
 
-    u=u.where(mask2,drop=True)
-    v=v.where(mask2,drop=True)
+    u=utl.cut_to_map_extent(u,map_extent)
+    v=utl.cut_to_map_extent(v,map_extent)
 
     uv=xr.merge([u.rename({'data': 'u'}),v.rename({'data': 'v'})])
 
@@ -254,6 +364,11 @@ def gh_uv_r6(initTime=None, fhour=6, day_back=0,model='ECMWF',
     if(area != '全国'):
         south_China_sea=False
 
+    if(area != None):
+        cntr_pnt,zoom_ratio=utl.get_map_area(area_name=area)
+
+    map_extent=utl.get_map_extent(cntr_pnt,zoom_ratio,map_ratio)
+
     # micaps data directory
     if(data_source =='MICAPS'):       
         try:
@@ -271,20 +386,15 @@ def gh_uv_r6(initTime=None, fhour=6, day_back=0,model='ECMWF',
             filename=utl.filename_day_back_model(day_back=day_back,fhour=fhour)
 
         # retrieve data from micaps server
-        gh = MICAPS_IO.get_model_grid(data_dir[0], filename=filename)
-        if gh is None:
-            return
-        
-        u = MICAPS_IO.get_model_grid(data_dir[1], filename=filename)
-        if u is None:
-            return
-            
-        v = MICAPS_IO.get_model_grid(data_dir[2], filename=filename)
-        if v is None:
-            return
-        r6 = MICAPS_IO.get_model_grid(data_dir[3], filename=filename)
-        if r6 is None:
+        data = fetch_model_grids([
+            (data_dir[0], filename),
+            (data_dir[1], filename),
+            (data_dir[2], filename),
+            (data_dir[3], filename)],
+            bbox=utl.get_padded_extent(map_extent))
+        if data is None:
             return
+        gh, u, v, r6 = data
 
     if(data_source =='CIMISS'):
 
@@ -338,35 +448,15 @@ def gh_uv_r6(initTime=None, fhour=6, day_back=0,model='ECMWF',
 
     # prepare data
 
-    if(area != None):
-        cntr_pnt,zoom_ratio=utl.get_map_area(area_name=area)
-
-    map_extent=[0,0,0,0]
-    map_extent[0]=cntr_pnt[0]-zoom_ratio*1*map_ratio
-    map_extent[1]=cntr_pnt[0]+zoom_ratio*1*map_ratio
-    map_extent[2]=cntr_pnt[1]-zoom_ratio*1
-    map_extent[3]=cntr_pnt[1]+zoom_ratio*1
-
-    delt_x=(map_extent[1]-map_extent[0])*0.2
-    delt_y=(map_extent[3]-map_extent[2])*0.1
 
-#+ to solve the problem of labels on all the contours
-
-    mask1 = (gh['lon'] > map_extent[0]-delt_x) & (gh['lon'] < map_extent[1]+delt_x) & (gh['lat'] > map_extent[2]-delt_y) & (gh['lat'] < map_extent[3]+delt_y)
-
-    mask2 = (u['lon'] > map_extent[0]-delt_x) & (u['lon'] < map_extent[1]+delt_x) & (u['lat'] > map_extent[2]-delt_y) & (u['lat'] < map_extent[3]+delt_y)
-
-    mask3 = (r6['lon'] > map_extent[0]-delt_x) & (r6['lon'] < map_extent[1]+delt_x) & (r6['lat'] > map_extent[2]-delt_y) & (r6['lat'] < map_extent[3]+delt_y)
-
-#- to solve the problem of labels on all the contours
-    gh=gh.where(mask1,drop=True)
+    gh=utl.cut_to_map_extent(gh,map_extent)
     gh.attrs['model']=model
 
-    u=u.where(mask2,drop=True)
-    v=v.where(mask2,drop=True)
+    u=utl.cut_to_map_extent(u,map_extent)
+    v=utl.cut_to_map_extent(v,map_extent)
     uv=xr.merge([u.rename({'data': 'u'}),v.rename({'data': 'v'})])
 
-    r6=r6.where(mask3,drop=True)
+    r6=utl.cut_to_map_extent(r6,map_extent)
 
     synoptic_graphics.draw_gh_uv_r6(
         r6=r6, gh=gh, uv=uv,
@@ -404,21 +494,14 @@ def PV_Div_uv(initTime=None, fhour=6, day_back=0,model='ECMWF',
             filename=utl.filename_day_back_model(day_back=day_back,fhour=fhour)
             
         # retrieve data from micaps server
-        rh=MICAPS_IO.get_model_3D_grid(directory=data_dir[0][0:-1],filename=filename,levels=levels, allExists=False)
-        if rh is None:
-            return
-
-        u=MICAPS_IO.get_model_3D_grid(directory=data_dir[1][0:-1],filename=filename,levels=levels, allExists=False)
-        if u is None:
-            return
-
-        v=MICAPS_IO.get_model_3D_grid(directory=data_dir[2][0:-1],filename=filename,levels=levels, allExists=False)
-        if v is None:
-            return
-
-        t=MICAPS_IO.get_model_3D_grid(directory=data_dir[3][0:-1],filename=filename,levels=levels, allExists=False)
-        if t is None:
+        data = fetch_model_grids([
+            (data_dir[0][0:-1], filename, levels),
+            (data_dir[1][0:-1], filename, levels),
+            (data_dir[2][0:-1], filename, levels),
+            (data_dir[3][0:-1], filename, levels)])
+        if data is None:
             return
+        rh, u, v, t = data
 
     if(data_source =='CIMISS'):
         # get filename
@@ -464,26 +547,12 @@ def PV_Div_uv(initTime=None, fhour=6, day_back=0,model='ECMWF',
         except KeyError:
             raise ValueError('Can not find all data needed')
 
-    map_extent=[0,0,0,0]
-    map_extent[0]=cntr_pnt[0]-zoom_ratio*1*map_ratio
-    map_extent[1]=cntr_pnt[0]+zoom_ratio*1*map_ratio
-    map_extent[2]=cntr_pnt[1]-zoom_ratio*1
-    map_extent[3]=cntr_pnt[1]+zoom_ratio*1
-
-    delt_x=(map_extent[1]-map_extent[0])*0.2
-    delt_y=(map_extent[3]-map_extent[2])*0.1
-
-    #+ to solve the problem of labels on all the contours
-    mask1 = (rh['lon'] > map_extent[0]-delt_x) & (rh['lon'] < map_extent[1]+delt_x) & (rh['lat'] > map_extent[2]-delt_y) & (rh['lat'] < map_extent[3]+delt_y)
-
-    mask2 = (u['lon'] > map_extent[0]-delt_x) & (u['lon'] < map_extent[1]+delt_x) & (u['lat'] > map_extent[2]-delt_y) & (u['lat'] < map_extent[3]+delt_y)
+    map_extent=utl.get_map_extent(cntr_pnt,zoom_ratio,map_ratio)
 
-    mask3 = (t['lon'] > map_extent[0]-delt_x) & (t['lon'] < map_extent[1]+delt_x) & (t['lat'] > map_extent[2]-delt_y) & (t['lat'] < map_extent[3]+delt_y)
-    #- to solve the problem of labels on all the contours
-    rh=rh.where(mask1,drop=True)
-    u=u.where(mask2,drop=True)
-    v=v.where(mask2,drop=True)
-    t=t.where(mask3,drop=True)
+    rh=utl.cut_to_map_extent(rh,map_extent)
+    u=utl.cut_to_map_extent(u,map_extent)
+    v=utl.cut_to_map_extent(v,map_extent)
+    t=utl.cut_to_map_extent(t,map_extent)
     uv=xr.merge([u.rename({'data': 'u'}),v.rename({'data': 'v'})])
 
     lats = np.squeeze(rh['lat'].values)
@@ -502,7 +571,7 @@ def PV_Div_uv(initTime=None, fhour=6, day_back=0,model='ECMWF',
     pv_raw = mpcalc.potential_vorticity_baroclinic(thta, pres[:, None, None], uwnd, vwnd,
                                             dx[None, :, :], dy[None, :, :],
                                             lats[None, :, None] * units('degrees'))
-    div_raw = mpcalc.divergence(uwnd, vwnd, dx[None, :, :], dy[None, :, :], dim_order='yx')
+    div_raw = kin.divergence(uwnd.m, vwnd.m, lons, lats)
 
     # prepare data
     idx_z1 = list(pres.m).index(((lvl_ana * units('hPa')).to(pres.units)).m)
@@ -516,8 +585,8 @@ def PV_Div_uv(initTime=None, fhour=6, day_back=0,model='ECMWF',
     pv=pv.where(pv['level'] == lvl_ana,drop=True )
 
     div=u.copy(deep=True)
-    div['data'].values=np.array(div_raw).reshape(np.append(1,np.array(div_raw).shape))
-    div['data'].attrs['units']=str(div_raw.units)
+    div['data'].values=div_raw.reshape(np.append(1,div_raw.shape))
+    div['data'].attrs['units']='1 / second'
     div=div.where(div['level'] == lvl_ana,drop=True )
 
     uv=uv.where(uv['level'] == lvl_ana,drop=True )
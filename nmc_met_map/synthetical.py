@@ -4,7 +4,7 @@
 Synoptic analysis or diagnostic maps for numeric weather model.
 """
 import numpy as np
-import nmc_met_io.retrieve_micaps_server as MICAPS_IO
+from nmc_met_map.lib.grid_cache import fetch_model_grids
 import nmc_met_io.retrieve_cimiss_server as CMISS_IO
 import nmc_met_map.lib.utility as utl
 import metpy.calc as mpcalc
@@ -65,61 +65,18 @@ def Miller_Composite_Chart(initTime=None, fhour=24, day_back=0,model='GRAPES_GFS
             filename2=utl.filename_day_back_model(day_back=day_back,fhour=fhour-12)
             
         # retrieve data from micaps server
-        rh_700=MICAPS_IO.get_model_grid(directory=data_dir[0],filename=filename)
-        if rh_700 is None:
-            return
-
-        u_300=MICAPS_IO.get_model_grid(directory=data_dir[1],filename=filename)
-        if u_300 is None:
-            return
-
-        v_300=MICAPS_IO.get_model_grid(directory=data_dir[2],filename=filename)
-        if v_300 is None:
-            return
-
-        u_500=MICAPS_IO.get_model_grid(directory=data_dir[3],filename=filename)
-        if u_500 is None:
-            return
-
-        v_500=MICAPS_IO.get_model_grid(directory=data_dir[4],filename=filename)
-        if v_500 is None:
-            return
-
-        u_850=MICAPS_IO.get_model_grid(directory=data_dir[5],filename=filename)
-        if u_850 is None:
-            return
-
-        v_850=MICAPS_IO.get_model_grid(directory=data_dir[6],filename=filename)
-        if v_850 is None:
-            return
-
-        t_700=MICAPS_IO.get_model_grid(directory=data_dir[7],filename=filename)
-        if t_700 is None:
-            return
-
-        hgt_500=MICAPS_IO.get_model_grid(directory=data_dir[8],filename=filename)
-        if hgt_500 is None:
-            return     
-
-        hgt_500_2=MICAPS_IO.get_model_grid(directory=data_dir[8],filename=filename2)
-        if hgt_500_2 is None:
-            return 
-
-        BLI=MICAPS_IO.get_model_grid(directory=data_dir[9],filename=filename)
-        if BLI is None:
-            return
-
-        Td2m=MICAPS_IO.get_model_grid(directory=data_dir[10],filename=filename)
-        if Td2m is None:
-            return
-
-        PRMSL=MICAPS_IO.get_model_grid(directory=data_dir[11],filename=filename)
-        if PRMSL is None:
-            return
-
-        PRMSL2=MICAPS_IO.get_model_grid(directory=data_dir[11],filename=filename2)
-        if PRMSL2 is None:
+        data = fetch_model_grids([
+            (data_dir[0], filename), (data_dir[1], filename),
+            (data_dir[2], filename), (data_dir[3], filename),
+            (data_dir[4], filename), (data_dir[5], filename),
+            (data_dir[6], filename), (data_dir[7], filename),
+            (data_dir[8], filename), (data_dir[8], filename2),
+            (data_dir[9], filename), (data_dir[10], filename),
+            (data_dir[11], filename), (data_dir[11], filename2)])
+        if data is None:
             return
+        (rh_700, u_300, v_300, u_500, v_500, u_850, v_850, t_700,
+            hgt_500, hgt_500_2, BLI, Td2m, PRMSL, PRMSL2) = data
 
     if(data_source =='CIMISS'):
 
@@ -291,14 +248,7 @@ def Miller_Composite_Chart(initTime=None, fhour=24, day_back=0,model='GRAPES_GFS
     if(area != None):
         cntr_pnt,zoom_ratio=utl.get_map_area(area_name=area)
 
-    map_extent=[0,0,0,0]
-    map_extent[0]=cntr_pnt[0]-zoom_ratio*1*map_ratio
-    map_extent[1]=cntr_pnt[0]+zoom_ratio*1*map_ratio
-    map_extent[2]=cntr_pnt[1]-zoom_ratio*1
-    map_extent[3]=cntr_pnt[1]+zoom_ratio*1
-
-    delt_x=(map_extent[1]-map_extent[0])*0.2
-    delt_y=(map_extent[3]-map_extent[2])*0.1
+    map_extent=utl.get_map_extent(cntr_pnt,zoom_ratio,map_ratio)
 
     fcst_info= {'lon':lons,'lat':lats,
                 'forecast_period':fhour,
@@ -4,7 +4,7 @@
 Synoptic analysis or diagnostic maps for numeric weather model.
 """
 import numpy as np
-import nmc_met_io.retrieve_micaps_server as MICAPS_IO
+from nmc_met_map.lib.grid_cache import fetch_model_grids
 import nmc_met_io.retrieve_cimiss_server as CMISS_IO
 from nmc_met_map.graphics import thermal_graphics
 import nmc_met_map.lib.utility as utl
@@ -18,6 +18,11 @@ def gh_uv_thetae(initTime=None, fhour=6, day_back=0,model='ECMWF',
     south_China_sea=True,area = '全国',city=False,output_dir=None,data_source='MICAPS',
     Global=False):
 
+    if(area != None):
+        cntr_pnt,zoom_ratio=utl.get_map_area(area_name=area)
+
+    map_extent=utl.get_map_extent(cntr_pnt,zoom_ratio,map_ratio)
+
 # prepare data
     if(data_source =='MICAPS'):    
         try:
@@ -35,20 +40,15 @@ def gh_uv_thetae(initTime=None, fhour=6, day_back=0,model='ECMWF',
             filename=utl.filename_day_back_model(day_back=day_back,fhour=fhour)
 
         # retrieve data from micaps server
-        gh = MICAPS_IO.get_model_grid(data_dir[0], filename=filename)
-        if gh is None:
+        data = fetch_model_grids([
+            (data_dir[0], filename),
+            (data_dir[1], filename),
+            (data_dir[2], filename),
+            (data_dir[3], filename)],
+            bbox=utl.get_padded_extent(map_extent))
+        if data is None:
             return
-        
-        u = MICAPS_IO.get_model_grid(data_dir[1], filename=filename)
-        if u is None:
-            return
-            
-        v = MICAPS_IO.get_model_grid(data_dir[2], filename=filename)
-        if v is None:
-            return
-        thetae = MICAPS_IO.get_model_grid(data_dir[3], filename=filename)
-        if thetae is None:
-            return   
+        gh, u, v, thetae = data
 
     if(data_source =='CIMISS'): 
         # get filename
@@ -92,30 +92,14 @@ def gh_uv_thetae(initTime=None, fhour=6, day_back=0,model='ECMWF',
     if(area != '全国'):
         south_China_sea=False
 
-    if(area != None):
-        cntr_pnt,zoom_ratio=utl.get_map_area(area_name=area)
-
-    map_extent=[0,0,0,0]
-    map_extent[0]=cntr_pnt[0]-zoom_ratio*1*map_ratio
-    map_extent[1]=cntr_pnt[0]+zoom_ratio*1*map_ratio
-    map_extent[2]=cntr_pnt[1]-zoom_ratio*1
-    map_extent[3]=cntr_pnt[1]+zoom_ratio*1
-
-    delt_x=(map_extent[1]-map_extent[0])*0.2
-    delt_y=(map_extent[3]-map_extent[2])*0.1
-
 # to solve the problem of labels on all the contours
-    mask1 = (gh['lon'] > map_extent[0]-delt_x) & (gh['lon'] < map_extent[1]+delt_x) & (gh['lat'] > map_extent[2]-delt_y) & (gh['lat'] < map_extent[3]+delt_y)
-    mask2 = (u['lon'] > map_extent[0]-delt_x) & (u['lon'] < map_extent[1]+delt_x) & (u['lat'] > map_extent[2]-delt_y) & (u['lat'] < map_extent[3]+delt_y)
-    mask3 = (thetae['lon'] > map_extent[0]-delt_x) & (thetae['lon'] < map_extent[1]+delt_x) & (thetae['lat'] > map_extent[2]-delt_y) & (thetae['lat'] < map_extent[3]+delt_y)
-
-    gh=gh.where(mask1,drop=True)
+    gh=utl.cut_to_map_extent(gh,map_extent)
     gh.attrs['model']=model
 
-    u=u.where(mask2,drop=True)
-    v=v.where(mask2,drop=True)
+    u=utl.cut_to_map_extent(u,map_extent)
+    v=utl.cut_to_map_extent(v,map_extent)
     uv=xr.merge([u.rename({'data': 'u'}),v.rename({'data': 'v'})])
-    thetae=thetae.where(mask3,drop=True)
+    thetae=utl.cut_to_map_extent(thetae,map_extent)
 
 # draw
     thermal_graphics.draw_gh_uv_thetae(
@@ -130,6 +114,11 @@ def gh_uv_tmp(initTime=None, fhour=6, day_back=0,model='ECMWF',
     south_China_sea=True,area = '全国',city=False,output_dir=None,data_source='MICAPS',
     Global=False):
 
+    if(area != None):
+        cntr_pnt,zoom_ratio=utl.get_map_area(area_name=area)
+
+    map_extent=utl.get_map_extent(cntr_pnt,zoom_ratio,map_ratio)
+
 #prepare data
     if(data_source =='MICAPS'):   
         try:
@@ -147,21 +136,16 @@ def gh_uv_tmp(initTime=None, fhour=6, day_back=0,model='ECMWF',
             filename=utl.filename_day_back_model(day_back=day_back,fhour=fhour)
 
         # retrieve data from micaps server
-        gh = MICAPS_IO.get_model_grid(data_dir[0], filename=filename)
-        if gh is None:
+        data = fetch_model_grids([
+            (data_dir[0], filename),
+            (data_dir[1], filename),
+            (data_dir[2], filename),
+            (data_dir[3], filename)],
+            bbox=utl.get_padded_extent(map_extent))
+        if data is None:
             return
-        
-        u = MICAPS_IO.get_model_grid(data_dir[1], filename=filename)
-        if u is None:
-            return
-            
-        v = MICAPS_IO.get_model_grid(data_dir[2], filename=filename)
-        if v is None:
-            return
-        tmp = MICAPS_IO.get_model_grid(data_dir[3], filename=filename)
-        if tmp is None:
-            return   
-    
+        gh, u, v, tmp = data
+
     if(data_source=='CIMISS'):
         # get filename
         if(initTime != None):
@@ -205,30 +189,14 @@ def gh_uv_tmp(initTime=None, fhour=6, day_back=0,model='ECMWF',
     if(area != '全国'):
         south_China_sea=False
 
-    if(area != None):
-        cntr_pnt,zoom_ratio=utl.get_map_area(area_name=area)
-
-    map_extent=[0,0,0,0]
-    map_extent[0]=cntr_pnt[0]-zoom_ratio*1*map_ratio
-    map_extent[1]=cntr_pnt[0]+zoom_ratio*1*map_ratio
-    map_extent[2]=cntr_pnt[1]-zoom_ratio*1
-    map_extent[3]=cntr_pnt[1]+zoom_ratio*1
-
-    delt_x=(map_extent[1]-map_extent[0])*0.2
-    delt_y=(map_extent[3]-map_extent[2])*0.1
-
 #to solve the problem of labels on all the contours
-    mask1 = (gh['lon'] > map_extent[0]-delt_x) & (gh['lon'] < map_extent[1]+delt_x) & (gh['lat'] > map_extent[2]-delt_y) & (gh['lat'] < map_extent[3]+delt_y)
-    mask2 = (u['lon'] > map_extent[0]-delt_x) & (u['lon'] < map_extent[1]+delt_x) & (u['lat'] > map_extent[2]-delt_y) & (u['lat'] < map_extent[3]+delt_y)
-    mask3 = (tmp['lon'] > map_extent[0]-delt_x) & (tmp['lon'] < map_extent[1]+delt_x) & (tmp['lat'] > map_extent[2]-delt_y) & (tmp['lat'] < map_extent[3]+delt_y)
-
-    gh=gh.where(mask1,drop=True)
+    gh=utl.cut_to_map_extent(gh,map_extent)
     gh.attrs['model']=model
 
-    u=u.where(mask2,drop=True)
-    v=v.where(mask2,drop=True)
+    u=utl.cut_to_map_extent(u,map_extent)
+    v=utl.cut_to_map_extent(v,map_extent)
     uv=xr.merge([u.rename({'data': 'u'}),v.rename({'data': 'v'})])
-    tmp=tmp.where(mask3,drop=True)
+    tmp=utl.cut_to_map_extent(tmp,map_extent)
 
 #draw
     thermal_graphics.draw_gh_uv_tmp(
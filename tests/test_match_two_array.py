@@ -0,0 +1,33 @@
+# _*_ coding: utf-8 _*_
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('cartopy')
+from nmc_met_map.lib.match_two_array import match_two_array
+
+
+def test_int64_against_object_int_ids():
+    # e.g. the ID column of a DataFrame read with mixed types
+    obs_ID = pd.Series([54511, 58367, 99999], dtype=object).values
+    sta_ID = np.array([58367, 54511, 50953], dtype=np.int64)
+    idx1, idx2 = match_two_array(obs_ID, sta_ID)
+    np.testing.assert_array_equal(idx1, [0, 1])
+    np.testing.assert_array_equal(idx2, [1, 0])
+    idx1, idx2 = match_two_array(sta_ID, obs_ID)
+    np.testing.assert_array_equal(idx1, [0, 1])
+    np.testing.assert_array_equal(idx2, [1, 0])
+
+
+def test_string_ids():
+    idx1, idx2 = match_two_array(
+        np.array(['54511', 'A1234'], dtype=object), np.array(['A1234', '54511']))
+    np.testing.assert_array_equal(idx1, [0, 1])
+    np.testing.assert_array_equal(idx2, [1, 0])
+
+
+def test_numbers_never_match_strings():
+    idx1, idx2 = match_two_array(
+        np.array([54511]), np.array(['54511'], dtype=object))
+    assert len(idx1) == 0 and len(idx2) == 0